@@ -1,5 +1,5 @@
 from Compressor import CompressorClass
-from CoolProp.CoolProp import Props
+from Properties import Props
 kwds={
       'M':[217.3163128,5.094492028,-0.593170311,4.38E-02,-2.14E-02,1.04E-02,7.90E-05,-5.73E-05,1.79E-04,-8.08E-05],
       'P':[-561.3615705,-15.62601841,46.92506685,-0.217949552,0.435062616,-0.442400826,2.25E-04,2.37E-03,-3.32E-03,2.50E-03],
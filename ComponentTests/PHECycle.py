@@ -7,7 +7,7 @@ from Pump import PumpClass # Secondary loop pump class
 from PHEHX import PHEHXClass
 from scipy.optimize import brent, fsolve 
 #^^ fsolve - roots (multiple variables); brent - root of one variable fct
-from CoolProp.CoolProp import Props,Tsat             #refrigerant properties
+from Properties import Props             #refrigerant properties
 from FinCorrelations import WavyLouveredFins,FinInputs     #fin correlations
 import numpy as np                  #NumPy is fundamental scientific package                                   
 
@@ -48,7 +48,7 @@ class SecondaryCycleClass():
         self.Tdew_evap=self.CoolingCoil.Fins.Air.Tdb-DT_evap
         psat_cond=Props('P','T',self.Tdew_cond,'Q',1,self.Ref)
         psat_evap=Props('P','T',self.Tdew_evap,'Q',1,self.Ref)    
-        self.Tbubble_evap=Tsat(self.Ref,psat_evap,0,0)
+        self.Tbubble_evap=Props('T','P',psat_evap,'Q',0,self.Ref)
         
         params={               #dictionary -> key:value, e.g. 'key':2345,
             'pin_r': psat_evap,   
@@ -1,5 +1,5 @@
 from Compressor import CompressorClass
-from CoolProp.CoolProp import Props
+from Properties import Props
 kwds={
       'M':[217.3163128,5.094492028,-0.593170311,4.38E-02,
         -2.14E-02,1.04E-02,7.90E-05,-5.73E-05,1.79E-04,-8.08E-05],
@@ -1,4 +1,4 @@
-from CoolProp.CoolProp import Props
+from Properties import Props
 from Condenser import CondenserClass
 from FinCorrelations import FinInputs
 
@@ -1,4 +1,4 @@
-from CoolProp.CoolProp import Props
+from Properties import Props
 from FinCorrelations import FinInputs
 from Evaporator import EvaporatorClass
 
@@ -2,54 +2,28 @@
 This file holds some functions that don't have any obvious other home
 '''
 import os
+
 def Write2CSV(Class,file,append=False):
     """
     This function takes in a class and a file pointer
-    """
-    def OL2Strings(OL):
-        head=str(OL[0][0])
-        units=str(OL[0][1])
-        vals=str(OL[0][2])
-        for i in range(1,len(OL)):
-            head+=','+str(OL[i][0])
-            units+=','+str(OL[i][1])
-            vals+=','+str(OL[i][2])
-        return head,units,vals
     
-    def BuildComponentList(ShapeString,string):
-        OutString=string
-        for i in range(len(ShapeString.split(','))-1):
-            OutString+=','+string
-        return OutString
-        
+    Writes one row; to write many rows (a parametric study for instance) use 
+    ResultsStore.ResultsWriter, which works out the columns only once and 
+    writes the rows in bulk
+    """
     from Cycle import SecondaryCycleClass,DXCycleClass
+    from ResultsStore import CollectOutputs
     # Check if it is an instance of one of the cycle classes - more work required
     # to collect all the component outputs
-    if isinstance(Class,(SecondaryCycleClass,DXCycleClass)):
-        #Pull the cycle outputs
-        head,units,vals=OL2Strings(Class.OutputList())
-        headList=[head]
-        unitsList=[units]
-        valsList=[vals]
-        componentList=[BuildComponentList(units,'Cycle')]
-        
-        #Loop over the other things that are there
-        for item in dir(Class):            
-            #If the item has an outputList, collect it
-            if hasattr(getattr(Class,item),'OutputList'):
-                head,units,vals=OL2Strings(getattr(Class,item).OutputList())
-                componentList+=[BuildComponentList(units,item)]
-                headList+=[head]
-                unitsList+=[units]
-                valsList+=[vals]
-        components=','.join(componentList)
-        head=','.join(headList)
-        units=','.join(unitsList)
-        vals=','.join(valsList)
-        IsCycle=True
+    IsCycle=isinstance(Class,(SecondaryCycleClass,DXCycleClass))
+    if IsCycle:
+        Outputs=CollectOutputs(Class)
     else:
-        head,units,vals=OL2Strings(Class.OutputList())
-        IsCycle=False
+        Outputs=CollectOutputs(Class,Components=[])
+    components=','.join([str(component) for component,head,units,value in Outputs])
+    head=','.join([str(head) for component,head,units,value in Outputs])
+    units=','.join([str(units) for component,head,units,value in Outputs])
+    vals=','.join([str(value) for component,head,units,value in Outputs])
         
     if type(file)!=type('some string'):
         #A file object was passed in, use it
@@ -1,6 +1,19 @@
 """
 This file is used to store a base class that holds the docstrings for commonly used class members like Update, OutputList, etc..
 """
+import inspect
+
+def CopyDoc(Source):
+    """
+    Decorator to give a method the (dedented) docstring of Source, used in
+    place of matplotlib.docstring.copy_dedent so that matplotlib does not need
+    to be imported by the components
+    """
+    def decorator(f):
+        f.__doc__=inspect.cleandoc(Source.__doc__)
+        return f
+    return decorator
+
 class BaseDocClass():
     def __init__(self,**kwargs):
         """Load up the parameters passed in using the dictionary"""
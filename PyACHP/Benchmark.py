@@ -0,0 +1,336 @@
+'''
+Benchmarks of the sample components and cycles of PyACHP
+
+Each case is run a few times with empty property, fin and compressor map
+caches, and the wall time, the number of calls to Props (and how many of them
+actually went to CoolProp) and, for the cycles, the number of cycle
+evaluations used by the solver are recorded.  The results can be saved as a
+JSON baseline and later runs compared against it to catch performance
+regressions.
+
+The time taken to import the main modules in a fresh interpreter is also
+measured, since it is paid by every short-lived worker process or command line
+invocation (see Solve for the slim solver-only entry point).
+
+Usage::
+
+    python Benchmark.py                                   # run all the cases
+    python Benchmark.py --case DXAC --case Condenser      # only some of them
+    python Benchmark.py --save baseline.json              # store a baseline
+    python Benchmark.py --compare baseline.json           # flag regressions
+    python Benchmark.py --no-imports                      # skip the import times
+    python Benchmark.py --case DXAC --segmented           # segmented coils
+
+The DXACSegmented cases solve the sample DX air conditioner with the segmented
+coils of SegmentedCoil; with --segmented the capacity and refrigerant pressure
+drop of its coils are also compared with those of the moving-boundary coils
+for 1, 2, 4 and 8 segments per tube (see SegmentedDeviations).
+
+When comparing, a case is flagged if its wall time exceeds the baseline by more
+than the tolerance (10% by default), or if it needs more Props calls or more
+cycle evaluations than the baseline (these counts are deterministic).  Import
+times are flagged with the same tolerance.
+'''
+from __future__ import division
+import os,sys,json,time,platform,subprocess
+from timeit import default_timer
+from collections import OrderedDict
+import Properties
+import FinCorrelations
+import Compressor
+from Properties import Props
+
+def CompressorMap(N=8):
+    """
+    Evaluate the sample R134a compressor over an N x N grid of suction and
+    discharge saturation temperatures
+    """
+    from Compressor import CompressorClass
+    Comp=CompressorClass(M=[217.3163128,5.094492028,-0.593170311,4.38E-02,-2.14E-02,1.04E-02,7.90E-05,-5.73E-05,1.79E-04,-8.08E-05],
+                         P=[-561.3615705,-15.62601841,46.92506685,-0.217949552,0.435062616,-0.442400826,2.25E-04,2.37E-03,-3.32E-03,2.50E-03],
+                         Ref='R134a',
+                         fp=0.15,
+                         Vdot_ratio=1.0)
+    for i in range(N):
+        Tsat_s=265+20*i/(N-1)
+        for j in range(N):
+            Tsat_d=305+20*j/(N-1)
+            Comp.Update(Tin_r=Tsat_s+5,
+                        pin_r=Props('P','T',Tsat_s,'Q',1.0,'R134a'),
+                        pout_r=Props('P','T',Tsat_d,'Q',1.0,'R134a'))
+            Comp.Calculate()
+    return Comp
+
+def SegmentedDXAC(Nsegments=2):
+    """
+    Solve the sample DX air conditioner with SegmentedEvaporatorClass and
+    SegmentedCondenserClass, with Nsegments segments per tube, in place of the
+    moving-boundary evaporator and condenser
+    """
+    from SampleCycles import SampleDXACSystem
+    from SegmentedCoil import SegmentedEvaporatorClass,SegmentedCondenserClass
+    Cycle=SampleDXACSystem(Calculate=False)
+    Cycle.Evaporator=SegmentedEvaporatorClass(Nsegments=Nsegments,**Cycle.Evaporator.__dict__)
+    Cycle.Condenser=SegmentedCondenserClass(Nsegments=Nsegments,**Cycle.Condenser.__dict__)
+    Cycle.PreconditionedSolve()
+    return Cycle
+
+def SegmentedDeviations(NsegmentsList=[1,2,4,8],Verbosity=1):
+    """
+    Solve the sample DX air conditioner with the moving-boundary coils and
+    with the segmented coils for each number of segments per tube in
+    NsegmentsList, and return a list of dictionaries (one per Nsegments) with
+
+    ==========   ==========================================================
+    Key          Description
+    ==========   ==========================================================
+    Nsegments    Number of segments per tube
+    time         Wall time of the cycle solution [s]
+    nfev         Number of cycle evaluations by the solver
+    Q_evap       Relative deviation of the evaporator Q [-]
+    DP_r_evap    Relative deviation of the evaporator DP_r [-]
+    Q_cond       Relative deviation of the condenser Q [-]
+    DP_r_cond    Relative deviation of the condenser DP_r [-]
+    COSP         Relative deviation of the system COSP [-]
+    ==========   ==========================================================
+
+    The deviations are taken with respect to the moving-boundary cycle, which
+    is also printed first if Verbosity>0
+    """
+    from SampleCycles import SampleDXACSystem
+    Cycles=[(0,SampleDXACSystem)]+[(N,lambda N=N: SegmentedDXAC(N)) for N in NsegmentsList]
+    Rows=[]
+    for Nsegments,f in Cycles:
+        t1=default_timer()
+        Cycle=f()
+        t2=default_timer()
+        if Nsegments==0:
+            Reference=Cycle
+        Row=OrderedDict([('Nsegments',Nsegments),('time',t2-t1),('nfev',Cycle.SolverInfo['nfev'])])
+        for key,Component,attr in [('Q_evap','Evaporator','Q'),('DP_r_evap','Evaporator','DP_r'),
+                                   ('Q_cond','Condenser','Q'),('DP_r_cond','Condenser','DP_r'),
+                                   ('COSP',None,'COSP')]:
+            new=getattr(getattr(Cycle,Component) if Component else Cycle,attr)
+            old=getattr(getattr(Reference,Component) if Component else Reference,attr)
+            Row[key]=new/old-1
+        if Verbosity>0:
+            print '%-24s %9.3f s %6d nfev'%('DXACSegmented%d'%Nsegments if Nsegments else 'DXAC',Row['time'],Row['nfev'])+''.join(' %s %+6.2f%%'%(key,Row[key]*100) for key in list(Row.keys())[3:])
+        if Nsegments>0:
+            Rows.append(Row)
+    return Rows
+
+#Name of the case, and the module and function that runs it, and optionally a
+#dictionary of keyword arguments to call it with.  The cycles are solved by
+#their sample functions
+Cases=OrderedDict([
+    ('Condenser',('Condenser','SampleCondenser')),
+    ('PHEHX',('PHEHX','SamplePHEHX')),
+    ('CoolingCoil',('CoolingCoil','TestCase')),
+    ('MultiCircuitEvaporator',('MultiCircuitEvaporator','SampleMultiCircuitEvaporator')),
+    ('CompressorMap',('Benchmark','CompressorMap')),
+    ('DXAC',('SampleCycles','SampleDXACSystem')),
+    ('DXHP',('SampleCycles','SampleDXHPSystem')),
+    ('SecondaryLoop',('SampleCycles','SampleSecondaryLoopSystem')),
+    ('SecondaryLoopHP',('SampleCycles','SampleSecondaryLoopHPSystem')),
+    ('DXACSegmented1',('Benchmark','SegmentedDXAC',{'Nsegments':1})),
+    ('DXACSegmented2',('Benchmark','SegmentedDXAC',{'Nsegments':2})),
+    ('DXACSegmented4',('Benchmark','SegmentedDXAC',{'Nsegments':4})),
+])
+
+#Modules whose import time is measured
+ImportModules=['Properties','Cycle','Solve','Parametric']
+
+class _NullWriter(object):
+    """
+    Swallows the printing done by the sample functions while they are timed
+    """
+    def write(self,s):
+        pass
+    def flush(self):
+        pass
+
+def _GetFunction(Module,Function):
+    #Imported before the timing starts so that import time is not included
+    return getattr(__import__(Module),Function)
+
+def RunCase(Name,repeat=3,Quiet=True):
+    """
+    Run one benchmark case ``repeat`` times and return a dictionary with
+
+    ==========   ==========================================================
+    Key          Description
+    ==========   ==========================================================
+    time         Fastest wall time of the runs [s]
+    mean_time    Mean wall time of the runs [s]
+    Props        Number of calls to Props in one run
+    CoolProp     Number of those calls that were evaluated by CoolProp
+    nfev         Number of cycle evaluations by the solver (cycles only)
+    ==========   ==========================================================
+    """
+    Module,Function=Cases[Name][0:2]
+    kwargs=Cases[Name][2] if len(Cases[Name])>2 else {}
+    f=_GetFunction(Module,Function)
+    times=[]
+    result={}
+    for i in range(repeat):
+        #Every run starts with empty property and fin correlation caches
+        Properties.ClearCache()
+        FinCorrelations.ClearCache()
+        Compressor.ClearCache()
+        Properties.ResetCallCounts()
+        stdout=sys.stdout
+        if Quiet:
+            sys.stdout=_NullWriter()
+        try:
+            t1=default_timer()
+            out=f(**kwargs)
+            t2=default_timer()
+        finally:
+            sys.stdout=stdout
+        times.append(t2-t1)
+        result.update(Properties.CallCounts())
+        if hasattr(out,'SolverInfo'):
+            result['nfev']=out.SolverInfo['nfev']
+    result['time']=min(times)
+    result['mean_time']=sum(times)/len(times)
+    return result
+
+def RunBenchmarks(Names=None,repeat=3,Verbosity=1):
+    """
+    Run the benchmark cases in Names (all of them if None), returns an ordered
+    dictionary of results keyed by case name
+    """
+    if Names is None:
+        Names=list(Cases.keys())
+    Results=OrderedDict()
+    for Name in Names:
+        Results[Name]=RunCase(Name,repeat=repeat)
+        if Verbosity>0:
+            PrintResult(Name,Results[Name])
+    return Results
+
+def ImportTime(Module,repeat=3):
+    """
+    Fastest time [s] to import Module in a fresh interpreter over ``repeat``
+    runs, not including the startup of the interpreter itself
+    """
+    code=('import sys\nfrom timeit import default_timer\nt1=default_timer()\n'
+          'import %s\nsys.stdout.write(repr(default_timer()-t1))'%Module)
+    cwd=os.path.dirname(os.path.abspath(__file__))
+    times=[]
+    for i in range(repeat):
+        p=subprocess.Popen([sys.executable,'-c',code],cwd=cwd,stdout=subprocess.PIPE)
+        out=p.communicate()[0]
+        if p.returncode!=0:
+            raise ImportError('Could not import '+Module)
+        times.append(float(out))
+    return min(times)
+
+def ImportTimes(Modules=None,repeat=3,Verbosity=1):
+    """
+    Import times of the modules in Modules (ImportModules if None), returns
+    an ordered dictionary of times [s] keyed by module name
+    """
+    if Modules is None:
+        Modules=ImportModules
+    Times=OrderedDict()
+    for Module in Modules:
+        Times[Module]=ImportTime(Module,repeat=repeat)
+        if Verbosity>0:
+            print '%-24s %9.3f s'%('import '+Module,Times[Module])
+    return Times
+
+def PrintResult(Name,Result):
+    print '%-24s %9.3f s %9d Props %9d CoolProp %6s nfev'%(Name,Result['time'],
+                            Result['Props'],Result['CoolProp'],Result.get('nfev','-'))
+
+def SaveBaseline(Results,path,Imports=None):
+    """
+    Write the benchmark results (and import times if given) to a JSON file,
+    with enough information about the machine to tell whether a comparison
+    is meaningful
+    """
+    data={'date':time.strftime('%Y-%m-%d %H:%M:%S'),
+          'machine':platform.node(),
+          'platform':platform.platform(),
+          'python':platform.python_version(),
+          'cases':Results}
+    if Imports is not None:
+        data['imports']=Imports
+    fp=open(path,'w')
+    json.dump(data,fp,indent=2)
+    fp.close()
+
+def LoadBaseline(path,Imports=False):
+    """
+    Returns the dictionary of results keyed by case name from a baseline
+    file, and also the dictionary of import times (empty if the baseline has
+    none) if Imports is True
+    """
+    fp=open(path,'r')
+    data=json.load(fp)
+    fp.close()
+    if Imports:
+        return data['cases'],data.get('imports',{})
+    return data['cases']
+
+def CompareImports(Imports,Baseline,tolerance=0.1):
+    """
+    Compare import times with a baseline, returns a list of regressions in the
+    same form as Compare, with the quantity 'import'
+    """
+    Regressions=[]
+    for Module in Imports:
+        if Module in Baseline and Imports[Module]>Baseline[Module]*(1+tolerance):
+            Regressions.append((Module,'import',Baseline[Module],Imports[Module]))
+    return Regressions
+
+def Compare(Results,Baseline,tolerance=0.1):
+    """
+    Compare benchmark results with a baseline, returns a list of regressions,
+    each a tuple of (case name, quantity, baseline value, new value)
+
+    The time is flagged if it is more than (1+tolerance) times the baseline,
+    the Props calls and cycle evaluations if they are larger at all
+    """
+    Regressions=[]
+    for Name in Results:
+        if Name not in Baseline:
+            continue
+        new=Results[Name]
+        old=Baseline[Name]
+        if new['time']>old['time']*(1+tolerance):
+            Regressions.append((Name,'time',old['time'],new['time']))
+        for key in ['Props','CoolProp','nfev']:
+            if key in new and key in old and new[key]>old[key]:
+                Regressions.append((Name,key,old[key],new[key]))
+    return Regressions
+
+if __name__=='__main__':
+    from optparse import OptionParser
+    parser=OptionParser(usage='usage: %prog [options]')
+    parser.add_option('--case',dest='cases',action='append',default=None,help='name of a case to run, can be repeated (default: all of '+', '.join(Cases.keys())+')')
+    parser.add_option('-n','--repeat',dest='repeat',type='int',default=3,help='number of runs of each case')
+    parser.add_option('--save',dest='save',default=None,help='JSON file to save the results to as a baseline')
+    parser.add_option('--compare',dest='compare',default=None,help='JSON baseline file to compare the results with')
+    parser.add_option('--tolerance',dest='tolerance',type='float',default=0.1,help='allowed relative increase of the time before it is flagged')
+    parser.add_option('--segmented',dest='segmented',action='store_true',default=False,help='compare the segmented coils with the moving-boundary coils in the sample DX cycle')
+    parser.add_option('--no-imports',dest='imports',action='store_false',default=True,help='do not measure the import times of '+', '.join(ImportModules))
+    (options,args)=parser.parse_args()
+
+    Results=RunBenchmarks(options.cases,repeat=options.repeat)
+    Imports=ImportTimes(repeat=options.repeat) if options.imports else None
+    if options.segmented:
+        SegmentedDeviations()
+    if options.save is not None:
+        SaveBaseline(Results,options.save,Imports)
+    if options.compare is not None:
+        BaselineResults,BaselineImports=LoadBaseline(options.compare,Imports=True)
+        Regressions=Compare(Results,BaselineResults,options.tolerance)
+        if Imports is not None:
+            Regressions+=CompareImports(Imports,BaselineImports,options.tolerance)
+        for Name,key,old,new in Regressions:
+            print 'REGRESSION: %s %s %g -> %g (%+.1f%%)'%(Name,key,old,new,(new/old-1)*100 if old else float('inf'))
+        if Regressions:
+            sys.exit(1)
+        print 'No regressions'
@@ -1,8 +1,8 @@
-from CoolProp.CoolProp import Props
+from Properties import Props,State,SatState
 from Correlations import f_h_1phase_Annulus,f_h_1phase_Tube,ShahEvaporation_Average
 from Correlations import TwoPhaseDensity,LMPressureGradientAvg,AccelPressureDrop
 from math import pi,exp,log
-from scipy.optimize import brentq
+from Instrumentation import brentq
 import numpy as np
 
 class CoaxialHXClass():
@@ -80,30 +80,32 @@ class CoaxialHXClass():
         #Evaporation hydraulic diameter [m]
         self.Dh_r=self.ID_i
         
-        self.Tbubble_r=Props('T','P',self.pin_r,'Q',0,self.Ref_r)
-        self.Tdew_r=Props('T','P',self.pin_r,'Q',1,self.Ref_r)
+        Sat=SatState(self.Ref_r,p=self.pin_r)
+        self.Tbubble_r=Sat.Tbubble
+        self.Tdew_r=Sat.Tdew
         self.Tsat_r=(self.Tbubble_r+self.Tdew_r)/2.0
         
         #Inlet enthalpy
-        hsatL=Props('H','T',self.Tbubble_r,'Q',0,self.Ref_r)*1000
-        hsatV=Props('H','T',self.Tdew_r,'Q',1,self.Ref_r)*1000
+        hsatL=Sat.L.h
+        hsatV=Sat.V.h
         self.xin_r=(self.hin_r-hsatL)/(hsatV-hsatL)
         
         #Change in enthalpy through two-phase region [J/kg]
-        self.h_fg=(Props('H','T',self.Tdew_r,'Q',1.0,self.Ref_r)-Props('H','T',self.Tbubble_r,'Q',0.0,self.Ref_r))*1000.
+        self.h_fg=Sat.h_fg
         self.Tin_r=self.xin_r*self.Tdew_r+(1-self.xin_r)*self.Tbubble_r
         #Inlet entropy
-        ssatL=Props('S','T',self.Tbubble_r,'Q',0,self.Ref_r)*1000
-        ssatV=Props('S','T',self.Tdew_r,'Q',1,self.Ref_r)*1000
+        ssatL=Sat.L.s
+        ssatV=Sat.V.s
         self.sin_r=self.xin_r*ssatV+(1-self.xin_r)*ssatL
         
         #Mean values for the glycol side based on average of inlet temperatures
         Tavg_g=(self.Tsat_r+self.Tin_g)/2.0
-        self.f_g,self.h_g,self.Re_g=f_h_1phase_Annulus(self.mdot_g, self.ID_o, self.OD_i, Tavg_g, self.pin_g, self.Ref_g)
-        self.cp_g=Props('C','T',Tavg_g,'P',self.pin_g,self.Ref_g)*1000
+        Glycol=State('T',Tavg_g,'P',self.pin_g,self.Ref_g)
+        self.f_g,self.h_g,self.Re_g=f_h_1phase_Annulus(self.mdot_g, self.ID_o, self.OD_i, Tavg_g, self.pin_g, self.Ref_g, FluidState=Glycol)
+        self.cp_g=Glycol.cp
         
         #Glycol pressure drop
-        v_g=1/Props('D','T',Tavg_g,'P',self.pin_g,self.Ref_g)
+        v_g=Glycol.v
         dpdz_g=-self.f_g*v_g*self.G_g**2/(2.*self.Dh_g) #Pressure gradient
         self.DP_g=dpdz_g*self.L
         
@@ -154,12 +156,12 @@ class CoaxialHXClass():
         self.DP_r=self.DP_r_2phase+self.DP_r_superheat
         
         if existsSuperheat==True:
-            self.hout_r=Props('H','T',self.Tout_r,'P',self.pin_r,self.Ref_r)*1000
-            self.sout_r=Props('S','T',self.Tout_r,'P',self.pin_r,self.Ref_r)*1000
+            Outlet=State('T',self.Tout_r,'P',self.pin_r,self.Ref_r)
         else:
             self.Tout_r=self.xout_2phase*self.Tdew_r+(1-self.xout_2phase)*self.Tbubble_r
-            self.hout_r=Props('H','T',self.Tout_r,'Q',self.xout_2phase,self.Ref_r)*1000
-            self.sout_r=Props('S','T',self.Tout_r,'Q',self.xout_2phase,self.Ref_r)*1000
+            Outlet=State('T',self.Tout_r,'Q',self.xout_2phase,self.Ref_r)
+        self.hout_r=Outlet.h
+        self.sout_r=Outlet.s
         
         #Dummy variables for the subcooled section which doesn't exist
         self.Q_subcool=0.0
@@ -174,8 +176,9 @@ class CoaxialHXClass():
         # Mean temperature for superheated part can be taken to be average
         # of dew and glycol inlet temps
         Tavg_sh_r=(self.Tdew_r+self.Tin_g)/2.0
-        self.f_r_superheat,self.h_r_superheat,self.Re_r_superheat=f_h_1phase_Tube(self.mdot_r, self.ID_i, Tavg_sh_r, self.pin_r, self.Ref_r)
-        cp_r_superheat=Props('C','T',Tavg_sh_r,'P',self.pin_r,self.Ref_r)*1000
+        Superheat=State('T',Tavg_sh_r,'P',self.pin_r,self.Ref_r)
+        self.f_r_superheat,self.h_r_superheat,self.Re_r_superheat=f_h_1phase_Tube(self.mdot_r, self.ID_i, Tavg_sh_r, self.pin_r, self.Ref_r, FluidState=Superheat)
+        cp_r_superheat=Superheat.cp
         # Overall conductance of heat transfer surface in superheated
         # portion
         UA_superheat=w_superheat/(1/(self.h_g*self.A_g_wetted)+1/(self.h_r_superheat*self.A_r_wetted))
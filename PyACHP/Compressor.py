@@ -1,5 +1,79 @@
 from __future__ import division #Make integer 3/2 give 1.5 in python 2.x
-from CoolProp.CoolProp import Props
+import os
+import numpy as np
+from Properties import Props,LRUCache,State
+
+#Directory with the coefficient files of the GUI
+CompsDirectory=os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','GUI','comps')
+
+#Properties at the state the maps are fitted for (20F of superheat), keyed by
+#refrigerant and suction pressure, and the isentropic discharge enthalpy from
+#that state, keyed by refrigerant, suction and discharge pressure
+_MapStateCache=LRUCache(maxsize=2000)
+_MapDischargeCache=LRUCache(maxsize=20000)
+
+def ClearCache():
+    """
+    Empty the caches of the map state properties
+    """
+    _MapStateCache.clear()
+    _MapDischargeCache.clear()
+
+def MapPolynomial(C,Tsat_s,Tsat_d):
+    """
+    The 10-coefficient polynomial of ANSI/AHRI standard 540 with the 
+    coefficients C, in the suction and discharge dew temperatures Tsat_s and
+    Tsat_d [F], which can be scalars or numpy arrays
+    """
+    return C[0] + C[1] * Tsat_s + C[2] * Tsat_d + C[3] * Tsat_s**2 + C[4] * Tsat_s * Tsat_d + C[5] * Tsat_d**2 + C[6] * Tsat_s**3 + C[7] * Tsat_d * Tsat_s**2 + C[8] * Tsat_d**2*Tsat_s + C[9] * Tsat_d**3
+
+def MapState(Ref,pin_r):
+    """
+    Suction dew temperature [K], and specific volume [m^3/kg], entropy and 
+    enthalpy [kJ/kg] at the 20F superheat state of the maps for the suction
+    pressure pin_r [kPa]
+    """
+    key=(Ref,pin_r)
+    Map=_MapStateCache.get(key)
+    if Map is None:
+        Tsat_s_K=Props('T','P',pin_r,'Q',1.0,Ref)
+        T1_map = Tsat_s_K + 20 * 5 / 9
+        Suction=State('T',T1_map,'P',pin_r,Ref)
+        v_map = Suction.v
+        s1_map = Suction.Props('S')
+        h1_map = Suction.Props('H')
+        Map=(Tsat_s_K,v_map,s1_map,h1_map)
+        _MapStateCache.set(key,Map)
+    return Map
+
+def MapDischargeEnthalpy(Ref,pin_r,pout_r):
+    """
+    Isentropic discharge enthalpy [kJ/kg] from the 20F superheat state of 
+    the maps at the suction pressure pin_r to the discharge pressure pout_r
+    """
+    key=(Ref,pin_r,pout_r)
+    h2s_map=_MapDischargeCache.get(key)
+    if h2s_map is None:
+        s1_map=MapState(Ref,pin_r)[2]
+        h2s_map = Props('H', 'S', s1_map, 'P', pout_r, Ref)
+        _MapDischargeCache.set(key,h2s_map)
+    return h2s_map
+
+def LoadCoefficients(path):
+    """
+    Read the map coefficients from a comma separated file in the format used
+    by the GUI: ten rows, with the mass flow coefficients (lbm/h) in the 
+    first column and the power coefficients (W) in the second.  path can 
+    also be the name of one of the files in GUI/comps without the extension
+    ('R410A' for instance).
+    
+    Returns a dictionary with the keys M and P, which can be passed to 
+    CompressorClass or to its Update method
+    """
+    if not os.path.exists(path):
+        path=os.path.join(CompsDirectory,path+'.csv')
+    A=np.loadtxt(path,delimiter=',')
+    return {'M':A[:,0].tolist(),'P':A[:,1].tolist()}
 
 class CompressorClass():
     """
@@ -21,7 +95,10 @@ class CompressorClass():
     ===========   ==========  ========================================================================
     
     All variables are of double-type unless otherwise specified
-        
+    
+    The coefficients can be read from the files of the GUI with 
+    LoadCoefficients, and CalculateMap evaluates the compressor for arrays of
+    operating points at once.
     """
     def __init__(self,**kwargs):
         #Load up the parameters passed in
@@ -83,7 +160,7 @@ class CompressorClass():
         M=self.M
         
         #Calculate suction superheat and dew temperatures
-        self.Tsat_s_K=Props('T','P',self.pin_r,'Q',1.0,self.Ref)
+        self.Tsat_s_K,v_map,s1_map,h1_map=MapState(self.Ref,self.pin_r)
         self.Tsat_d_K=Props('T','P',self.pout_r,'Q',1.0,self.Ref)
         self.DT_sh_K=self.Tin_r-self.Tsat_s_K
         
@@ -92,8 +169,8 @@ class CompressorClass():
         Tsat_d = self.Tsat_d_K * 9/5 - 459.67
     
         #Apply the 10 coefficient ARI map to saturation temps in F
-        power_map = P[0] + P[1] * Tsat_s + P[2] * Tsat_d + P[3] * Tsat_s**2 + P[4] * Tsat_s * Tsat_d + P[5] * Tsat_d**2 + P[6] * Tsat_s**3 + P[7] * Tsat_d * Tsat_s**2 + P[8] * Tsat_d**2*Tsat_s + P[9] * Tsat_d**3
-        mdot_map = M[0] + M[1] * Tsat_s + M[2] * Tsat_d + M[3] * Tsat_s**2 + M[4] * Tsat_s * Tsat_d + M[5] * Tsat_d**2 + M[6] * Tsat_s**3 + M[7] * Tsat_d * Tsat_s**2 + M[8] * Tsat_d**2*Tsat_s + M[9] * Tsat_d**3
+        power_map = MapPolynomial(P,Tsat_s,Tsat_d)
+        mdot_map = MapPolynomial(M,Tsat_s,Tsat_d)
     
         # Convert mass flow rate to kg/s from lbm/h
         mdot_map *= 0.000125998 
@@ -106,18 +183,15 @@ class CompressorClass():
         P2 = self.pout_r
         T1_actual = self.Tsat_s_K + self.DT_sh_K
     
-        v_map = 1 / Props('D', 'T', self.Tsat_s_K + 20.0/9.0*5.0, 'P', P1, self.Ref)
-        v_actual = 1 / Props('D', 'T', self.Tsat_s_K + self.DT_sh_K, 'P', P1, self.Ref)
+        Suction=State('T',T1_actual,'P',P1,self.Ref)
+        v_actual = Suction.v
         F = 0.75
         mdot = (1 + F * (v_map / v_actual - 1)) * mdot_map
     
-        T1_map = self.Tsat_s_K + 20 * 5 / 9
-        s1_map = Props('S', 'T', T1_map, 'P', P1, self.Ref)
-        h1_map = Props('H', 'T', T1_map, 'P', P1, self.Ref)
-        h2s_map = Props('H', 'S', s1_map, 'P', P2, self.Ref)
+        h2s_map = MapDischargeEnthalpy(self.Ref,P1,P2)
     
-        s1_actual = Props('S', 'T', T1_actual, 'P', P1, self.Ref)
-        h1_actual = Props('H', 'T', T1_actual, 'P', P1, self.Ref)
+        s1_actual = Suction.Props('S')
+        h1_actual = Suction.Props('H')
         h2s_actual = Props('H', 'S', s1_actual, 'P', P2, self.Ref)
     
         #Shaft power based on 20F superheat calculation from fit overall isentropic efficiency
@@ -127,13 +201,75 @@ class CompressorClass():
         self.eta_oi=mdot*(h2s_actual-h1_actual)/(power/1000)
         self.Tout_r = Props('T', 'H', h2, 'P', P2, self.Ref)
         self.sout_r = Props('S','T',self.Tout_r,'P',P2,self.Ref) * 1000
-        self.sin_r = Props('S','T',self.Tin_r,'P',P1,self.Ref) * 1000
+        self.sin_r = Suction.s
         self.hout_r = h2 * 1000
         self.hin_r = h1_actual * 1000
         self.mdot_r=mdot
         self.W=power
         self.CycleEnergyIn=power*(1-self.fp)
-        self.Vdot_pumped=mdot/Props('D','T',self.Tin_r,'P',P1,self.Ref)
+        self.Vdot_pumped=mdot*Suction.v
+        
+    def CalculateMap(self,Tsat_s_K,Tsat_d_K,DT_sh_K,Outlet=True):
+        """
+        Evaluate the compressor for arrays of suction and discharge dew 
+        temperatures [K] and suction superheats [K], which are broadcast 
+        against each other, with the coefficients, Ref, fp and Vdot_ratio of
+        this compressor.  The compressor itself is not changed.
+        
+        The maps are evaluated for all the points at once, and the map state
+        properties are only found once for each suction pressure.  If Outlet
+        is False the outlet temperature (one more property call per point) 
+        is not calculated.
+        
+        Returns a dictionary of arrays of mdot_r [kg/s], W [W], hin_r and 
+        hout_r [J/kg], eta_oi [-] and, if Outlet is True, Tout_r [K]
+        """
+        Tsat_s_K,Tsat_d_K,DT_sh_K=np.broadcast_arrays(*[np.asarray(T,dtype=float) for T in (Tsat_s_K,Tsat_d_K,DT_sh_K)])
+        shape=Tsat_s_K.shape
+        Tsat_s_K,Tsat_d_K,DT_sh_K=Tsat_s_K.ravel(),Tsat_d_K.ravel(),DT_sh_K.ravel()
+        N=len(Tsat_s_K)
+        
+        #Saturation pressures, once for each distinct temperature
+        psat={}
+        for T in np.unique(np.r_[Tsat_s_K,Tsat_d_K]):
+            psat[T]=Props('P','T',T,'Q',1.0,self.Ref)
+        P1=np.array([psat[T] for T in Tsat_s_K])
+        P2=np.array([psat[T] for T in Tsat_d_K])
+        
+        v_map=np.zeros(N)
+        h1_map=np.zeros(N)
+        h2s_map=np.zeros(N)
+        v_actual=np.zeros(N)
+        h1_actual=np.zeros(N)
+        h2s_actual=np.zeros(N)
+        for i in range(N):
+            T1_actual=Tsat_s_K[i]+DT_sh_K[i]
+            Tsat,v_map[i],s1_map,h1_map[i]=MapState(self.Ref,P1[i])
+            h2s_map[i]=MapDischargeEnthalpy(self.Ref,P1[i],P2[i])
+            Suction=State('T',T1_actual,'P',P1[i],self.Ref)
+            v_actual[i]=Suction.v
+            s1_actual=Suction.Props('S')
+            h1_actual[i]=Suction.Props('H')
+            h2s_actual[i]=Props('H','S',s1_actual,'P',P2[i],self.Ref)
+        
+        #The maps for all the points
+        Tsat_s = Tsat_s_K * 9/5 - 459.67
+        Tsat_d = Tsat_d_K * 9/5 - 459.67
+        power_map = MapPolynomial(self.P,Tsat_s,Tsat_d)*self.Vdot_ratio
+        mdot_map = MapPolynomial(self.M,Tsat_s,Tsat_d)*0.000125998*self.Vdot_ratio
+        F = 0.75
+        mdot = (1 + F * (v_map / v_actual - 1)) * mdot_map
+        power = power_map * (mdot / mdot_map) * (h2s_actual - h1_actual) / (h2s_map - h1_map)
+        h2 = power/1000 * (1 - self.fp) / mdot + h1_actual
+        
+        Results={'mdot_r':mdot,
+                 'W':power,
+                 'hin_r':h1_actual*1000,
+                 'hout_r':h2*1000,
+                 'eta_oi':mdot*(h2s_actual-h1_actual)/(power/1000)}
+        if Outlet:
+            Results['Tout_r']=np.array([Props('T','H',h2[i],'P',P2[i],self.Ref) for i in range(N)])
+        return dict((key,value.reshape(shape)) for key,value in Results.items())
         
 if __name__=='__main__':        
     for i in range(1):
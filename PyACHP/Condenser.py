@@ -1,9 +1,9 @@
 from __future__ import division #Make integer 3/2 give 1.5 in python 2.x
 from math import pi,log,exp
-from CoolProp.CoolProp import Props
+from Properties import Props,State,SatState
 from Correlations import f_h_1phase_Tube,ShahCondensation_Average,LMPressureGradientAvg,TwoPhaseDensity,AccelPressureDrop 
 from FinCorrelations import WavyLouveredFins,FinInputs,IsFinsClass
-from scipy.optimize import brentq
+from Instrumentation import brentq
 from ACHPTools import ValidateFields
 class FinVals():
     def __init__(self):
@@ -75,7 +75,7 @@ class CondenserClass():
         #Update the parameters passed in
         # using the dictionary
         self.__dict__.update(kwargs)
-        
+    
     def Calculate(self):
         #Only validate the first time
         if not hasattr(self,'IsValidated'):
@@ -101,8 +101,10 @@ class CondenserClass():
         self.Tin_a=self.Fins.Air.Tdb
 
         ## Bubble and dew temperatures (same for fluids without glide)
-        self.Tbubble=Props('T','P',self.psat_r,'Q',0.0,self.Ref)
-        self.Tdew=Props('T','P',self.psat_r,'Q',1.0,self.Ref)
+        self._Sat=SatState(self.Ref,p=self.psat_r)
+        self.Tbubble=self._Sat.Tbubble
+        self.Tdew=self._Sat.Tdew
+        self._Inlet=State('T',self.Tin_r,'P',self.psat_r,self.Ref)
         
         # Calculate an effective length of circuit if circuits are 
         # not all the same length
@@ -139,16 +141,16 @@ class CondenserClass():
         self.DP_r=self.DP_r_superheat+self.DP_r_2phase+self.DP_r_subcool
         self.Charge=self.Charge_2phase+self.Charge_subcool+self.Charge_superheat
         
-        self.sin_r=Props('S','T',self.Tin_r,'P',self.psat_r,self.Ref)*1000
+        self.sin_r=self._Inlet.s
         if self.existsSubcooled==True:
-            self.hout_r=Props('H','T',self.Tout_r,'P',self.psat_r,self.Ref)*1000
-            self.sout_r=Props('S','T',self.Tout_r,'P',self.psat_r,self.Ref)*1000
+            Outlet=State('T',self.Tout_r,'P',self.psat_r,self.Ref)
         else:
             self.Tout_r=self.xout_2phase*self.Tdew+(1-self.xout_2phase)*self.Tbubble
-            self.hout_r=Props('H','T',self.Tout_r,'Q',self.xout_2phase,self.Ref)*1000
-            self.sout_r=Props('S','T',self.Tout_r,'Q',self.xout_2phase,self.Ref)*1000
+            Outlet=State('T',self.Tout_r,'Q',self.xout_2phase,self.Ref)
             #Use the effective subcooling
             self.DT_sc=self.DT_sc_2phase
+        self.hout_r=Outlet.h
+        self.sout_r=Outlet.s
         
         #Calculate the mean outlet air temperature [K]
         self.Tout_a=self.Tin_a-self.Q/(self.Fins.cp_da*self.Fins.mdot_da)
@@ -167,10 +169,11 @@ class CondenserClass():
         # Average fluid temps are used for the calculation of properties 
         # Average temp of refrigerant is average of sat. temp and outlet temp		
         # Secondary fluid is air over the fins
+        Superheat=State('T', (Tdew+self.Tin_r)/2.0, 'P', self.psat_r, self.Ref)
         self.f_r_superheat, self.h_r_superheat, self.Re_r_superheat=f_h_1phase_Tube(self.mdot_r / self.Ncircuits, self.ID, 
-            (Tdew+self.Tin_r)/2.0, self.psat_r, self.Ref, "Single");
+            (Tdew+self.Tin_r)/2.0, self.psat_r, self.Ref, "Single", FluidState=Superheat);
             
-        cp_r = Props('C', 'T', (Tdew+self.Tin_r)/2, 'P', self.psat_r, self.Ref)*1000. #//[J/kg-K]
+        cp_r = Superheat.cp #//[J/kg-K]
 
         WavyLouveredFins(self.Fins)
         self.mdot_da=self.Fins.mdot_da
@@ -188,7 +191,7 @@ class CondenserClass():
         # Heat is removed here from the refrigerant since it is being cooled
         self.Q_superheat = self.mdot_r * cp_r * (Tdew-self.Tin_r)
 
-        rho_superheat=Props('D','T',(self.Tin_r+Tdew)/2.0, 'P', self.psat_r, self.Ref)
+        rho_superheat=Superheat.rho
         #Pressure drop calculations for superheated refrigerant
         v_r=1./rho_superheat;
         #Pressure gradient using Darcy friction factor
@@ -197,10 +200,8 @@ class CondenserClass():
         self.Charge_superheat = self.w_superheat * self.V_r * rho_superheat
 
         #Latent heat needed for pseudo-quality calc
-        Tbubble=Props('T','P',self.psat_r,'Q',0,self.Ref)
-        Tdew=Props('T','P',self.psat_r,'Q',1,self.Ref)
-        h_fg = (Props('H', 'T', Tdew, 'Q', 1, self.Ref) - Props('H', 'T', Tbubble, 'Q', 0, self.Ref))*1000 #J/kg
-        self.hin_r=Props('H','T',self.Tin_r,'P',self.psat_r,self.Ref)*1000
+        h_fg = self._Sat.h_fg #J/kg
+        self.hin_r=self._Inlet.h
         self.xin_r=1.0+cp_r*(self.Tin_r-Tdew)/h_fg
         
     def _TwoPhase_Forward(self,xout_r_2phase=0.0):
@@ -214,7 +215,7 @@ class CondenserClass():
         ## Mean temperature for use in HT relationships
         Tsat_r=(Tbubble+Tdew)/2
         
-        h_fg = (Props('H', 'T', Tdew, 'Q', 1, self.Ref) - Props('H', 'T', Tbubble, 'Q', 0, self.Ref))*1000 #J/kg
+        h_fg = self._Sat.h_fg #J/kg
         
         # This block calculates the average refrigerant heat transfer coefficient by
         # integrating the local heat transfer coefficient between 
@@ -247,7 +248,7 @@ class CondenserClass():
         
         #Calculate an effective pseudo-subcooling based on the equality
         #     cp*DT_sc=-dx*h_fg
-        cp_satL=Props('C','T',self.Tbubble,'Q',0.0,self.Ref)*1000
+        cp_satL=self._Sat.L.cp
         self.DT_sc_2phase=-self.xout_2phase*h_fg/(cp_satL)
             
         #If the quality is being solved for, the length of the two-phase and subcooled
@@ -261,7 +262,7 @@ class CondenserClass():
         if self.w_subcool<0:
             raise ValueError('w_subcool in Condenser cannot be less than zero')
         # Bubble temperature
-        Tbubble=Props('T','P',self.psat_r,'Q',0.0,self.Ref)
+        Tbubble=self.Tbubble
         
         # Based on the the construction of the cycle model there is guaranteed to be a 
         # two-phase portion of the heat exchanger
@@ -273,12 +274,12 @@ class CondenserClass():
         # Average fluid temps are used for the calculation of properties 
         # Average temp of refrigerant is average of sat. temp and outlet temp
         # Secondary fluid is air over the fins
-    
+        Subcool=State('T', Tbubble-1.0, 'P', self.psat_r, self.Ref)
         self.f_r_subcool, self.h_r_subcool, self.Re_r_subcool=f_h_1phase_Tube(
           self.mdot_r / self.Ncircuits, self.ID, Tbubble-1.0, self.psat_r, self.Ref,
-          "Single")
+          "Single", FluidState=Subcool)
         
-        cp_r = Props('C', 'T', Tbubble-1, 'P', self.psat_r, self.Ref)*1000 #[J/kg-K]
+        cp_r = Subcool.cp #[J/kg-K]
     
         # Cross-flow in the subcooled region.
         R_a=1. / (self.Fins.eta_a * self.Fins.h_a * self.Fins.A_a)
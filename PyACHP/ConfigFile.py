@@ -0,0 +1,338 @@
+'''
+Headless runner of the configuration files saved by the GUI
+
+A configuration file (see GUI/configs/Default.cfg) has one GUI field per line,
+in the form ``name : value``.  The fields are read directly into a
+DXCycleClass or SecondaryCycleClass in the same way as GUI2DXCycleInputs and
+GUI2SecondaryCycleInputs (GUI/ACHPFileIO.py) and RunCode (GUI/ACHPMainFrame.py)
+do, so neither wx nor a display is needed.  Output fields of the GUI (the
+results of the last run) are ignored, and the configuration is always solved
+at its design point, even if the parametric study was selected.
+
+From python::
+
+    from ConfigFile import LoadConfig
+    Cycle=LoadConfig('../GUI/configs/Default.cfg')
+    Cycle.PreconditionedSolve()
+
+LoadConfig can also be used as the factory of a parametric study (see
+Parametric)::
+
+    python Parametric.py --factory ConfigFile:LoadConfig
+        --factory-kwarg path=../GUI/configs/Default.cfg ...
+
+From the command line, solving many configurations in a pool of worker
+processes, and writing the output of each one (see ACHPTools.Write2CSV) to a
+CSV file of the same name in the output directory::
+
+    python ConfigFile.py --outdir Results --processes 8 configs/*.cfg
+
+A configuration that fails to solve is reported (and recorded in the failures
+file if one is given) without stopping the others.
+'''
+from __future__ import division
+import os
+import sys
+import traceback
+from math import pi
+from Cycle import DXCycleClass,SecondaryCycleClass
+from ACHPTools import Write2CSV
+
+def ReadConfigFile(path):
+    """
+    Read a configuration file saved by the GUI, returns a dictionary of the
+    values (as strings) keyed by the name of the GUI field
+    """
+    Config={}
+    f=open(path,'r')
+    for line in f:
+        if ':' not in line:
+            continue
+        #Only split at the first colon, paths on windows contain one too
+        name,value=line.split(':',1)
+        Config[name.strip()]=value.strip()
+    f.close()
+    return Config
+
+class ConfigValues(object):
+    """
+    Typed access to the values of a configuration read by ReadConfigFile
+    """
+    def __init__(self,Config):
+        self.Config=Config
+
+    def String(self,name):
+        if name not in self.Config:
+            raise KeyError('Field '+name+' not found in the configuration file')
+        return self.Config[name]
+
+    def Float(self,name):
+        return float(self.String(name))
+
+    def Int(self,name):
+        return int(float(self.String(name)))
+
+    def Bool(self,name):
+        return self.String(name).startswith('True')
+
+    def CoolingMode(self):
+        #radCycleMode is the index of the selection of 'Cooling Mode' and 'Heating Mode'
+        Mode=self.Int('radCycleMode')
+        if Mode not in (0,1):
+            raise ValueError('radCycleMode must be 0 (cooling) or 1 (heating), not '+str(Mode))
+        return Mode==0
+
+def _CompressorInputs(Compressor,V):
+    Compressor.M=[V.Float('txtCompM%d'%i) for i in range(1,11)]
+    Compressor.P=[V.Float('txtCompP%d'%i) for i in range(1,11)]
+    Compressor.fp=V.Float('txtCompfp')
+    Compressor.Vdot_ratio=V.Float('txtCompVdot_ratio')
+
+def _CoilInputs(Coil,V,Prefix):
+    """
+    Air, tube and fin inputs of a finned tube coil from the fields of the GUI
+    coil with the given prefix ('Condenser' for the outdoor coil or
+    'CoolingCoil' for the indoor coil)
+    """
+    Fins=Coil.Fins
+    Fins.Air.Vdot_ha=V.Float('txt'+Prefix+'AirVdot')
+    Fins.Air.Tdb=V.Float('txt'+Prefix+'AirTdb')
+    Fins.Air.p=V.Float('txt'+Prefix+'Airp')
+    Fins.Air.RH=V.Float('txt'+Prefix+'AirRH')
+    Fins.Air.Tmean=V.Float('txt'+Prefix+'AirTdb')
+    Fins.Air.RHmean=V.Float('txt'+Prefix+'AirRH')
+    Fins.Air.FanPower=V.Float('txt'+Prefix+'Power')
+    Fins.Tubes.NTubes_per_bank=V.Int('txt'+Prefix+'TubesNtubes')
+    Fins.Tubes.Nbank=V.Int('txt'+Prefix+'TubesNbank')
+    Fins.Tubes.Ltube=V.Float('txt'+Prefix+'TubesL')
+    Fins.Tubes.OD=V.Float('txt'+Prefix+'TubesOD')
+    Fins.Tubes.ID=V.Float('txt'+Prefix+'TubesID')
+    Fins.Tubes.Pl=V.Float('txt'+Prefix+'TubesPl')
+    Fins.Tubes.Pt=V.Float('txt'+Prefix+'TubesPt')
+    Fins.Tubes.Ncircuits=V.Int('txt'+Prefix+'TubesNcircuit')
+    Fins.Fins.FPI=V.Float('txt'+Prefix+'FinFPI')
+    Fins.Fins.Pd=V.Float('txt'+Prefix+'Finpd')
+    Fins.Fins.xf=V.Float('txt'+Prefix+'Finxf')
+    Fins.Fins.t=V.Float('txt'+Prefix+'Fint')
+    Fins.Fins.k_fin=V.Float('txt'+Prefix+'Fink')
+    Coil.Verbosity=0
+
+def _LineSetInputs(LineSet,V,Line):
+    """
+    Inputs of the supply or return line set, Line is 'supply' or 'return'
+    """
+    LineSet.L=V.Float('txtLineSetL')
+    LineSet.OD=V.Float('txtLineSetOD_'+Line)
+    LineSet.ID=V.Float('txtLineSetID_'+Line)
+    LineSet.t_insul=V.Float('txtLineSetInsult')
+    LineSet.k_tube=V.Float('txtLineSetTubek')
+    LineSet.k_insul=V.Float('txtLineSetInsulk')
+    LineSet.h_air=V.Float('txtLineSeth_air')
+    LineSet.T_air=V.Float('txtLineSetT_air')
+
+def Config2DXCycleInputs(V):
+    """
+    Build a DXCycleClass from the ConfigValues V, equivalent to
+    GUI2DXCycleInputs
+    """
+    Cycle=DXCycleClass()
+    _CompressorInputs(Cycle.Compressor,V)
+    #The outdoor coil is the condenser in cooling mode and the evaporator in
+    #heating mode
+    if V.CoolingMode():
+        _CoilInputs(Cycle.Condenser,V,'Condenser')
+        _CoilInputs(Cycle.Evaporator,V,'CoolingCoil')
+    else:
+        _CoilInputs(Cycle.Evaporator,V,'Condenser')
+        _CoilInputs(Cycle.Condenser,V,'CoolingCoil')
+    Cycle.Evaporator.DT_sh=V.Float('txtCycleDTsh')
+    _LineSetInputs(Cycle.LineSetSupply,V,'supply')
+    _LineSetInputs(Cycle.LineSetReturn,V,'return')
+    Cycle.Ref=V.String('cmbRefrigerant')
+    return Cycle
+
+def Config2SecondaryCycleInputs(V):
+    """
+    Build a SecondaryCycleClass from the ConfigValues V, equivalent to
+    GUI2SecondaryCycleInputs
+    """
+    Cycle=SecondaryCycleClass()
+    Ref=V.String('cmbRefrigerant')
+    SecLoopFluid=V.String('cmbSecFluid')
+    pin_g=V.Float('txtPumpp')
+    Cycle.Ref=Ref
+    Cycle.SecLoopFluid=SecLoopFluid
+    _CompressorInputs(Cycle.Compressor,V)
+
+    _CoilInputs(Cycle.CoolingCoil,V,'CoolingCoil')
+    Cycle.CoolingCoil.pin_g=pin_g
+    Cycle.CoolingCoil.Ref_g=SecLoopFluid
+
+    Cycle.Pump.mdot_g=V.Float('txtPumpmdot')
+    Cycle.Pump.eta=V.Float('txtPumpEfficiency')
+    Cycle.Pump.pin_g=pin_g
+    Cycle.Pump.Ref_g=SecLoopFluid
+
+    #The GUI uses the supply line set diameters for both lines of the
+    #secondary loop; kept so that the results are the same
+    for LineSet in [Cycle.LineSetSupply,Cycle.LineSetReturn]:
+        _LineSetInputs(LineSet,V,'supply')
+        LineSet.Ref=SecLoopFluid
+        LineSet.pin=pin_g
+
+    if V.Bool('optIHXUseCoaxial'):
+        Cycle.CoaxialIHX.ID_i=V.Float('txtIHXTubeID')
+        Cycle.CoaxialIHX.OD_i=V.Float('txtIHXAnnID')
+        Cycle.CoaxialIHX.ID_o=V.Float('txtIHXAnnOD')
+        Cycle.CoaxialIHX.L=V.Float('txtIHXLength')
+        Cycle.CoaxialIHX.pin_g=pin_g
+        Cycle.CoaxialIHX.Ref_g=SecLoopFluid
+        Cycle.CoaxialIHX.Ref_r=Ref
+        Cycle.CoaxialIHX.Verbosity=0
+        Cycle.IHXType='Coaxial'
+    else:
+        Cycle.PHEIHX.Bp=V.Float('txtIHXPlateBp')
+        Cycle.PHEIHX.Lp=V.Float('txtIHXPlateLp')
+        Cycle.PHEIHX.Nplates=V.Int('txtIHXPlateN')
+        Cycle.PHEIHX.PlateAmplitude=V.Float('txtIHXPlateAmplitude')
+        Cycle.PHEIHX.PlateThickness=V.Float('txtIHXPlateThickness')
+        Cycle.PHEIHX.PlateConductivity=V.Float('txtIHXPlateConductivity')
+        Cycle.PHEIHX.PlateWavelength=V.Float('txtIHXPlateWavelength')
+        Cycle.PHEIHX.InclinationAngle=V.Float('txtIHXInclinationAngle')/180.0*pi
+        Cycle.PHEIHX.Verbosity=0
+        Cycle.PHEIHX.DT_sh=V.Float('txtCycleDTsh')
+        Cycle.IHXType='PHE'
+        Cycle.PHEIHX.MoreChannels=['Hot','Cold'][V.Int('radIHXChannelSelect')]
+        if V.CoolingMode():
+            Cycle.PHEIHX.pin_h=pin_g
+            Cycle.PHEIHX.Ref_c=Ref
+            Cycle.PHEIHX.Ref_h=SecLoopFluid
+        else:
+            Cycle.PHEIHX.pin_c=pin_g
+            Cycle.PHEIHX.Ref_c=SecLoopFluid
+            Cycle.PHEIHX.Ref_h=Ref
+
+    #The outdoor coil is the condenser in cooling mode and the evaporator in
+    #heating mode
+    if V.CoolingMode():
+        _CoilInputs(Cycle.Condenser,V,'Condenser')
+    else:
+        _CoilInputs(Cycle.Evaporator,V,'Condenser')
+        Cycle.Evaporator.DT_sh=V.Float('txtCycleDTsh')
+    return Cycle
+
+def LoadConfig(path,Verbosity=0):
+    """
+    Build the (unsolved) cycle described by the configuration file at path
+    """
+    V=ConfigValues(ReadConfigFile(path))
+    if V.Bool('optCycleDX'):
+        Cycle=Config2DXCycleInputs(V)
+        Cycle.CycleType='DX'
+    else:
+        Cycle=Config2SecondaryCycleInputs(V)
+        Cycle.CycleType='Secondary'
+    if V.Bool('optCycleCharge'):
+        Cycle.ImposedVariable='Charge'
+    else:
+        Cycle.ImposedVariable='Subcooling'
+    Cycle.Charge_target=V.Float('txtCycleCharge')
+    Cycle.DT_sc_target=V.Float('txtCycleSubcooling')
+    if V.CoolingMode():
+        Cycle.Mode='AC'
+    else:
+        Cycle.Mode='HP'
+    Cycle.Verbosity=Verbosity
+    return Cycle
+
+def SolveConfig(path,outpath=None,Verbosity=0):
+    """
+    Solve the configuration file at path, and write the outputs with
+    Write2CSV to outpath if given.  Returns the solved cycle
+    """
+    Cycle=LoadConfig(path,Verbosity=Verbosity)
+    if isinstance(Cycle,DXCycleClass):
+        #Adds a column with the name of the configuration to the output
+        Cycle.TestName=os.path.splitext(os.path.basename(path))[0]
+    Cycle.PreconditionedSolve()
+    if outpath is not None:
+        Write2CSV(Cycle,outpath)
+    return Cycle
+
+def OutputPath(path,outdir=None):
+    """
+    CSV file for the outputs of the configuration at path: the same name with
+    the extension .csv, in outdir if given or else next to the configuration
+    """
+    name=os.path.splitext(os.path.basename(path))[0]+'.csv'
+    if outdir is None:
+        outdir=os.path.dirname(path)
+    return os.path.join(outdir,name)
+
+def _SolveConfigJob(Job):
+    """
+    Solve one configuration in a worker process, Job is a tuple of
+    (config path, output path, Verbosity).  Returns (config path, error
+    message) where the error message is None if it solved
+    """
+    path,outpath,Verbosity=Job
+    try:
+        SolveConfig(path,outpath,Verbosity)
+        return path,None
+    except Exception:
+        return path,traceback.format_exc().strip().split('\n')[-1]
+
+def RunConfigs(paths,outdir=None,processes=None,failpath=None,Verbosity=0):
+    """
+    Solve all the configuration files in paths, in a pool of processes worker
+    processes (all the cores if None, serially if 1), writing the outputs of
+    each one to OutputPath(path,outdir).  The failures are appended to
+    failpath if given.
+
+    Returns a list of (config path, error message) for the configurations
+    that failed
+    """
+    if outdir is not None and not os.path.exists(outdir):
+        os.makedirs(outdir)
+    Jobs=[(path,OutputPath(path,outdir),Verbosity) for path in paths]
+    if processes==1 or len(Jobs)<=1:
+        Results=(_SolveConfigJob(Job) for Job in Jobs)
+        pool=None
+    else:
+        from multiprocessing import Pool
+        pool=Pool(processes)
+        Results=pool.imap_unordered(_SolveConfigJob,Jobs)
+    Failures=[]
+    try:
+        for path,message in Results:
+            if message is None:
+                print 'Solved',path
+            else:
+                print 'FAILED',path,':',message
+                Failures.append((path,message))
+                if failpath is not None:
+                    fp=open(failpath,'a')
+                    fp.write(path+','+message.replace(',',';')+'\n')
+                    fp.close()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return Failures
+
+if __name__=='__main__':
+    from optparse import OptionParser
+    parser=OptionParser(usage='usage: %prog [options] config.cfg [config2.cfg ...]')
+    parser.add_option('--outdir',dest='outdir',default=None,help='directory for the CSV outputs (default: next to each configuration file)')
+    parser.add_option('-j','--processes',dest='processes',type='int',default=None,help='number of worker processes (default: number of cores)')
+    parser.add_option('--failures',dest='failures',default=None,help='CSV file to append the configurations that failed to')
+    parser.add_option('-v','--verbosity',dest='verbosity',type='int',default=0,help='verbosity of the cycle solver')
+    (options,args)=parser.parse_args()
+    if not args:
+        parser.error('no configuration files given')
+
+    Failures=RunConfigs(args,outdir=options.outdir,processes=options.processes,
+                        failpath=options.failures,Verbosity=options.verbosity)
+    print '%d of %d configurations solved'%(len(args)-len(Failures),len(args))
+    if Failures:
+        sys.exit(1)
@@ -1,10 +1,9 @@
 from __future__ import division #Make integer 3/2 give 1.5 in python 2.x
 from math import pi
-from CoolProp.CoolProp import Props
+from Properties import Props
 from Correlations import f_h_1phase_Tube
 from FinCorrelations import WavyLouveredFins,FinInputs
-from matplotlib import docstring
-from BaseDoc import BaseDocClass
+from BaseDoc import BaseDocClass,CopyDoc
 from DryWetSegment import DWSVals, DryWetSegment
 
 class CoolingCoilClass():
@@ -16,12 +15,12 @@ class CoolingCoilClass():
         """Load the parameters passed in using the dictionary"""
         self.__dict__.update(kwargs)
     
-    @docstring.copy_dedent(BaseDocClass.Update) #Use docs from Base Class
+    @CopyDoc(BaseDocClass.Update) #Use docs from Base Class
     def Update(self,**kwargs):
         """Update the parameters passed in using the dictionary"""
         self.__dict__.update(kwargs)
     
-    @docstring.copy_dedent(BaseDocClass.OutputList) #Use docs from Base Class
+    @CopyDoc(BaseDocClass.OutputList) #Use docs from Base Class
     def OutputList(self):
         return [
             ('Volumetric flow rate','m^3/s',self.Fins.Air.Vdot_ha),
@@ -1,8 +1,7 @@
 from __future__ import division #Make integer 3/2 give 1.5 in python 2.x
-from CoolProp.CoolProp import Props #,IsFluidType
+from Properties import Props,State,SatState #,IsFluidType
+from Instrumentation import CountFunctions
 from math import pi,log,sqrt,exp,cos,sin,tan,log10
-from scipy.integrate import quad,quadrature,trapz,simps,fixed_quad
-from scipy.optimize import brentq,fsolve
 import numpy as np
 
 try:
@@ -14,6 +13,72 @@ except ImportError:
 #Machine precision
 machine_eps=np.finfo(np.float).eps
 
+#Gauss-Legendre nodes and weights on [-1,1], keyed by order
+_GaussLegendreNodes={}
+
+def GaussLegendreAverage(f,x_min,x_max,N=8):
+    """
+    Average value of f between x_min and x_max using fixed-order Gauss-Legendre
+    quadrature.  f must accept a numpy array of x values and return an array
+    of the same shape, so the whole set of nodes is evaluated in one call
+    """
+    if abs(x_max-x_min)<5*machine_eps:
+        return float(np.asarray(f(np.array([x_min])))[0])
+    if N not in _GaussLegendreNodes:
+        _GaussLegendreNodes[N]=np.polynomial.legendre.leggauss(N)
+    xi,w=_GaussLegendreNodes[N]
+    x=(x_max-x_min)/2*xi+(x_max+x_min)/2
+    #Weights sum to 2, so dividing by 2 gives the average
+    return float(np.dot(w,f(x)))/2
+
+def SatTransport(Ref,Tbubble,Tdew):
+    """
+    Calculate the saturated liquid and vapor properties needed by the two-phase
+    correlations once, returned as a dictionary in SI units (J/kg, J/kg-K,
+    W/m-K, kg/m-s).  The keys 'v_f','v_g','mu_f','mu_g' are the ones expected
+    by the satTransport argument of LockhartMartinelli
+    """
+    Sat=SatState(Ref,Tbubble=Tbubble,Tdew=Tdew)
+    L,V=Sat.L,Sat.V
+    sat={}
+    sat['rho_f']=L.rho
+    sat['rho_g']=V.rho
+    sat['v_f']=1/sat['rho_f']
+    sat['v_g']=1/sat['rho_g']
+    sat['mu_f']=L.mu
+    sat['mu_g']=V.mu
+    sat['cp_f']=L.cp
+    sat['cp_g']=V.cp
+    sat['k_f']=L.k
+    sat['k_g']=V.k
+    sat['h_fg']=Sat.h_fg
+    return sat
+
+def _ScalarOrArray(value,x):
+    """
+    Return a float if x was a scalar, otherwise the array value
+    """
+    if np.ndim(x)==0:
+        return float(value)
+    return value
+
+def VoidFraction(x,rhof,rhog,slipModel='Zivi'):
+    """
+    Void fraction [-] for quality x (scalar or array) using either the Zivi
+    slip ratio or the homogeneous (no-slip) model
+    """
+    if slipModel=='Zivi':
+        S=pow(rhof/rhog,1/3)
+    elif slipModel=='Homogeneous':
+        S=1
+    else:
+        raise ValueError("slipModel must be either 'Zivi' or 'Homogeneous'")
+    xx=np.asarray(x,dtype=float)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        alpha=1/(1+S*rhog/rhof*(1-xx)/xx)
+    alpha=np.where(xx<=0,0.0,np.where(xx>=1,1.0,alpha))
+    return _ScalarOrArray(alpha,x)
+
 def Phase_ph(Ref,p,h,Tbubble,Tdew,rhosatL,rhosatV):
     """
     Convenience function to return just the Phase rather than densities and phase
@@ -30,8 +95,6 @@ def TrhoPhase_ph(Ref,p,h,Tbubble,Tdew,rhosatL=None,rhosatV=None):
     
     if str.lower(Ref)=='brine':
         #It is subcooled
-        # Use a guess of 10 degrees below max temp
-        Tguess=Props('M','T',0,'P',0, Ref)-10
         T=Props('T','H',h,'P',p,Ref)    # T_hp(Ref,h,p,Tguess)
         rho=Props('D','T',T,'P',p,Ref)
         return T,rho,'Subcooled'
@@ -51,15 +114,11 @@ def TrhoPhase_ph(Ref,p,h,Tbubble,Tdew,rhosatL=None,rhosatV=None):
         
         if h>hsatV:
             #It's superheated
-            cp=Props('C','T',Tdew,'D',rhosatV,Ref)
-            Tguess=Tdew+(h-hsatV)/cp
             T = Props('T','H',h,'P',p,Ref)
             rho=Props('D','T',T,'P',p,Ref)
             return T,rho,'Superheated'
         elif h<hsatL:
             # It's subcooled
-            cp=Props('C','T',Tbubble,'D',rhosatL,Ref)
-            Tguess=Tbubble-(hsatL-h)/cp
             T=Props('T','H',h,'P',p,Ref)
             rho=Props('D','T',T,'P',p,Ref)
             return T,rho,'Subcooled'
@@ -72,8 +131,9 @@ def TrhoPhase_ph(Ref,p,h,Tbubble,Tdew,rhosatL=None,rhosatV=None):
             return T,rho,'TwoPhase'
 
 def TwoPhaseDensity(Ref,xmin,xmax,Tdew,Tbubble,slipModel='Zivi'):
-    rhog=Props('D', 'T', Tdew, 'Q', 1, Ref)
-    rhof=Props('D', 'T', Tbubble, 'Q', 0, Ref)
+    Sat=SatState(Ref,Tbubble=Tbubble,Tdew=Tdew)
+    rhog=Sat.V.rho
+    rhof=Sat.L.rho
 
     if slipModel=='Zivi':
         S=pow(rhof/rhog,0.3333)
@@ -113,8 +173,9 @@ def AccelPressureDrop(x_min,x_max,Ref,G,Tbubble,Tdew,rhosatL=None,rhosatV=None,s
         subst(num1/alpha+num2/(1-alpha),x,0);
     """
     if rhosatL==None or rhosatV==None:
-        rhosatL=Props('D','T',Tbubble,'Q',0.0,Ref)
-        rhosatV=Props('D','T',Tdew,'Q',1.0,Ref)
+        Sat=SatState(Ref,Tbubble=Tbubble,Tdew=Tdew)
+        rhosatL=Sat.L.rho
+        rhosatV=Sat.V.rho
         
     def f(x,rhoL,rhoV):
         if abs(x)<1e-12:
@@ -122,13 +183,7 @@ def AccelPressureDrop(x_min,x_max,Ref,G,Tbubble,Tdew,rhosatL=None,rhosatV=None,s
         elif abs(1-x)<1e-12:
             return 1/rhosatV
         else:
-            if slipModel=='Zivi':
-                S=pow(rhoL/rhoV,1/3)
-            elif slipModel=='Homogeneous':
-                S=1
-            else:
-                raise ValueError("slipModel must be either 'Zivi' or 'Homogeneous'")
-            alpha=1/(1+S*rhoV/rhoL*(1-x)/x)
+            alpha=VoidFraction(x,rhoL,rhoV,slipModel)
             return x**2/rhoV/alpha+(1-x)**2/rhoL/(1-alpha)
     return G**2*(f(x_min,rhosatL,rhosatV)-f(x_max,rhosatL,rhosatV))
         
@@ -162,16 +217,13 @@ def LMPressureGradientAvg(x_min,x_max,Ref,G,D,Tbubble,Tdew,C=None,satTransport=N
         return LMFunc(x_min)
     else:
         #Calculate the tranport properties once
-        satTransport={}
-        satTransport['v_f']=1/Props('D','T',Tbubble,'Q',0.0,Ref)
-        satTransport['v_g']=1/Props('D','T',Tdew,'Q',1.0,Ref)
-        satTransport['mu_f']=Props('V','T',Tbubble,'Q',0.0,Ref)
-        satTransport['mu_g']=Props('V','T',Tdew,'Q',1.0,Ref)
+        if satTransport==None:
+            satTransport=SatTransport(Ref,Tbubble,Tdew)
         
+        #Evaluate the whole grid of qualities at once
         xx=np.linspace(x_min,x_max,30)
-        DP=np.zeros_like(xx)
-        for i in range(len(xx)):
-            DP[i]=LMFunc(xx[i])
+        DP,alpha=LockhartMartinelli_Array(Ref,G,D,xx,Tbubble,Tdew,C,satTransport)
+        from scipy.integrate import simps
         return -simps(DP,xx)/(x_max-x_min)
 
 def LockhartMartinelli(Ref, G, D, x, Tbubble,Tdew,C=None,satTransport=None):
@@ -185,10 +237,11 @@ def LockhartMartinelli(Ref, G, D, x, Tbubble,Tdew,C=None,satTransport=None):
     #UseSaturationLUT(1)
     if satTransport==None:
         # Calculate Necessary saturation properties
-        v_f=1/Props('D','T',Tbubble,'Q',0.0,Ref)
-        v_g=1/Props('D','T',Tdew,'Q',1.0,Ref)
-        mu_f=Props('V','T',Tbubble,'Q',0.0,Ref)
-        mu_g=Props('V','T',Tdew,'Q',1.0,Ref)
+        Sat=SatState(Ref,Tbubble=Tbubble,Tdew=Tdew)
+        v_f=Sat.L.v
+        v_g=Sat.V.v
+        mu_f=Sat.L.mu
+        mu_g=Sat.V.mu
     else:
         #Pull out of the dictionary
         v_f=satTransport['v_f']
@@ -272,37 +325,97 @@ def LockhartMartinelli(Ref, G, D, x, Tbubble,Tdew,C=None,satTransport=None):
     
     return dpdz,alpha
 
-def ShahEvaporation_Average(x_min,x_max,Ref,G,D,p,q_flux,Tbubble,Tdew):
+def _LMFrictionFactor(Re):
     """
-    Returns the average pressure gradient between qualities of x_min and x_max.
+    Fanning friction factor used in LockhartMartinelli_Array, with linear
+    interpolation between laminar and turbulent for 1000<Re<2000
+    """
+    w=(Re-1000)/(2000-1000)
+    return np.where(Re<1000,16.0/Re,
+                    np.where(Re>2000,0.046/Re**0.2,
+                             w*16.0/Re+(1-w)*0.046/Re**0.2))
+
+def LockhartMartinelli_Array(Ref, G, D, x, Tbubble,Tdew,C=None,satTransport=None):
+    """
+    Same as LockhartMartinelli but x is an array of qualities, all of which are
+    evaluated in one pass.  Returns arrays of dpdz and alpha
+    """
+    x=np.asarray(x,dtype=float)
+    if satTransport==None:
+        satTransport=SatTransport(Ref,Tbubble,Tdew)
+    v_f=satTransport['v_f']
+    v_g=satTransport['v_g']
+    mu_f=satTransport['mu_f']
+    mu_g=satTransport['mu_g']
+    
+    with np.errstate(divide='ignore',invalid='ignore'):
+        # 1. Reynolds Number for each phase
+        Re_g=G*x*D/mu_g
+        Re_f=G*(1-x)*D/mu_f
+        
+        # 2. Friction factor for each phase (zero if the phase is absent)
+        f_f=np.where(x==1,0.0,_LMFrictionFactor(Re_f))
+        f_g=np.where(x==0,0.0,_LMFrictionFactor(Re_g))
+        
+        # 3. Frictional pressure drop based on actual flow rate of each phase
+        dpdz_f=2*f_f*G**2*(1-x)**2*v_f/D
+        dpdz_g=2*f_g*G**2*x**2*v_g/D
+        
+        # 4. Lockhart-Martinelli parameter
+        X=np.sqrt(dpdz_f/dpdz_g)
+        
+        # 5. Constant based on the flow Re of each phase
+        if C==None:
+            C=np.where((Re_f>1500)&(Re_g>1500),20.0,
+                       np.where((Re_f<1500)&(Re_g>1500),12.0,
+                                np.where((Re_f>1500)&(Re_g<1500),10.0,5.0)))
+        
+        # 6. Two-phase multipliers for each phase
+        phi_g2=1+C*X+X**2
+        phi_f2=1+C/X+1/X**2
+        
+        # 7. Gradient
+        dpdz=np.maximum(dpdz_g*phi_g2,dpdz_f*phi_f2)
+        
+        # 8. Void Fraction
+        alpha=1-X/np.sqrt(X*X+20*X+1)
     
-    To obtain the pressure gradient for a given value of x, pass it in as x_min and x_max
+    #Entirely liquid or entirely vapor
+    dpdz=np.where(x<=0,dpdz_f,np.where(x>=1,dpdz_g,dpdz))
+    alpha=np.where(x<=0,0.0,np.where(x>=1,1.0,alpha))
+    return dpdz,alpha
+
+def ShahEvaporation_Array(x,Ref,G,D,q_flux,Tbubble,Tdew,satTransport=None):
+    """
+    Shah evaporation heat transfer coefficient [W/m^2-K] evaluated for an
+    array of qualities x in one pass
     
     Required parameters:
-    * x_min : The minimum quality for the range [-]
-    * x_max : The maximum quality for the range [-]
+    * x : Array of qualities [-]
     * Ref : String with the refrigerant name
     * G : Mass flux [kg/m^2/s]
     * D : Diameter of tube [m]
-    * p : Pressure [kPa]
     * q_flux : Heat transfer flux [W/m^2]
     * Tbubble : Bubblepoint temperature of refrigerant [K]
     * Tdew : Dewpoint temperature of refrigerant [K]
+    
+    Optional parameters:
+    * satTransport : dictionary of saturation properties from SatTransport
     """
     # ********************************
     #        Necessary Properties
     # ********************************
-    v_g = 1 / Props('D', 'T', Tdew, 'Q', 1, Ref)# [m^3/kg]
-    v_f = 1 / Props('D', 'T', Tbubble, 'Q', 0, Ref)# [m^3/kg]
-    rho_f = 1 / v_f# [kg/m^3]
-    rho_g = 1 / v_g# [kg/m^3]
-    mu_f = Props('V', 'T', Tbubble, 'Q', 0, Ref)# [kg/m-s] 
-    mu_g = Props('V', 'T', Tdew, 'Q', 1, Ref)# [kg/m-s] 
-    h_fg = (Props('H', 'T', Tdew, 'Q', 1, Ref) - Props('H', 'T', Tbubble, 'Q', 0, Ref))*1000 #[J/kg]
-    cp_f = Props('C', 'T', Tbubble, 'Q', 0, Ref)*1000 # [J/kg-K]
-    cp_g = Props('C', 'T', Tdew, 'Q', 1, Ref)*1000 # [J/kg-K]
-    k_f = Props('L', 'T', Tbubble, 'Q', 0, Ref)*1000 # [W/m-K]
-    k_g = Props('L', 'T', Tdew, 'Q', 1, Ref)*1000 # [W/m-K]
+    if satTransport==None:
+        satTransport=SatTransport(Ref,Tbubble,Tdew)
+    rho_f = satTransport['rho_f']# [kg/m^3]
+    rho_g = satTransport['rho_g']# [kg/m^3]
+    mu_f = satTransport['mu_f']# [kg/m-s] 
+    mu_g = satTransport['mu_g']# [kg/m-s] 
+    h_fg = satTransport['h_fg'] #[J/kg]
+    cp_f = satTransport['cp_f'] # [J/kg-K]
+    cp_g = satTransport['cp_g'] # [J/kg-K]
+    k_f = satTransport['k_f'] # [W/m-K]
+    k_g = satTransport['k_g'] # [W/m-K]
     Pr_f = cp_f * mu_f / k_f #[-]
     Pr_g = cp_g * mu_g / k_g #[-]
 
@@ -319,50 +432,57 @@ def ShahEvaporation_Average(x_min,x_max,Ref,G,D,p,q_flux,Tbubble,Tdew):
         F = 14.7
     else:
         F = 15.43
+    if Bo > 0.00003:
+        psi_nb = 230 * (Bo)**(0.5)
+    else:
+        psi_nb = 1.0 + 46.0 * (Bo)**(0.5)
     #Pure vapor single-phase heat transfer coefficient
-    h_g = 0.023 * (G*D/mu_g)**(0.8) * Pr_g**(0.4) * k_g / D #[W/m^2-K]    
+    h_g = 0.023 * (G*D/mu_g)**(0.8) * Pr_g**(0.4) * k_g / D #[W/m^2-K]
+    
     def ShahEvaporation(x):
-        if abs(1-x)<5*machine_eps:
-            return h_g
-            
-        #If the quality is above 0.999, linearly interpolate to avoid division by zero
-        if x>0.999:
-            h_1=ShahEvaporation(1.0) #Fully fry
-            h_999=ShahEvaporation(0.999) #At a quality of 0.999
-            return (h_1-h_999)/(1.0-0.999)*(x-0.999)+h_999 #Linear interpolation
-        if abs(x)<5*machine_eps:
-            h_L = 0.023 * (G*(1 - x)*D/mu_f)**(0.8) * Pr_f**(0.4) * k_f / D #[W/m^2-K]
-            return h_L
-        else:
-            h_L = 0.023 * (G*(1 - x)*D/mu_f)**(0.8) * Pr_f**(0.4) * k_f / D #[W/m^2-K]
-        Co = (1 / x - 1)**(0.8) * (rho_g / rho_f)**(0.5) #[-]
-
-        if Fr_L >= 0.04:
-            N = Co
-        else:
-            N = 0.38 * Fr_L**(-0.3) * Co
-
-        psi_cb = 1.8 / N**(0.8)
-        if (0.1 < N and N <= 1.0):
-            psi_bs = F * (Bo)**(0.5) * exp(2.74 * N**(-0.1))
-            psi = max([psi_bs, psi_cb])
-        else:
-            if (N > 1.0):
-                if (Bo > 0.00003):
-                    psi_nb = 230 * (Bo)**(0.5)
-                else:
-                    psi_nb = 1.0 + 46.0 * (Bo)**(0.5)
-                psi = max([psi_nb,psi_cb])
+        h_L = 0.023 * (G*(1 - x)*D/mu_f)**(0.8) * Pr_f**(0.4) * k_f / D #[W/m^2-K]
+        with np.errstate(divide='ignore',invalid='ignore'):
+            Co = (1 / x - 1)**(0.8) * (rho_g / rho_f)**(0.5) #[-]
+            if Fr_L >= 0.04:
+                N = Co
             else:
-                psi_bs = F * (Bo)**(0.5) * exp(2.47 * N**(-0.15))
-                psi = max([psi_bs, psi_cb])
-        return psi * h_L #[W/m^2-K]
+                N = 0.38 * Fr_L**(-0.3) * Co
+            psi_cb = 1.8 / N**(0.8)
+            psi_bs1 = F * (Bo)**(0.5) * np.exp(2.74 * N**(-0.1))
+            psi_bs2 = F * (Bo)**(0.5) * np.exp(2.47 * N**(-0.15))
+        psi = np.where((0.1 < N) & (N <= 1.0), np.maximum(psi_bs1, psi_cb),
+                       np.where(N > 1.0, np.maximum(psi_nb, psi_cb),
+                                np.maximum(psi_bs2, psi_cb)))
+        #Pure liquid at zero quality
+        return np.where(np.abs(x)<5*machine_eps, h_L, psi * h_L) #[W/m^2-K]
+    
+    x=np.asarray(x,dtype=float)
+    h=ShahEvaporation(np.minimum(x,0.999))
+    #If the quality is above 0.999, linearly interpolate to avoid division by zero
+    h_999=float(ShahEvaporation(np.array(0.999)))
+    h=np.where(x>0.999,(h_g-h_999)/(1.0-0.999)*(x-0.999)+h_999,h)
+    return h
+
+def ShahEvaporation_Average(x_min,x_max,Ref,G,D,p,q_flux,Tbubble,Tdew):
+    """
+    Returns the average heat transfer coefficient between qualities of x_min and x_max.
+    
+    To obtain the heat transfer coefficient for a given value of x, pass it in as x_min and x_max
     
+    Required parameters:
+    * x_min : The minimum quality for the range [-]
+    * x_max : The maximum quality for the range [-]
+    * Ref : String with the refrigerant name
+    * G : Mass flux [kg/m^2/s]
+    * D : Diameter of tube [m]
+    * p : Pressure [kPa]
+    * q_flux : Heat transfer flux [W/m^2]
+    * Tbubble : Bubblepoint temperature of refrigerant [K]
+    * Tdew : Dewpoint temperature of refrigerant [K]
+    """
     #Calculate h over the range of x
     x=np.linspace(x_min,x_max,10)
-    h=np.zeros_like(x)
-    for i in range(len(x)):
-        h[i]=ShahEvaporation(x[i])
+    h=ShahEvaporation_Array(x,Ref,G,D,q_flux,Tbubble,Tdew)
     
     #if x_min == x_max, or they are really really close to being the same
     if abs(x_max-x_min)<5*machine_eps:
@@ -370,68 +490,99 @@ def ShahEvaporation_Average(x_min,x_max,Ref,G,D,p,q_flux,Tbubble,Tdew):
         return h[0]
     else:
         #Use Simpson's rule to carry out numerical integration to get average
+        from scipy.integrate import simps
         return simps(h,x)/(x_max-x_min)
+
 def LongoCondensation(x_avg,G,dh,Ref,TsatL,TsatV):
-    rho_L = Props('D', 'T', TsatL, 'Q', 0, Ref) #kg/m^3
-    rho_V = Props('D', 'T', TsatV, 'Q', 1, Ref) #kg/m^3
-    mu_L = Props('V', 'T', TsatL, 'Q', 0, Ref) #kg/m-s 
-    cp_L = Props('C', 'T', TsatL, 'Q', 0, Ref)*1000 #J/kg-K
-    k_L = Props('L', 'T', TsatV, 'Q', 0, Ref)*1000 #W/m-K
+    """
+    x_avg can be a scalar or an array of qualities
+    """
+    Sat=SatState(Ref,Tbubble=TsatL,Tdew=TsatV)
+    rho_L = Sat.L.rho #kg/m^3
+    rho_V = Sat.V.rho #kg/m^3
+    mu_L = Sat.L.mu #kg/m-s 
+    cp_L = Sat.L.cp #J/kg-K
+    #The liquid conductivity is evaluated at the dew temperature
+    k_L = State('T', TsatV, 'Q', 0, Ref).k #W/m-K
     Pr_L = cp_L * mu_L / k_L #[-]
     
-    Re_eq=G*((1-x_avg)+x_avg*sqrt(rho_L/rho_V))*dh/mu_L
+    Re_eq=G*((1-np.asarray(x_avg))+np.asarray(x_avg)*sqrt(rho_L/rho_V))*dh/mu_L
     
-    if Re_eq<1750:
-        Nu=60*Pr_L**(1/3)
-    else:
-        Nu=((75-60)/(3000-1750)*(Re_eq-1750)+60)*Pr_L**(1/3)
+    Nu=np.where(Re_eq<1750,60*Pr_L**(1/3),
+                ((75-60)/(3000-1750)*(Re_eq-1750)+60)*Pr_L**(1/3))
     h=Nu*k_L/dh
-    return h
+    return _ScalarOrArray(h,x_avg)
     
 def ShahCondensation_Average(x_min,x_max,Ref,G,D,p,TsatL,TsatV):
     # ********************************
     #        Necessary Properties
     #    Calculated outside the quadrature integration for speed
     # ********************************
-    mu_f = Props('V', 'T', TsatL, 'Q', 0, Ref) #kg/m-s 
-    cp_f = Props('C', 'T', TsatL, 'Q', 0, Ref)*1000 #J/kg-K
-    k_f = Props('L', 'T', TsatV, 'Q', 0, Ref)*1000 #W/m-K
+    L = State('T', TsatL, 'Q', 0, Ref)
+    mu_f = L.mu #kg/m-s 
+    cp_f = L.cp #J/kg-K
+    #The liquid conductivity is evaluated at the dew temperature
+    k_f = State('T', TsatV, 'Q', 0, Ref).k #W/m-K
     Pr_f = cp_f * mu_f / k_f #[-]
     Pstar = p / Props(Ref,'pcrit')
     h_L = 0.023 * (G*D/mu_f)**(0.8) * Pr_f**(0.4) * k_f / D #[W/m^2-K]
-    def ShahCondensation(x,Ref,G,D,p):
+    def ShahCondensation(x):
         return h_L * ((1 - x)**(0.8) + (3.8 * x**(0.76) * (1 - x)**(0.04)) / (Pstar**(0.38)) )
         
     if not x_min==x_max:
-        #A proper range is given
-        return quad(ShahCondensation,x_min,x_max,args=(Ref,G,D,p))[0]/(x_max-x_min)
+        #A proper range is given, all the nodes are evaluated at once
+        return GaussLegendreAverage(ShahCondensation,x_min,x_max,N=10)
     else:
         #A single value is given
-        return ShahCondensation(x_min,Ref,G,D,p)
+        return ShahCondensation(x_min)
+
+def ShahCondensation_Array(x,Ref,G,D,p,TsatL,TsatV):
+    """
+    Shah condensation heat transfer coefficient [W/m^2-K] evaluated for an
+    array of qualities x in one pass
+    """
+    L = State('T', TsatL, 'Q', 0, Ref)
+    mu_f = L.mu #kg/m-s 
+    cp_f = L.cp #J/kg-K
+    #The liquid conductivity is evaluated at the dew temperature
+    k_f = State('T', TsatV, 'Q', 0, Ref).k #W/m-K
+    Pr_f = cp_f * mu_f / k_f #[-]
+    Pstar = p / Props(Ref,'pcrit')
+    h_L = 0.023 * (G*D/mu_f)**(0.8) * Pr_f**(0.4) * k_f / D #[W/m^2-K]
+    x=np.asarray(x,dtype=float)
+    return h_L * ((1 - x)**(0.8) + (3.8 * x**(0.76) * (1 - x)**(0.04)) / (Pstar**(0.38)) )
     
-def f_h_1phase_Tube(mdot,ID,T, p,Fluid,Phase='Single'):
+def _SinglePhaseState(T, p, Fluid, Phase):
+    """
+    State of the fluid for the single-phase correlations, saturated vapor at
+    T if Phase is 'SatVap', otherwise at (T,p)
+    """
+    if Phase == "SatVap":
+        return State('T', T, 'Q', 1, Fluid)
+    else:
+        return State('T', T, 'P', p, Fluid)
+
+def f_h_1phase_Tube(mdot,ID,T, p,Fluid,Phase='Single',FluidState=None):
     """ 
     Convenience function to run annular model for tube.  Tube is a degenerate case of annulus with inner diameter of 0
     
     """
-    return f_h_1phase_Annulus(mdot, ID, 0.0, T, p, Fluid, Phase='Single' )
+    return f_h_1phase_Annulus(mdot, ID, 0.0, T, p, Fluid, Phase='Single', FluidState=FluidState)
 
-def f_h_1phase_Annulus(mdot, OD, ID, T, p, Fluid, Phase='Single'):
+def f_h_1phase_Annulus(mdot, OD, ID, T, p, Fluid, Phase='Single', FluidState=None):
     """
+    Friction factor, heat transfer coefficient and Reynolds number of the
+    single-phase flow in an annulus
     
+    If the State of the fluid at (T,p) is already known it can be passed in
+    as FluidState, so that the caller and the correlation share it
     """
-    if Phase =="SatVap":
-        mu = Props('V', 'T', T, 'Q', 1, Fluid) #kg/m-s
-        cp = Props('C', 'T', T, 'Q', 1, Fluid)*1000. #J/kg-K
-        k = Props('L', 'T', T, 'Q', 1, Fluid)*1000. #W/m-K
-        rho = Props('D', 'T', T, 'Q', 1, Fluid) #kg/m^3
-    else:
-        mu = Props('V', 'T', T, 'P', p, Fluid)  #kg/m-s
-        cp = Props('C', 'T', T, 'P', p, Fluid)*1000. #J/kg-K
-        k = Props('L', 'T', T, 'P', p, Fluid)*1000. #W/m-K
-        rho = Props('D', 'T', T, 'P', p, Fluid) #kg/m^3
-
-    Pr = cp * mu / k #[-]
+    if FluidState is None:
+        FluidState = _SinglePhaseState(T, p, Fluid, Phase)
+    mu = FluidState.mu #kg/m-s
+    k = FluidState.k #W/m-K
+    rho = FluidState.rho #kg/m^3
+    Pr = FluidState.Pr #[-]
 
     Dh = OD - ID
     Area=pi*(OD**2-ID**2)/4.0
@@ -449,20 +600,14 @@ def f_h_1phase_Annulus(mdot, OD, ID, T, p, Fluid, Phase='Single'):
     h = k*Nu/Dh #W/m^2-K
     return (f, h, Re)
 
-def f_h_1phase_Channel(mdot,W,H,T,p,Fluid,Phase):
-
-    if Phase=="SatVap":
-        mu = Props('V', 'T', T, 'Q', 1, Fluid) #kg/m-s
-        cp = Props('C', 'T', T, 'Q', 1, Fluid)*1000. #J/kg-K
-        k = Props('L', 'T', T, 'Q', 1, Fluid)*1000. #W/m-K
-        rho = Props('D', 'T', T, 'Q', 1, Fluid) #kg/m^3
-    else:
-        mu = Props('V', 'T', T, 'P', p, Fluid); ##kg/m-s
-        cp = Props('C', 'T', T, 'P', p, Fluid)*1000. #J/kg-K
-        k = Props('L', 'T', T, 'P', p, Fluid)*1000. #W/m-K
-        rho = Props('D', 'T', T, 'P', p, Fluid) #kg/m^3
+def f_h_1phase_Channel(mdot,W,H,T,p,Fluid,Phase,FluidState=None):
 
-    Pr = cp * mu / k #[-]
+    if FluidState is None:
+        FluidState = _SinglePhaseState(T, p, Fluid, Phase)
+    mu = FluidState.mu #kg/m-s
+    k = FluidState.k #W/m-K
+    rho = FluidState.rho #kg/m^3
+    Pr = FluidState.Pr #[-]
 
     Dh = 2*H*W/(H+W)
     Area=W*H
@@ -553,12 +698,13 @@ def PHE_1phase_hdP(Inputs,JustGeo=False):
         #Also calculate the thermodynamics and pressure drop
         
         #"Glycol" properties
-        rho_g=Props('D','T',T,'P',p,Ref)
-        eta_g=Props('V','T',T,'P',p,Ref)
-        cp_g=Props('C','T',T,'P',p,Ref)*1000
-        k_g=Props('L','T',T,'P',p,Ref)*1000
+        S=State('T',T,'P',p,Ref)
+        rho_g=S.rho
+        eta_g=S.mu
+        cp_g=S.cp
+        k_g=S.k
         
-        Pr_g=cp_g*eta_g/k_g
+        Pr_g=S.Pr
         
         eta_g_w=eta_g #TODO: allow for temperature dependence?
         w_g=mdot_gap/rho_g/(2*PlateAmplitude*Bp)
@@ -621,14 +767,19 @@ def KandlikarPHE(Ref,xmean,G,D,q,Tbubble,Tdew):
     From http://www.rit.edu/kgcoe/mechanical/taleme/Papers/Conference%20Papers/C041.pdf
     
     Not recommended for fluids other than R134a
+    
+    xmean can be a scalar or an array of qualities
     """
-    rhoG=Props('D','T',Tdew,'Q',1,Ref)
-    rhoL=Props('D','T',Tbubble,'Q',0,Ref)
-    mu_f = Props('V', 'T', Tbubble, 'Q', 0, Ref) #kg/m-s 
-    cp_f = Props('C', 'T', Tbubble, 'Q', 0, Ref)*1000 #J/kg-K
-    k_f = Props('L', 'T', Tdew, 'Q', 0, Ref)*1000 #W/m-K
+    xmean=np.asarray(xmean,dtype=float)
+    Sat=SatState(Ref,Tbubble=Tbubble,Tdew=Tdew)
+    rhoG=Sat.V.rho
+    rhoL=Sat.L.rho
+    mu_f = Sat.L.mu #kg/m-s 
+    cp_f = Sat.L.cp #J/kg-K
+    #The liquid conductivity is evaluated at the dew temperature
+    k_f = State('T', Tdew, 'Q', 0, Ref).k #W/m-K
     Pr_f = cp_f * mu_f / k_f #[-]
-    h_LG=Props('H','T',Tdew,'Q',1,Ref)*1000-Props('H','T',Tbubble,'Q',0,Ref)*1000
+    h_LG=Sat.h_fg
     alpha_L = 0.023 * (G*D/mu_f)**(0.8) * Pr_f**(0.4) * k_f / D #[W/m^2-K]
     Co=(rhoG/rhoL)**(0.5)*((1-xmean)/xmean)**(0.8)
     Bo=q/(G*h_LG)
@@ -637,10 +788,16 @@ def KandlikarPHE(Ref,xmean,G,D,q,Tbubble,Tdew):
 #    F_fl=1.0
     #alpha_r=(2.312*Co**(-0.3)*E_CB+667.3*Bo**(2.8)*F_fl*E_NB)*(1-xmean)**(0.003)*alpha_L
     alpha_r=1.055*(1.056*Co**(-0.4)+1.02*Bo**(0.9))*xmean**(-0.12)*alpha_L**(0.98)
-    return alpha_r
+    return _ScalarOrArray(alpha_r,xmean)
 
 def Bertsch_MC(x,Ref,G,Dh,q,L,Tbubble,Tdew):
-    p=Props('P','T',Tdew,'Q',1.0,Ref)
+    """
+    x can be a scalar or an array of qualities
+    """
+    x=np.asarray(x,dtype=float)
+    Sat=SatState(Ref,Tbubble=Tbubble,Tdew=Tdew)
+    L,V=Sat.L,Sat.V
+    p=V.p
     pc=Props('E','T',0,'P',0,Ref)
     pr=p/pc
     M=Props('M','T',0,'P',0,Ref)
@@ -652,14 +809,15 @@ def Bertsch_MC(x,Ref,G,Dh,q,L,Tbubble,Tdew):
         ## From Okada 1999 "Surface Tension of HFC Refrigerant Mixtures"
         sig=62.38*(1-Tdew/344.56)**(1.246)/1000.
     
-    k_L=Props('L','T',Tbubble,'Q',0,Ref)*1000
-    k_G=Props('L','T',Tdew,'Q',1,Ref)*1000
-    cp_L=Props('C','T',Tbubble,'Q',0,Ref)*1000
-    cp_G=Props('C','T',Tdew,'Q',1,Ref)*1000
-    rho_L=Props('D','T',Tbubble,'Q',0,Ref)
-    rho_G=Props('D','T',Tdew,'Q',1,Ref)
-    mu_L=Props('V','T',Tbubble,'Q',0,Ref)
-    mu_G=Props('L','T',Tdew,'Q',1,Ref)
+    k_L=L.k
+    k_G=V.k
+    cp_L=L.cp
+    cp_G=V.cp
+    rho_L=L.rho
+    rho_G=V.rho
+    mu_L=L.mu
+    #The vapor conductivity (in kW/m-K) is used as the viscosity here
+    mu_G=V.Props('L')
     Re_L=G*Dh/mu_L
     Re_G=G*Dh/mu_G
     Pr_L=cp_L*mu_G/k_L
@@ -671,7 +829,11 @@ def Bertsch_MC(x,Ref,G,Dh,q,L,Tbubble,Tdew):
     h_conv_tp=h_conv_l*(1-x)+h_conv_g*x
     Co=sqrt(sig/(g*(rho_L-rho_G)*Dh**2))
     h_TP=h_nb*(1-x)+h_conv_tp*(1.0+80.0*(x**2-x**6)*exp(-0.6*Co))
-    return h_TP
+    return _ScalarOrArray(h_TP,x)
+
+#Count the calls to the correlations when instrumented (see Instrumentation)
+CountFunctions(globals())
+
 if __name__=='__main__':
     DP_vals_acc=[]
     DP_vals_fric=[]
@@ -3,22 +3,17 @@ import sys
 from Compressor import CompressorClass  #Compressor
 from Condenser import CondenserClass    #Condenser
 from Evaporator import EvaporatorClass  #Evaporator
-from CoolingCoil import CoolingCoilClass #Cooling Coil
-from MultiCircuitEvaporator import MultiCircuitEvaporatorClass
-from CoaxialHX import CoaxialHXClass #Coaxial internal heat exchanger
-from PHEHX import PHEHXClass #Plate-Heat-Exchanger 
 from LineSet import LineSetClass #Line set class
-from Pump import PumpClass # Secondary loop pump class
-from scipy.optimize import brentq, fsolve,newton 
-#^^ fsolve - roots (multiple variables); brent - root of one variable fct
+#The cooling coil, pump and internal heat exchangers are only needed by the
+#secondary loop cycle, so they are imported when one is built
 
-from CoolProp.CoolProp import Props,IsFluidType             #refrigerant properties
-from CoolProp.Plots import Ph
+from Properties import Props,IsFluidType             #refrigerant properties
 from FinCorrelations import FinInputs     #fin correlations
 import numpy as np                  #NumPy is fundamental scientific package
 from Correlations import TrhoPhase_ph            
-from Solvers import MultiDimNewtRaph, Broyden
+from Solvers import MultiDimNewtRaph, Broyden, NewtonHybrid, ParallelJacobian
 from Preconditioners import DXPreconditioner,SecondaryLoopPreconditioner
+from Instrumentation import InstrumentedSolve
 
 def F2K(T_F):
     """
@@ -26,12 +21,23 @@ def F2K(T_F):
     """                       
     return 5/9*(T_F+459.67)
         
+class IHXVals():
+    """
+    Empty class for holding parameters common to PHE and Coaxial IHX
+    """
+    pass
+
 class SecondaryCycleClass():
     def __init__(self):
         """
         Load up the necessary sub-structures to be filled with
         the code that follows
         """
+        from CoolingCoil import CoolingCoilClass #Cooling Coil
+        from CoaxialHX import CoaxialHXClass #Coaxial internal heat exchanger
+        from PHEHX import PHEHXClass #Plate-Heat-Exchanger 
+        from Pump import PumpClass # Secondary loop pump class
+        
         self.Compressor=CompressorClass()
         
         #Outdoor coil is a Condenser in cooling mode and evaporator in heating mode
@@ -49,8 +55,7 @@ class SecondaryCycleClass():
         self.LineSetSupply=LineSetClass()
         self.LineSetReturn=LineSetClass()
         #Make IHX an empty class for holding parameters common to PHE and Coaxial IHX
-        class struct: pass
-        self.IHX=struct()
+        self.IHX=IHXVals()
         
     def OutputList(self):
         """
@@ -333,11 +338,64 @@ class SecondaryCycleClass():
         self.DT_evap=DT_evap
         self.DT_cond=DT_cond   
         return resid
+    
+    def CalculateAugmented(self,DT_evap,DT_cond,Tin_CC,DP_low,DP_high):
+        """
+        Residuals of the augmented system where the pressure drops [kPa] are
+        also unknowns.  The first three residuals are those of Calculate, the
+        last two are the differences between the imposed pressure drops and
+        those calculated by the models [kPa]
+        """
+        self.DP_low=DP_low
+        self.DP_high=DP_high
+        resid=self.Calculate(DT_evap,DT_cond,Tin_CC)
+        return np.r_[resid,[DP_low-self.DP_low_Model/1000,DP_high-self.DP_high_Model/1000]]
 
+    def GetPrecondValues(self):
+        '''
+        Return the dictionary of the solved values DT_evap, DT_cond, Tin_CC, 
+        DP_low and DP_high that can be passed as PrecondValues to 
+        PreconditionedSolve of a cycle at a neighbouring operating point
+        '''
+        return {'DT_evap':self.DT_evap,
+                'DT_cond':self.DT_cond,
+                'Tin_CC':self.Tin_CC,
+                'DP_low':self.DP_low,
+                'DP_high':self.DP_high}
+        
+    @InstrumentedSolve
     def PreconditionedSolve(self,PrecondValues=None):
         '''
-        PrecondValues = dictionary of values DT_evap, DT_cond and Tin_CC
+        PrecondValues = dictionary of values DT_evap, DT_cond and Tin_CC, and 
+        optionally DP_low and DP_high [kPa], used as the initial guess in place
+        of the preconditioner (warm start).  If the solve fails from this 
+        guess, the preconditioner is used instead
+        
+        If the ParallelJacobian attribute of the cycle is set to True, the 
+        columns of the Jacobian matrix are evaluated in parallel in worker 
+        processes (see Solvers.ParallelJacobian)
+        
+        If the AugmentedSolve attribute of the cycle is set to True, the 
+        pressure drops are solved for at the same time as the temperatures in
+        one 5-D Newton solve (see CalculateAugmented) rather than in the 
+        inner and outer loops around the 3-D Newton solve
+        
+        If the Instrument attribute of the cycle is set to True, the property
+        calls, correlation calls and solver iterations are counted and stored
+        in the Instrumentation attribute (see Instrumentation)
         '''
+        if PrecondValues is not None:
+            try:
+                self._PreconditionedSolve(PrecondValues)
+                return
+            except AttributeError:
+                raise
+            except:
+                if self.Verbosity>0:
+                    print 'Warm start failed, falling back to the preconditioner'
+        self._PreconditionedSolve(None)
+        
+    def _PreconditionedSolve(self,PrecondValues=None):
         
         def OBJECTIVE(x):
             """
@@ -387,6 +445,8 @@ class SecondaryCycleClass():
             self.DT_evap=PrecondValues['DT_evap']
             self.DT_cond=PrecondValues['DT_cond']
             Tin_CC=PrecondValues['Tin_CC']
+            self.DP_low=PrecondValues.get('DP_low',0)
+            self.DP_high=PrecondValues.get('DP_high',0)
             
         
         #Remove the other, non-used IHX class if found
@@ -401,42 +461,69 @@ class SecondaryCycleClass():
         if self.Mode=='HP':
             if hasattr(self,'Condenser'):
                 del self.Condenser
-        iter=1
-        max_error_DP=999
-        #Outer loop with a more relaxed convergence criterion
-        while max_error_DP>0.5:
-            iter_inner=1
-            #Inner loop to determine pressure drop for high and low sides
-            while max_error_DP>0.05 and iter_inner<10:
+        #Number of cycle evaluations, Jacobians and solver steps
+        self.SolverInfo={'nfev':0,'njev':0,'iter':0}
+        
+        if getattr(self,'AugmentedSolve',False):
+            self._AugmentedSolve(Tin_CC)
+            return
+        
+        #Optionally evaluate the Jacobian columns in parallel
+        if getattr(self,'ParallelJacobian',False):
+            Jacobian=ParallelJacobian(self,StateFields=['DP_low','DP_high'])
+        else:
+            Jacobian=None
+        try:
+            J=None
+            iter=1
+            max_error_DP=999
+            #Outer loop with a more relaxed convergence criterion
+            while max_error_DP>0.5:
+                iter_inner=1
+                #Inner loop to determine pressure drop for high and low sides
+                while max_error_DP>0.05 and iter_inner<10:
                 
-                #Run to calculate the pressure drop as starting point
-                OBJECTIVE([self.DT_evap,self.DT_cond,Tin_CC])
+                    #Run to calculate the pressure drop as starting point
+                    OBJECTIVE([self.DT_evap,self.DT_cond,Tin_CC])
+                    self.SolverInfo['nfev']+=1
                 
-                #Calculate the max error
-                max_error_DP=max([abs(self.DP_low_Model/1000-self.DP_low),abs(self.DP_high_Model/1000-self.DP_high)])
+                    #Calculate the max error
+                    max_error_DP=max([abs(self.DP_low_Model/1000-self.DP_low),abs(self.DP_high_Model/1000-self.DP_high)])
                 
-                if self.Verbosity>0:
-                    PrintDPs()
-                    print 'Max pressure drop error [inner loop] is',max_error_DP,'kPa'
+                    if self.Verbosity>0:
+                        PrintDPs()
+                        print 'Max pressure drop error [inner loop] is',max_error_DP,'kPa'
                     
-                #Update the pressure drop terms
-                self.DP_low=self.DP_low_Model/1000
-                self.DP_high=self.DP_high_Model/1000
+                    #Update the pressure drop terms
+                    self.DP_low=self.DP_low_Model/1000
+                    self.DP_high=self.DP_high_Model/1000
                 
-                iter_inner+=1
+                    iter_inner+=1
                 
-            if self.Verbosity > 0:
-                print "Done with the inner loop on pressure drop"
+                if self.Verbosity > 0:
+                    print "Done with the inner loop on pressure drop"
                 
-            # Use Newton-Raphson solver
-            (self.DT_evap,self.DT_cond,Tin_CC)=MultiDimNewtRaph(OBJECTIVE,[self.DT_evap,self.DT_cond,Tin_CC],dx=0.1)
-            
-            #Calculate the error
-            max_error_DP=max([abs(self.DP_low_Model/1000-self.DP_low),abs(self.DP_high_Model/1000-self.DP_high)])
+                # Use Newton-Raphson solver, re-using the Jacobian matrix from the
+                # last pass through the outer loop
+                x,info=NewtonHybrid(OBJECTIVE,[self.DT_evap,self.DT_cond,Tin_CC],dx=0.1,J0=J,Jacobian=Jacobian,full_output=True)
+                (self.DT_evap,self.DT_cond,Tin_CC)=x
+                J=info['J']
+                self.SolverInfo['nfev']+=info['nfev']
+                self.SolverInfo['njev']+=info['njev']
+                self.SolverInfo['iter']+=info['iter']
+                if not info['converged']:
+                    raise ValueError('Secondary loop cycle solver did not converge')
+            
+                #Calculate the error
+                max_error_DP=max([abs(self.DP_low_Model/1000-self.DP_low),abs(self.DP_high_Model/1000-self.DP_high)])
             
-            if self.Verbosity>0:
-                PrintDPs()    
-                print 'Max pressure drop error [outer loop] is',max_error_DP,'kPa'
+                if self.Verbosity>0:
+                    PrintDPs()    
+                    print 'Max pressure drop error [outer loop] is',max_error_DP,'kPa'
+        
+        finally:
+            if Jacobian is not None:
+                Jacobian.close()
         
         if self.Verbosity>1:
             print 'Capacity: ', self.Capacity
@@ -444,6 +531,36 @@ class SecondaryCycleClass():
             print 'COP (w/ both fans): ',self.COSP
             print 'SHR: ',self.SHR
         return
+    
+    def _AugmentedSolve(self,Tin_CC):
+        """
+        Solve for DT_evap, DT_cond, Tin_CC, DP_low and DP_high all at once, 
+        starting from the current values
+        """
+        def OBJECTIVE(x):
+            return self.CalculateAugmented(x[0],x[1],x[2],x[3],x[4])
+        
+        if getattr(self,'ParallelJacobian',False):
+            Jacobian=ParallelJacobian(self,Method='CalculateAugmented')
+        else:
+            Jacobian=None
+        try:
+            x0=[self.DT_evap,self.DT_cond,Tin_CC,self.DP_low,self.DP_high]
+            x,info=NewtonHybrid(OBJECTIVE,x0,dx=[0.1,0.1,0.1,0.01,0.01],Jacobian=Jacobian,full_output=True)
+        finally:
+            if Jacobian is not None:
+                Jacobian.close()
+        self.SolverInfo['nfev']+=info['nfev']
+        self.SolverInfo['njev']+=info['njev']
+        self.SolverInfo['iter']+=info['iter']
+        if not info['converged']:
+            raise ValueError('Secondary loop cycle solver did not converge')
+        
+        if self.Verbosity>1:
+            print 'Capacity: ', self.Capacity
+            print 'COP: ',self.COP
+            print 'COP (w/ both fans): ',self.COSP
+            print 'SHR: ',self.SHR
         
 class DXCycleClass():
     def __init__(self):
@@ -673,7 +790,31 @@ class DXCycleClass():
         self.DT_cond=DT_cond
         return resid
     
-    def PreconditionedSolve(self):
+    def CalculateAugmented(self,DT_evap,DT_cond,DP_low,DP_high):
+        """
+        Residuals of the augmented system where the pressure drops [kPa] are
+        also unknowns.  The first two residuals are those of Calculate, the 
+        last two are the differences between the imposed pressure drops and
+        those calculated by the models [kPa]
+        """
+        self.DP_low=DP_low
+        self.DP_high=DP_high
+        resid=self.Calculate(DT_evap,DT_cond)
+        return np.r_[resid,[DP_low-abs(self.DP_LowPressure)/1000,DP_high-abs(self.DP_HighPressure)/1000]]
+    
+    def GetPrecondValues(self):
+        """
+        Return the dictionary of the solved values DT_evap, DT_cond, DP_low and 
+        DP_high that can be passed as PrecondValues to PreconditionedSolve of 
+        a cycle at a neighbouring operating point
+        """
+        return {'DT_evap':self.DT_evap,
+                'DT_cond':self.DT_cond,
+                'DP_low':self.DP_low,
+                'DP_high':self.DP_high}
+    
+    @InstrumentedSolve
+    def PreconditionedSolve(self,PrecondValues=None):
         """
         Solver that will precondition by trying a range of DeltaT until the model
         can solve, then will kick into 2-D Newton Raphson solve
@@ -683,6 +824,26 @@ class DXCycleClass():
         dew temperature of the refrigerant.  This is important for refrigerant blends
         with temperature glide during constant-pressure evaporation or condensation.
         Good examples of common working fluid with glide would be R404A or R410A.
+        
+        PrecondValues = dictionary of values DT_evap, DT_cond and optionally DP_low
+        and DP_high [kPa] to use as the initial guess (warm start) in place of 
+        the preconditioner, for instance from GetPrecondValues() of the cycle 
+        solved at a neighbouring point.  If the solver does not converge from 
+        this guess, the preconditioner is used instead.  If it does not 
+        converge from the preconditioner either, ValueError is raised
+        
+        If the ParallelJacobian attribute of the cycle is set to True, the 
+        columns of the Jacobian matrix are evaluated in parallel in worker 
+        processes (see Solvers.ParallelJacobian)
+        
+        If the AugmentedSolve attribute of the cycle is set to True, the 
+        pressure drops are solved for at the same time as the temperatures in 
+        one 4-D Newton solve (see CalculateAugmented) rather than by repeated 
+        2-D solves with updated pressure drops
+        
+        If the Instrument attribute of the cycle is set to True, the property
+        calls, correlation calls and solver iterations are counted and stored
+        in the Instrumentation attribute (see Instrumentation)
         """
         def OBJECTIVE_DXCycle(x):
             """
@@ -694,37 +855,101 @@ class DXCycleClass():
                 raise
             return resids
         
-        # Use the preconditioner to determine a reasonably good starting guess
-        DT_evap_init,DT_cond_init=DXPreconditioner(self)
-
-        GoodRun=False
-        while GoodRun==False:
-            try:
-                self.DP_low=0
-                self.DP_high=0
-                DP_converged=False        
-                while DP_converged==False:
-                    #Actually run the Newton-Raphson solver to get the solution
-                    x=Broyden(OBJECTIVE_DXCycle,[DT_evap_init,DT_cond_init])
-                    delta_low=abs(self.DP_low-abs(self.DP_LowPressure)/1000)
-                    delta_high=abs(self.DP_high-abs(self.DP_HighPressure)/1000)
-                    self.DP_low=abs(self.DP_LowPressure)/1000
-                    self.DP_high=abs(self.DP_HighPressure)/1000
-                    #Update the guess values based on last converged values
-                    DT_evap_init=self.DT_evap
-                    DT_cond_init=self.DT_cond
-                    if delta_low<1 and delta_high<1:
-                        DP_converged=True
-                    if self.Verbosity>4:
-                        print self.DP_HighPressure/1000,self.DP_LowPressure/1000,'DPHP'
-                    GoodRun=True
-            except AttributeError:
-                # This will be a fatal error !! Should never have attribute error
-                raise 
-            except:
-                print "--------------  Exception Caught ---------------- " 
-                print "Error of type",sys.exc_info()[0]," is: " + sys.exc_info()[1].message
-                raise
+        def OBJECTIVE_Augmented(x):
+            """
+            Residuals with the pressure drops as unknowns
+            """
+            return self.CalculateAugmented(float(x[0]),float(x[1]),float(x[2]),float(x[3]))
+        
+        def Solve(DT_evap_init,DT_cond_init,DP_low,DP_high):
+            """
+            Iterate on the pressure drops around the Newton solve (or solve the
+            augmented system).  Returns False if any of the Newton solves did 
+            not converge
+            """
+            if Augmented:
+                x,info=NewtonHybrid(OBJECTIVE_Augmented,[DT_evap_init,DT_cond_init,DP_low,DP_high],dx=[1e-5,1e-5,1e-3,1e-3],Jacobian=Jacobian,full_output=True)
+                self.SolverInfo['nfev']+=info['nfev']
+                self.SolverInfo['njev']+=info['njev']
+                self.SolverInfo['iter']+=info['iter']
+                return info['converged']
+            
+            Converged=True
+            self.DP_low=DP_low
+            self.DP_high=DP_high
+            J=None
+            DP_converged=False        
+            while DP_converged==False:
+                #Actually run the Newton-Raphson solver to get the solution,
+                #re-using the Jacobian matrix from the last pressure drop step
+                x,info=NewtonHybrid(OBJECTIVE_DXCycle,[DT_evap_init,DT_cond_init],dx=1e-5,J0=J,Jacobian=Jacobian,full_output=True)
+                J=info['J']
+                self.SolverInfo['nfev']+=info['nfev']
+                self.SolverInfo['njev']+=info['njev']
+                self.SolverInfo['iter']+=info['iter']
+                if not info['converged']:
+                    Converged=False
+                delta_low=abs(self.DP_low-abs(self.DP_LowPressure)/1000)
+                delta_high=abs(self.DP_high-abs(self.DP_HighPressure)/1000)
+                self.DP_low=abs(self.DP_LowPressure)/1000
+                self.DP_high=abs(self.DP_HighPressure)/1000
+                #Update the guess values based on last converged values
+                DT_evap_init=self.DT_evap
+                DT_cond_init=self.DT_cond
+                if delta_low<1 and delta_high<1:
+                    DP_converged=True
+                if self.Verbosity>4:
+                    print self.DP_HighPressure/1000,self.DP_LowPressure/1000,'DPHP'
+            return Converged
+        
+        #Number of cycle evaluations, Jacobians and solver steps
+        self.SolverInfo={'nfev':0,'njev':0,'iter':0}
+        
+        Augmented=getattr(self,'AugmentedSolve',False)
+        
+        #Optionally evaluate the Jacobian columns in parallel
+        if getattr(self,'ParallelJacobian',False):
+            if Augmented:
+                Jacobian=ParallelJacobian(self,Method='CalculateAugmented')
+            else:
+                Jacobian=ParallelJacobian(self,StateFields=['DP_low','DP_high'])
+        else:
+            Jacobian=None
+        try:
+            if PrecondValues is not None:
+                # Warm start from the values that were passed in
+                try:
+                    GoodRun=Solve(PrecondValues['DT_evap'],PrecondValues['DT_cond'],
+                                  PrecondValues.get('DP_low',0),PrecondValues.get('DP_high',0))
+                except AttributeError:
+                    # This will be a fatal error !! Should never have attribute error
+                    raise
+                except:
+                    GoodRun=False
+                if GoodRun==False:
+                    if self.Verbosity>0:
+                        print 'Warm start failed, falling back to the preconditioner'
+                    PrecondValues=None
+        
+            if PrecondValues is None:
+                # Use the preconditioner to determine a reasonably good starting guess
+                DT_evap_init,DT_cond_init=DXPreconditioner(self)
+    
+                try:
+                    Converged=Solve(DT_evap_init,DT_cond_init,0,0)
+                    if not Converged:
+                        raise ValueError('DX cycle solver did not converge')
+                except AttributeError:
+                    # This will be a fatal error !! Should never have attribute error
+                    raise 
+                except:
+                    print "--------------  Exception Caught ---------------- " 
+                    print "Error of type",sys.exc_info()[0]," is: " + sys.exc_info()[1].message
+                    raise
+        
+        finally:
+            if Jacobian is not None:
+                Jacobian.close()
         
         if self.Verbosity>0:
             print 'Capacity: ', self.Capacity
@@ -1,7 +1,6 @@
 from __future__ import division #Make integer 3/2 give 1.5 in python 2.x
 from math import log,exp
-from CoolProp.HumidAirProp import HAProps 
-from CoolProp.CoolProp import cair_sat
+from Properties import HAProps,cair_sat
 from FinCorrelations import WavyLouveredFins
 
 class DWSVals():
@@ -1,7 +1,7 @@
 from __future__ import division
 from Evaporator import EvaporatorClass
 from FinCorrelations import FinInputs
-from CoolProp.CoolProp import Props
+from Properties import Props
 
 FinsTubes=FinInputs()
     
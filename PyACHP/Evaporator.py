@@ -1,9 +1,8 @@
 from __future__ import division #Make integer 3/2 give 1.5 in python 2.x
 from math import pi,log,exp
-from CoolProp.CoolProp import Props
+from Properties import Props,SatState
 from Correlations import f_h_1phase_Tube,ShahEvaporation_Average, LockhartMartinelli,LMPressureGradientAvg,AccelPressureDrop,TwoPhaseDensity
-from scipy.optimize import brentq #solver to find roots (zero points) of functions
-from scipy.interpolate import interp1d
+from Instrumentation import brentq #solver to find roots (zero points) of functions
 #import numpy as np
 from FinCorrelations import WavyLouveredFins,FinInputs,IsFinsClass
 from DryWetSegment import DWSVals, DryWetSegment
@@ -17,7 +16,7 @@ class EvaporatorClass():
         self.__dict__.update(kwargs)
     def Update(self,**kwargs):
         self.__dict__.update(kwargs)
-        
+    
     def OutputList(self):
         """
             Return a list of parameters for this component for further output
@@ -127,12 +126,13 @@ class EvaporatorClass():
         down on computational work. 
         """
         ## Bubble and dew temperatures (same for fluids without glide) 
-        self.Tbubble_r=Props('T','P',self.psat_r,'Q',0,self.Ref)
-        self.Tdew_r=Props('T','P',self.psat_r,'Q',1,self.Ref)
+        self._Sat=SatState(self.Ref,p=self.psat_r)
+        self.Tbubble_r=self._Sat.Tbubble
+        self.Tdew_r=self._Sat.Tdew
         ## Mean temperature for use in HT relationships
         self.Tsat_r=(self.Tbubble_r+self.Tdew_r)/2
         # Latent heat
-        self.h_fg=(Props('H','T',self.Tdew_r,'Q',1.0,self.Ref)-Props('H','T',self.Tbubble_r,'Q',0.0,self.Ref))*1000. #[J/kg]
+        self.h_fg=self._Sat.h_fg #[J/kg]
         
         self.Fins.Air.RHmean=self.Fins.Air.RH
         WavyLouveredFins(self.Fins)
@@ -144,10 +144,10 @@ class EvaporatorClass():
         self.Initialize()
         
         # Input and output thermodynamic properties
-        ssatL=Props('S','T',self.Tbubble_r,'Q',0,self.Ref)*1000
-        ssatV=Props('S','T',self.Tdew_r,'Q',1,self.Ref)*1000
-        hsatL=Props('H','T',self.Tbubble_r,'Q',0,self.Ref)*1000
-        hsatV=Props('H','T',self.Tdew_r,'Q',1,self.Ref)*1000
+        ssatL=self._Sat.L.s
+        ssatV=self._Sat.V.s
+        hsatL=self._Sat.L.h
+        hsatV=self._Sat.V.h
         
         #Must give enthalpy and pressure as inputs
         self.xin_r=(self.hin_r-hsatL)/(hsatV-hsatL)
@@ -211,7 +211,7 @@ class EvaporatorClass():
         if existsSuperheat:
             self.DT_sh_calc=self.Tout_r-self.Tdew_r
         else:
-            self.DT_sh_calc=(self.hout_r-hsatV)/(Props('C','T',self.Tdew_r,'Q',1,self.Ref)*1000)
+            self.DT_sh_calc=(self.hout_r-hsatV)/self._Sat.V.cp
             self.Tout_r=Props('T','P',self.psat_r+self.DP_r/1000.0,'Q',xout_r,self.Ref) #saturated temperature at outlet quality
         self.hmean_r=self.w_2phase*self.h_r_2phase+self.w_superheat*self.h_r_superheat
         self.UA_r=self.hmean_r*self.A_r_wetted
@@ -233,6 +233,7 @@ class EvaporatorClass():
         #x-position of each point
         xv=np.linspace(0,1,Nbends)
         
+        from scipy.interpolate import interp1d
         self.Tbends=interp1d(x,Tv)(xv)
         
         
@@ -342,6 +343,36 @@ class EvaporatorClass():
         self.fdry_superheat=DWS.f_dry
         self.Tout_a_superheat=DWS.Tout_a
         self.Tout_r=DWS.Tout_r
+
+def SampleEvaporatorFins():
+    """
+    Fins, tubes and air flow of the sample evaporator
+    """
+    FinsTubes=FinInputs()
+
+    FinsTubes.Tubes.NTubes_per_bank=32
+    FinsTubes.Tubes.Ncircuits=5
+    FinsTubes.Tubes.Nbank=3
+    FinsTubes.Tubes.Ltube=0.452
+    FinsTubes.Tubes.OD=0.009525
+    FinsTubes.Tubes.ID=0.0089154
+    FinsTubes.Tubes.Pl=0.0254
+    FinsTubes.Tubes.Pt=0.0219964
+    
+    FinsTubes.Fins.FPI=14.5
+    FinsTubes.Fins.Pd=0.001
+    FinsTubes.Fins.xf=0.001
+    FinsTubes.Fins.t=0.00011
+    FinsTubes.Fins.k_fin=237
+    
+    FinsTubes.Air.Vdot_ha=0.5663
+    FinsTubes.Air.Tmean=299.8
+    FinsTubes.Air.Tdb=299.8
+    FinsTubes.Air.p=101.325
+    FinsTubes.Air.RH=0.51
+    FinsTubes.Air.RHmean=0.51
+    FinsTubes.Air.FanPower=438
+    return FinsTubes
     
 if __name__=='__main__':
     #This code runs if this file is run by itself, but otherwise doesn't run
@@ -1,5 +1,7 @@
-from CoolProp.HumidAirProp import HAProps
+from Properties import HAProps,HAcp,LRUCache
+from Instrumentation import CountFunctions
 from math import sqrt,pi,log,tanh,exp,cos,log
+from functools import wraps
 from ACHPTools import ValidateFields
 #Turn on virial correlations for air and water for speed in Humid Air routines
 
@@ -84,6 +86,113 @@ class FinInputs():
         d=dict(self.Tubes.__dict__) #The current values
         ValidateFields(d,reqFields,optFields)
         
+#The results of the fin correlations do not change during a cycle solve since
+#the geometry and the inlet air state are fixed, so they are memoized on the
+#values of all the fields they depend on.  As the key is built from the current
+#values, changing any of the fields of FinInputs gives a new entry.
+_FinsCache=LRUCache(maxsize=2000)
+_GeometryCache=LRUCache(maxsize=200)
+#Values written into Inputs by all the fin correlations, plus eta_a or eta_a_wet
+_FinsOutputs=['A_a','cp_da','cp_ha','h_a','mdot_ha','mdot_da','f_a','dP_a','Re']
+
+def ClearCache():
+    """
+    Empty the caches of fin correlation results and of fin geometry
+    """
+    _FinsCache.clear()
+    _GeometryCache.clear()
+
+def _WetState(Inputs):
+    """
+    Returns (isWet, cs_cp): if cs_cp is defined, or the fins are flagged as wet,
+    the wet-surface correction cs_cp is used for the fin efficiency
+    """
+    if (hasattr(Inputs,'cs_cp') and Inputs.cs_cp>0) or (hasattr(Inputs,'WetDry') and Inputs.WetDry=='Wet'):
+        return True,Inputs.Air.cs_cp
+    else:
+        return False,1.0
+
+def _GeometryKey(Inputs):
+    Tubes=Inputs.Tubes
+    Fins=Inputs.Fins
+    return (Tubes.NTubes_per_bank,Tubes.Nbank,Tubes.Ltube,Tubes.OD,Tubes.Pl,Tubes.Pt,
+            Fins.FPI,Fins.Pd,Fins.xf,Fins.t,Fins.k_fin)
+
+def _Memoized(Correlation):
+    """
+    Decorator for the fin correlations; the values written into Inputs are
+    reused when the correlation is called again with the same geometry, inlet
+    air state (Vdot_ha, Tdb, RH, p) and wet-surface correction
+    """
+    @wraps(Correlation)
+    def wrapper(Inputs):
+        try:
+            isWet,cs_cp=_WetState(Inputs)
+            key=(Correlation.__name__,_GeometryKey(Inputs),Inputs.Air.Vdot_ha,
+                 Inputs.Air.Tdb,Inputs.Air.RH,Inputs.Air.p,isWet,cs_cp)
+            hash(key)
+        except (AttributeError,TypeError):
+            #Missing or unhashable fields, let the correlation deal with them
+            return Correlation(Inputs)
+        Outputs=_FinsCache.get(key)
+        if Outputs is None:
+            Correlation(Inputs)
+            if isWet:
+                Names=_FinsOutputs+['eta_a_wet']
+            else:
+                Names=_FinsOutputs+['eta_a']
+            _FinsCache.set(key,dict((Name,getattr(Inputs,Name)) for Name in Names))
+        else:
+            Inputs.__dict__.update(Outputs)
+    return wrapper
+
+def _WavyLouveredGeometry(Inputs):
+    """
+    The purely geometric quantities of the wavy-louvered fin correlation,
+    computed once per geometry
+    """
+    key=_GeometryKey(Inputs)
+    G=_GeometryCache.get(key)
+    if G is not None:
+        return G
+    Ntubes_bank,Nbank,Ltube,D,Pl,Pt,FPI,pd,xf,t,k_fin=key
+    
+    #Fins per meter [1/m]
+    FPM = FPI / 0.0254
+    #Fin pitch (distance between centerlines of fins)
+    pf = 1 / FPM
+
+    #Height of heat exchanger [m]
+    Height = Pt * (Ntubes_bank+1)  #assuming that fin extends 1/2 pt above/below last tube in bundle
+    #A_duct is the face area [m^2] equivalent to the duct cross-section
+    A_duct = Height * Ltube  #neglecting the additional height of the fins above/below the last tubes in the bundle
+    #Number of fins in the tube sheet [-]
+    Nfin = Ltube * FPM
+    #Secant of theta is the area enhancement factor [-]
+    #  It captures the increase in area due to the waviness of the fins 
+    sec_theta = sqrt(xf*xf + pd*pd) / xf
+    # Duct cross-sectional area that is not fin or tube [m^2]
+    Ac = A_duct - t * Nfin * (Height-D*Ntubes_bank) - Ntubes_bank * D * Ltube
+    # Total outer area of the tubes [m^2]
+    Atube = Ntubes_bank * Nbank * pi * D * Ltube
+    #Wetted Area of a single fin [m^2]
+    A_1fin = 2.0 * (Height * Pl * (Nbank+1) * sec_theta  - Ntubes_bank*Nbank * pi*D*D/4) #assuming that fin extends 1/2 pt in front/after last tube in bundle
+    # Total wetted area of the fins [m^2]
+    Af = Nfin * A_1fin
+    #Total area including tube and fins [m^2]
+    A = Af + Ntubes_bank * Nbank * pi * D * (Ltube-Nfin*t)
+    
+    #calcs needed for specific fin types
+    r = D / 2
+    X_D = sqrt(Pl*Pl + Pt*Pt / 4) / 2
+    X_T = Pt / 2
+    rf_r = 1.27 * X_T / r * sqrt(X_D / X_T - 0.3)
+    
+    G=dict(pf=pf,Ac=Ac,Atube=Atube,Af=Af,A=A,r=r,rf_r=rf_r)
+    _GeometryCache.set(key,G)
+    return G
+
+@_Memoized
 def WavyLouveredFins(Inputs):
     """
     # Correlations from:
@@ -130,74 +239,28 @@ def WavyLouveredFins(Inputs):
               \ ___ /
     """
     
-    Ntubes_bank = Inputs.Tubes.NTubes_per_bank #tubes per bank
     Nbank =       Inputs.Tubes.Nbank       #Number of banks
-    Ltube =       Inputs.Tubes.Ltube       #length of a single tube
     D =           Inputs.Tubes.OD          #Outer diameter of tube
-    Pl =          Inputs.Tubes.Pl          #Horizontal spacing between banks (center to center)
-    Pt =          Inputs.Tubes.Pt          #Vertical spacing between tubes in a bank (center to center)
-
-    FPI =         Inputs.Fins.FPI
-    pd =          Inputs.Fins.Pd
-    xf =          Inputs.Fins.xf
     t =           Inputs.Fins.t
     k_fin =       Inputs.Fins.k_fin
 
     Vdot_ha =     Inputs.Air.Vdot_ha
     p =           Inputs.Air.p
     
-    if hasattr(Inputs,'Tmean'):
-        Temp = Inputs.Air.Tmean
-    else:
-        Temp = Inputs.Air.Tdb
+    isWet,cs_cp=_WetState(Inputs)
     
-    if hasattr(Inputs,'RHmean'):
-        RHin = Inputs.Air.RHmean
-    else:
-        RHin = Inputs.Air.RH
-
-    # Check that cs_cp is defined, if so, set it to the value passed in
-    if (hasattr(Inputs,'cs_cp') and Inputs.cs_cp>0) or (hasattr(Inputs,'WetDry') and Inputs.WetDry=='Wet'):
-        isWet=True
-        cs_cp=Inputs.Air.cs_cp
-    else:
-        isWet=False
-        cs_cp=1.0
-
-    #Film temperature [K]
-    Tfilm = Temp
-    #Fins per meter [1/m]
-    FPM = FPI / 0.0254
-    #Fin pitch (distance between centerlines of fins)
-    pf = 1 / FPM
-    #Spacing between fins
-    s = 1 / FPM - t
-
-    #Height of heat exchanger [m]
-    Height = Pt * (Ntubes_bank+1)  #assuming that fin extends 1/2 pt above/below last tube in bundle
-    #A_duct is the face area [m^2] equivalent to the duct cross-section
-    A_duct = Height * Ltube  #neglecting the additional height of the fins above/below the last tubes in the bundle
-    #Number of fins in the tube sheet [-]
-    Nfin = Ltube * FPM
-    #Secant of theta is the area enhancement factor [-]
-    #  It captures the increase in area due to the waviness of the fins 
-    sec_theta = sqrt(xf*xf + pd*pd) / xf
-    # Duct cross-sectional area that is not fin or tube [m^2]
-    Ac = A_duct - t * Nfin * (Height-D*Ntubes_bank) - Ntubes_bank * D * Ltube
-    # Total outer area of the tubes [m^2]
-    Atube = Ntubes_bank * Nbank * pi * D * Ltube
-    #Wetted Area of a single fin [m^2]
-    A_1fin = 2.0 * (Height * Pl * (Nbank+1) * sec_theta  - Ntubes_bank*Nbank * pi*D*D/4) #assuming that fin extends 1/2 pt in front/after last tube in bundle
-    # Total wetted area of the fins [m^2]
-    Af = Nfin * A_1fin
-    #Total area including tube and fins [m^2]
-    A = Af + Ntubes_bank * Nbank * pi * D * (Ltube-Nfin*t)
+    #Areas and other geometric quantities, only calculated once per geometry
+    G=_WavyLouveredGeometry(Inputs)
+    pf=G['pf']          #Fin pitch (distance between centerlines of fins)
+    Ac=G['Ac']          #Duct cross-sectional area that is not fin or tube [m^2]
+    Atube=G['Atube']    #Total outer area of the tubes [m^2]
+    Af=G['Af']          #Total wetted area of the fins [m^2]
+    A=G['A']            #Total area including tube and fins [m^2]
 
     #Evaluate the mass flow rate based on inlet conditions
     # To convert a parameter from per kg_{humid air} to per kg_{dry air}, divide by (1+W)
     W=HAProps('W','T',Inputs.Air.Tdb,'P',p,'R',Inputs.Air.RH)
     v_da=HAProps('V','T',Inputs.Air.Tdb,'P',p,'W',W)
-    h_da=HAProps('H','T',Inputs.Air.Tdb,'P',p,'W',W)*1000
     rho_ha = 1 / v_da*(1+W) #[m^3/kg_ha]
     rho_da = 1 / v_da #[m^3/kg_da]
     mdot_ha = Vdot_ha * rho_ha #[kg_ha/s]
@@ -205,9 +268,8 @@ def WavyLouveredFins(Inputs):
 
     umax = mdot_ha / (rho_ha * Ac) #[m/s]
 
-    #Use a forward difference to calculate cp from cp=dh/dT
-    dT=0.0001 #[K]
-    cp_da=(HAProps('H','T',Inputs.Air.Tdb+dT,'P', p, 'W',W)*1000-h_da)/dT #[J/kg_da/K]
+    #Specific heat at constant humidity ratio, cp=dh/dT
+    cp_da=HAcp(Inputs.Air.Tdb,p,W)*1000 #[J/kg_da/K]
     cp_ha=cp_da/(1+W) #[J/kg_ha/K]
     
     #Transport properties of humid air from CoolProp
@@ -229,10 +291,8 @@ def WavyLouveredFins(Inputs):
         fa_total=0.768*(0.0494+0.142*exp(-Re_D/1180.0))*pow(A/Atube,0.0195)*pow(pf/D,-0.121)
     
     #calcs needed for specific fin types
-    r = D / 2
-    X_D = sqrt(Pl*Pl + Pt*Pt / 4) / 2
-    X_T = Pt / 2
-    rf_r = 1.27 * X_T / r * sqrt(X_D / X_T - 0.3)
+    r = G['r']
+    rf_r = G['rf_r']
     m = sqrt(2 * h_a * cs_cp / (k_fin * t)) #cs_cp is the correction for heat/mass transfer
     
     #Using the circular fin correlation of Schmidt
@@ -276,6 +336,7 @@ def WavyLouveredFins(Inputs):
     #f_fin = 1.455 * Re_D ^ -0.656 * (St / Sl) ^ -0.347 * (s / D) ^ -0.134 * (St / D) ^ 1.23
     #f_total = f_fin * (Af / A) + f_tube * (1 - Af / A) * (1 - t / pf)
     
+@_Memoized
 def HerringboneFins(Inputs):
     #Source:
     #Empirical correlations for heat transfer and flow friction characteristics of herringbone wavy fin-and-tube heat exchangers
@@ -291,16 +352,13 @@ def HerringboneFins(Inputs):
     #Evaluate the mass flow rate based on inlet conditions
     Vdot_ha =     Inputs.Air.Vdot_ha
     # To convert a parameter from per kg_{humid air} to per kg_{dry air}, divide by (1+W)
-    W=HAProps('W','T',Inputs.Air.Tdb,'P',p,'R',Inputs.Air.RH)
     v_da=HAProps('V','T',Inputs.Air.Tdb,'P',p,'W',W)
-    h_da=HAProps('H','T',Inputs.Air.Tdb,'P',p,'W',W)*1000
     rho_ha = 1 / v_da*(1+W) #[m^3/kg_ha]
     rho_da = 1 / v_da #[m^3/kg_da]
     mdot_ha = Vdot_ha * rho_ha #[kg_ha/s]
     mdot_da = Vdot_ha * rho_da #[kg_da/s]
-    #Use a forward difference to calculate cp from cp=dh/dT
-    dT=0.0001 #[K] 
-    cp_da=(HAProps('H','T',Inputs.Air.Tdb+dT,'P', p, 'W',W)*1000-h_da)/dT #[J/kg_da/K]
+    #Specific heat at constant humidity ratio, cp=dh/dT
+    cp_da=HAcp(Inputs.Air.Tdb,p,W)*1000 #[J/kg_da/K]
     cp_ha=cp_da/(1+W) #[J/kg_ha/K]
     
     # Check that cs_cp is defined, if so, set it to the value passed in
@@ -429,6 +487,7 @@ def HerringboneFins(Inputs):
     Inputs.Re=Re_Dc
     
     
+@_Memoized
 def PlainFins(Inputs):
     #Source:
     #Heat transfer and friction characteristics of plain fin-and-tube heat exchangers, part II: Correlation
@@ -443,16 +502,13 @@ def PlainFins(Inputs):
     #Evaluate the mass flow rate based on inlet conditions
     Vdot_ha =     Inputs.Air.Vdot_ha
     # To convert a parameter from per kg_{humid air} to per kg_{dry air}, divide by (1+W)
-    W=HAProps('W','T',Inputs.Air.Tdb,'P',p,'R',Inputs.Air.RH)
     v_da=HAProps('V','T',Inputs.Air.Tdb,'P',p,'W',W)
-    h_da=HAProps('H','T',Inputs.Air.Tdb,'P',p,'W',W)*1000
     rho_ha = 1 / v_da*(1+W) #[m^3/kg_ha]
     rho_da = 1 / v_da #[m^3/kg_da]
     mdot_ha = Vdot_ha * rho_ha #[kg_ha/s]
     mdot_da = Vdot_ha * rho_da #[kg_da/s]
-    #Use a forward difference to calculate cp from cp=dh/dT
-    dT=0.0001 #[K] 
-    cp_da=(HAProps('H','T',Inputs.Air.Tdb+dT,'P', p, 'W',W)*1000-h_da)/dT #[J/kg_da/K]
+    #Specific heat at constant humidity ratio, cp=dh/dT
+    cp_da=HAcp(Inputs.Air.Tdb,p,W)*1000 #[J/kg_da/K]
     cp_ha=cp_da/(1+W) #[J/kg_ha/K]
     
     # Check that cs_cp is defined, if so, set it to the value passed in
@@ -573,6 +629,9 @@ def PlainFins(Inputs):
     
     
     
+#Count the calls to the correlations when instrumented (see Instrumentation)
+CountFunctions(globals())
+
 if __name__=='__main__':
     
     FinsTubes=FinInputs()
@@ -0,0 +1,202 @@
+'''
+Lightweight instrumentation of PyACHP
+
+While a Recorder is active, the following are counted (and timed where it
+makes sense):
+
+* Props calls, by fluid and input pair (see Properties.Props)
+* HAProps and cair_sat calls, by input set (see Properties.HAProps)
+* calls to each of the correlations in Correlations and FinCorrelations
+* brentq calls and iterations, by the module calling brentq
+* iterations and function evaluations of the multi-dimensional solvers
+
+When nothing is being recorded the cost is one test of an empty list per call.
+
+Usage::
+
+    from Instrumentation import Instrument
+    with Instrument() as Rec:
+        Cycle.PreconditionedSolve()
+    print Rec.AsDict()
+
+or set the Instrument attribute of a cycle to True, in which case the
+dictionary is stored in the Instrumentation attribute of the cycle after
+PreconditionedSolve, and the totals are added to the parametric study output
+(see Solve.CycleOutputs)
+'''
+from __future__ import division
+import sys
+from functools import wraps
+from timeit import default_timer
+
+#scipy.optimize.brentq, imported on the first call of brentq so that the
+#modules importing this one (Properties, and so everything that needs Props)
+#do not import scipy.optimize
+_brentq=None
+
+#The recorders that are currently active.  Never rebind this list, since other
+#modules hold a reference to it
+ActiveRecorders=[]
+
+class Recorder(object):
+    """
+    Counters of one instrumented run, filled while the recorder is active
+    """
+    def __init__(self):
+        #key -> [number of calls, total time in s]
+        self.Props={}
+        self.HAProps={}
+        self.Correlations={}
+        #calling module -> [number of calls, total iterations]
+        self.brentq={}
+        #solver name -> [number of calls, iterations, function evaluations]
+        self.Solvers={}
+        self.time=0.0
+
+    def __enter__(self):
+        self._t1=default_timer()
+        ActiveRecorders.append(self)
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        ActiveRecorders.remove(self)
+        self.time+=default_timer()-self._t1
+        return False
+
+    def AsDict(self):
+        """
+        Returns the counters as a dictionary of plain dictionaries that can be
+        written out with json or pickle
+        """
+        def Timed(table):
+            return dict((key,{'calls':v[0],'time':v[1]}) for key,v in table.items())
+        return {'time':self.time,
+                'Props':Timed(self.Props),
+                'HAProps':Timed(self.HAProps),
+                'Correlations':Timed(self.Correlations),
+                'brentq':dict((key,{'calls':v[0],'iterations':v[1]}) for key,v in self.brentq.items()),
+                'Solvers':dict((key,{'calls':v[0],'iter':v[1],'nfev':v[2]}) for key,v in self.Solvers.items())}
+
+    def OutputList(self):
+        """
+        Totals of the counters, as a list of tuples of (description, units,
+        value) in the same form as the OutputList of the components
+        """
+        return Totals(self.AsDict())
+
+def Totals(Data):
+    """
+    Totals of a dictionary from Recorder.AsDict, as a list of tuples of
+    (description, units, value)
+    """
+    def Sum(table,key):
+        return sum([v[key] for v in Data[table].values()])
+    return [('Instrumented time','s',Data['time']),
+            ('Props calls','-',Sum('Props','calls')),
+            ('Props time','s',Sum('Props','time')),
+            ('HAProps calls','-',Sum('HAProps','calls')),
+            ('HAProps time','s',Sum('HAProps','time')),
+            ('Correlation calls','-',Sum('Correlations','calls')),
+            ('brentq calls','-',Sum('brentq','calls')),
+            ('brentq iterations','-',Sum('brentq','iterations')),
+            ('Solver iterations','-',Sum('Solvers','iter')),
+            ('Solver function evaluations','-',Sum('Solvers','nfev'))]
+
+def Instrument():
+    """
+    Returns a new Recorder to be used in a with statement
+    """
+    return Recorder()
+
+def RecordCall(Table,key,dt):
+    """
+    Add one call taking dt seconds to the counter ``key`` of the table
+    ('Props','HAProps' or 'Correlations') of all the active recorders
+    """
+    for Rec in ActiveRecorders:
+        table=getattr(Rec,Table)
+        if key in table:
+            c=table[key]
+            c[0]+=1
+            c[1]+=dt
+        else:
+            table[key]=[1,dt]
+
+def RecordSolver(Name,iterations,nfev):
+    """
+    Add one call of the multi-dimensional solver Name to the active recorders
+    """
+    for Rec in ActiveRecorders:
+        c=Rec.Solvers.setdefault(Name,[0,0,0])
+        c[0]+=1
+        c[1]+=iterations
+        c[2]+=nfev
+
+def Counted(f):
+    """
+    Decorator to count the calls to (and time spent in) the function f in the
+    Correlations table of the active recorders
+    """
+    name=f.__name__
+    @wraps(f)
+    def wrapper(*args,**kwargs):
+        if not ActiveRecorders:
+            return f(*args,**kwargs)
+        t1=default_timer()
+        try:
+            return f(*args,**kwargs)
+        finally:
+            RecordCall('Correlations',name,default_timer()-t1)
+    return wrapper
+
+def CountFunctions(Namespace):
+    """
+    Wrap all the public functions defined in a module with Counted; call at
+    the end of a module as CountFunctions(globals())
+    """
+    Module=Namespace['__name__']
+    for name,f in list(Namespace.items()):
+        if (not name.startswith('_') and hasattr(f,'__call__')
+                and getattr(f,'__module__',None)==Module
+                and type(f).__name__=='function'):
+            Namespace[name]=Counted(f)
+
+def brentq(f,a,b,*args,**kwargs):
+    """
+    Drop-in replacement for scipy.optimize.brentq that counts the iterations
+    by the calling module when instrumented
+    """
+    global _brentq
+    if _brentq is None:
+        from scipy.optimize import brentq as _brentq
+    if not ActiveRecorders:
+        return _brentq(f,a,b,*args,**kwargs)
+    Caller=sys._getframe(1).f_globals.get('__name__','?')
+    full_output=kwargs.pop('full_output',False)
+    x,r=_brentq(f,a,b,*args,full_output=True,**kwargs)
+    for Rec in ActiveRecorders:
+        c=Rec.brentq.setdefault(Caller,[0,0])
+        c[0]+=1
+        c[1]+=r.iterations
+    if full_output:
+        return x,r
+    else:
+        return x
+
+def InstrumentedSolve(method):
+    """
+    Decorator for the solve method of a cycle.  If the Instrument attribute of
+    the cycle is True, the solve is recorded and the dictionary of counters is
+    stored in the Instrumentation attribute of the cycle
+    """
+    @wraps(method)
+    def wrapper(self,*args,**kwargs):
+        if not getattr(self,'Instrument',False):
+            return method(self,*args,**kwargs)
+        Rec=Recorder()
+        try:
+            with Rec:
+                return method(self,*args,**kwargs)
+        finally:
+            self.Instrumentation=Rec.AsDict()
+    return wrapper
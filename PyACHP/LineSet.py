@@ -1,5 +1,5 @@
 from __future__ import division
-from CoolProp.CoolProp import Props,IsFluidType
+from Properties import Props,IsFluidType,State
 from Correlations import f_h_1phase_Tube,TrhoPhase_ph
 from math import log,pi,exp
 
@@ -49,11 +49,13 @@ class LineSetClass():
             self.Tbubble = None
             self.Tdew = None
         self.Tin,self.rhoin,self.Phasein=TrhoPhase_ph(self.Ref,self.pin,self.hin,self.Tbubble,self.Tdew)
-        self.f_fluid, self.h_fluid, self.Re_fluid=f_h_1phase_Tube(self.mdot, self.ID, self.Tin, self.pin, self.Ref)
+        #The inlet state is shared with the correlation
+        Inlet=State('T',self.Tin,'P',self.pin,self.Ref)
+        self.f_fluid, self.h_fluid, self.Re_fluid=f_h_1phase_Tube(self.mdot, self.ID, self.Tin, self.pin, self.Ref, FluidState=Inlet)
         # Specific heat capacity [J/kg-K]                        
-        cp=Props('C','T',self.Tin,'P',self.pin,self.Ref)*1000
+        cp=Inlet.cp
         # Density [kg/m^3]
-        rho=Props('D','T',self.Tin, 'P', self.pin, self.Ref)
+        rho=Inlet.rho
     
         #Thermal resistance of tube
         R_tube=log(self.OD/self.ID)/(2*pi*self.L*self.k_tube)
@@ -1,16 +1,73 @@
 from __future__ import division #Make integer 3/2 give 1.5 in python 2.x
 from math import floor,ceil
-from CoolProp.CoolProp import Props
+from Properties import Props
 from FinCorrelations import FinInputs
-from Evaporator import EvaporatorClass
-import numpy as np, pylab
-import copy
-from CoolProp.Plots import Ph
+from Evaporator import EvaporatorClass,SampleEvaporatorFins
+import numpy as np
 from scipy.optimize import newton
 from ACHPTools import Write2CSV
 
+# Pools of worker processes used to calculate the circuits in parallel, keyed
+# by the number of processes.  They are kept at module level (rather than on
+# the evaporator) so that the evaporator can still be copied and pickled
+_Pools={}
+
+def _CalculateCircuit(E):
+    E.Calculate()
+    return E
+
+def _GetPool(processes):
+    """
+    A pool of processes worker processes, None if it cannot be created (in a
+    worker process of a parametric study for instance)
+    """
+    if processes not in _Pools:
+        try:
+            from multiprocessing import Pool
+            _Pools[processes]=Pool(processes)
+        except (AssertionError,OSError,ImportError):
+            _Pools[processes]=None
+    return _Pools[processes]
+
+def ClosePools():
+    """
+    Terminate the worker processes used to calculate circuits in parallel
+    """
+    for processes in list(_Pools.keys()):
+        if _Pools[processes] is not None:
+            _Pools[processes].terminate()
+        del _Pools[processes]
+
+def CircuitFins(Fins):
+    """
+    A FinInputs structure for one circuit of a coil.  The fin geometry is 
+    shared with Fins since it is the same for all the circuits, and the Tubes 
+    and Air structures are shallow copies, since the tubes per bank, the air 
+    flow rate (and the wet-surface fields set by DryWetSegment) are specific 
+    to each circuit
+    """
+    F=FinInputs()
+    F.Fins=Fins.Fins
+    F.Tubes.__dict__.update(Fins.Tubes.__dict__)
+    F.Air.__dict__.update(Fins.Air.__dict__)
+    return F
+
 #MultiCircuitEvaporator inherits things from the Evaporator base class
 class MultiCircuitEvaporatorClass(EvaporatorClass):
+    """
+    Evaporator made of circuits with different refrigerant and air flow rates
+    and inlet qualities, each of them calculated by an EvaporatorClass
+    
+    Set Processes to the number of worker processes to calculate the circuits
+    in parallel (by default they are calculated in turn).  This pays off for
+    coils with many circuits when the model is run on its own; the calls made
+    in the workers are not seen by the property caches and the 
+    instrumentation of the main process.
+    """
+    #Fields of the multi-circuit evaporator that are not passed on to the 
+    #evaporators of the circuits
+    CircuitExclude=['Evaps','Fins','Processes']
+    
     def __init__(self,**kwargs):
         self.__dict__.update(kwargs)
     def Update(self,**kwargs):
@@ -97,16 +154,15 @@ class MultiCircuitEvaporatorClass(EvaporatorClass):
         #match the number of circuits or are all equal to 1 (standard evap)
         Ncircuits=int(self.Fins.Tubes.Ncircuits)
         
-        # Make Ncircuits copies of evaporator classes defined 
-        #  by the inputs to the MCE superclass
-        EvapDict=self.__dict__
+        # Make Ncircuits evaporators defined by the inputs to the MCE 
+        # superclass.  The fields are shared (only the ones that differ 
+        # between circuits are set below) and each evaporator has its own 
+        # light-weight Fins structure, rather than a deep copy of everything
+        EvapDict=dict((k,v) for k,v in self.__dict__.items() if k not in self.CircuitExclude)
         self.Evaps=[]
         for i in range(Ncircuits):
-            # Make a deep copy to break all the links between the Fins structs
-            # of each of the evaporator instances
-            ED=copy.deepcopy(EvapDict)
-            #Create new evaporator instanciated with new deep copied dictionary
-            E=EvaporatorClass(**ED)
+            E=EvaporatorClass(**EvapDict)
+            E.Fins=CircuitFins(self.Fins)
             #Add to list of evaporators
             self.Evaps.append(E)
             
@@ -204,8 +260,16 @@ class MultiCircuitEvaporatorClass(EvaporatorClass):
             
         for i in range(Ncircuits):
             self.Evaps[i].Fins.Tubes.Ncircuits=1
-            #Actually run each Evaporator
-            self.Evaps[i].Calculate()
+            
+        #Actually run each Evaporator
+        Pool=None
+        if getattr(self,'Processes',None) and Ncircuits>1:
+            Pool=_GetPool(self.Processes)
+        if Pool is not None:
+            self.Evaps=Pool.map(_CalculateCircuit,self.Evaps)
+        else:
+            for i in range(Ncircuits):
+                self.Evaps[i].Calculate()
             
         #Collect the outputs from each of the evaporators individually
         #Try to mirror the outputs of each of the evaporators
@@ -247,46 +311,11 @@ class MultiCircuitEvaporatorClass(EvaporatorClass):
         self.Fins.Air.Vdot_ha=float(self.Fins.Air.Vdot_ha[-1])
         if self.Verbosity>0:
             print chr(127), #progress bar
-if __name__=='__main__':
-    #This code runs if this file is run by itself, but otherwise doesn't run
-    FinsTubes=FinInputs()
-
-    FinsTubes.Tubes.NTubes_per_bank=32
-    FinsTubes.Tubes.Ncircuits=5
-    FinsTubes.Tubes.Nbank=3
-    FinsTubes.Tubes.Ltube=0.452
-    FinsTubes.Tubes.OD=0.009525
-    FinsTubes.Tubes.ID=0.0089154
-    FinsTubes.Tubes.Pl=0.0254
-    FinsTubes.Tubes.Pt=0.0219964
-    
-    FinsTubes.Fins.FPI=14.5
-    FinsTubes.Fins.Pd=0.001
-    FinsTubes.Fins.xf=0.001
-    FinsTubes.Fins.t=0.00011
-    FinsTubes.Fins.k_fin=237
-    
-    FinsTubes.Air.Vdot_ha=0.5663
-    FinsTubes.Air.Tmean=299.8
-    FinsTubes.Air.Tdb=299.8
-    FinsTubes.Air.p=101.325
-    FinsTubes.Air.RH=0.51
-    FinsTubes.Air.RHmean=0.51
-    FinsTubes.Air.FanPower=438
-        
-    Tdew=282.0
-    kwargs={'Ref': 'R410A',
-            'mdot_r':  0.0708,
-            'psat_r':  Props('P','T',Tdew,'Q',1.0,'R410A'),
-            'Fins': FinsTubes,
-            'hin_r':Props('H','T',Tdew,'Q',0,'R410A')*1000,
-            'Verbosity':0
-    }
-    
-    Evap=EvaporatorClass(**kwargs)
-    Evap.Update(**kwargs)
-    Evap.Calculate()
-    print 'Q=' + str(Evap.Q) + ' W'
+def SampleMultiCircuitEvaporator():
+    """
+    The sample five-circuit evaporator with maldistributed refrigerant flow
+    """
+    FinsTubes=SampleEvaporatorFins()
         
     Tdew=282.0
     kwargs={'Ref': 'R410A',
@@ -306,6 +335,25 @@ if __name__=='__main__':
     MCE=MultiCircuitEvaporatorClass(**kwargs)
     MCE.Update(**kwargs)
     MCE.Calculate()
+    return MCE
+
+if __name__=='__main__':
+    #This code runs if this file is run by itself, but otherwise doesn't run
+    Tdew=282.0
+    kwargs={'Ref': 'R410A',
+            'mdot_r':  0.0708,
+            'psat_r':  Props('P','T',Tdew,'Q',1.0,'R410A'),
+            'Fins': SampleEvaporatorFins(),
+            'hin_r':Props('H','T',Tdew,'Q',0,'R410A')*1000,
+            'Verbosity':0
+    }
+    
+    Evap=EvaporatorClass(**kwargs)
+    Evap.Update(**kwargs)
+    Evap.Calculate()
+    print 'Q=' + str(Evap.Q) + ' W'
+        
+    MCE=SampleMultiCircuitEvaporator()
     print MCE.OutputList()
     Write2CSV(MCE,open('Evaporator_MCE.csv','w'),append=False)
     """
@@ -316,6 +364,8 @@ if __name__=='__main__':
     p=MCE.psat_r*(1+0*h)
     
     # plott maldistribution
+    import pylab
+    from CoolProp.Plots import Ph
     Ph('R410A')
     pylab.plot(h/1000,p,'o')
     pylab.plot(MCE.hout_r/1000,MCE.psat_r,'o')
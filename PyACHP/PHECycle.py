@@ -7,7 +7,7 @@ from Pump import PumpClass # Secondary loop pump class
 from PHEHX import PHEHXClass
 from scipy.optimize import brent, fsolve 
 #^^ fsolve - roots (multiple variables); brent - root of one variable fct
-from CoolProp.CoolProp import Props #,Tsat             #refrigerant properties
+from Properties import Props #,Tsat             #refrigerant properties
 from FinCorrelations import WavyLouveredFins,FinInputs     #fin correlations
 import numpy as np                  #NumPy is fundamental scientific package                                   
 
@@ -1,11 +1,9 @@
 from __future__ import division
-from CoolProp.CoolProp import Props#,IsFluidType
+from Properties import Props,SatState#,IsFluidType
 from Correlations import ShahEvaporation_Average,PHE_1phase_hdP,Cooper_PoolBoiling,TwoPhaseDensity,TrhoPhase_ph,Phase_ph,LMPressureGradientAvg,KandlikarPHE,Bertsch_MC,AccelPressureDrop,ShahCondensation_Average,LongoCondensation
 from math import pi,exp,log,sqrt,tan,cos,sin
-from scipy.optimize import brentq
+from Instrumentation import brentq
 import numpy as np
-#from CoolProp.Plots import Ph
-import pylab
 
 class PHEHXClass():
     """
@@ -33,7 +31,15 @@ class PHEHXClass():
     might exist.  
     
     Based on inlet states can figure out what states are possible.  
+    
+    The single-phase plate correlation is evaluated at the mean temperature
+    of the cell rounded to TmeanTol [K], and its results are kept for the 
+    duration of the call to Calculate, since the mean temperatures hardly 
+    change between the last iterations on the heat transfer rate.  Set 
+    TmeanTol to 0 to evaluate it at the exact temperature every time.
     """
+    #Resolution of the mean temperatures of the single-phase plate correlation
+    TmeanTol=1e-3
     
     def __init__(self,**kwargs):
         #Load the parameters passed in
@@ -104,10 +110,6 @@ class PHEHXClass():
         # See if each phase could change phase if it were to reach the
         # inlet temperature of the opposite phase 
         
-        #Inlet phases
-        self.Tin_h,rhoin_h,Phasein_h=TrhoPhase_ph(self.Ref_h,self.pin_h,self.hin_h,self.Tbubble_h,self.Tdew_h,self.rhosatL_h,self.rhosatV_h)
-        self.Tin_c,rhoin_c,Phasein_c=TrhoPhase_ph(self.Ref_c,self.pin_c,self.hin_c,self.Tbubble_c,self.Tdew_c,self.rhosatL_c,self.rhosatV_c)
-        
         # Find the maximum possible rate of heat transfer as the minimum of 
         # taking each stream to the inlet temperature of the other stream
         hout_h=Props('H','T',self.Tin_c,'P',self.pin_h,self.Ref_h)*1000
@@ -123,17 +125,12 @@ class PHEHXClass():
         #
         # First we build the same vectors of enthalpies like below
         EnthalpyList_c,EnthalpyList_h=self.BuildEnthalpyLists(Qmax)
-        # Then we find the temperature of each stream at each junction
-        TList_c=np.zeros_like(EnthalpyList_c)
-        TList_h=np.zeros_like(EnthalpyList_h)
-
         if not len(EnthalpyList_h)==len(EnthalpyList_c):
             raise ValueError('Length of enthalpy lists for both fluids must be the same')
         
-        #Make the lists of temperatures of each fluid at each cell boundary
-        for i in range(len(EnthalpyList_h)):
-            TList_c[i]=TrhoPhase_ph(self.Ref_c,self.pin_c,EnthalpyList_c[i],self.Tbubble_c,self.Tdew_c,self.rhosatL_c,self.rhosatV_c)[0]
-            TList_h[i]=TrhoPhase_ph(self.Ref_h,self.pin_h,EnthalpyList_h[i],self.Tbubble_h,self.Tdew_h,self.rhosatL_h,self.rhosatV_h)[0]
+        # Then we find the temperature of each stream at each junction
+        TList_c=self.StreamTemperatures('c',EnthalpyList_c)
+        TList_h=self.StreamTemperatures('h',EnthalpyList_h)
 
 #        #Double-check that the edges are not pinched
 #        if TList_c[0]-1e-9>TList_h[0] or TList_c[-1]-1e-9>TList_h[-1]:
@@ -157,7 +154,16 @@ class PHEHXClass():
     def PlateHTDP(self,Ref,T,p,mdot_gap):
         """
         For single phase fluids, inputs in K, kPa, outputs in W/m^2-K, J/kg-K
+        
+        The temperature is rounded to TmeanTol, and the results are cached 
+        until the next call to Calculate
         """
+        if self.TmeanTol>0:
+            T=round(T/self.TmeanTol)*self.TmeanTol
+        key=(Ref,T,p,mdot_gap)
+        if key in self._PlateCache:
+            Outputs=self._PlateCache[key]
+            return Outputs['h'],Outputs['cp'],Outputs
         Inputs={
             'Ref':Ref,
             'T':T,
@@ -170,8 +176,68 @@ class PHEHXClass():
             'Lp': self.Lp
         }
         Outputs=PHE_1phase_hdP(Inputs)
+        self._PlateCache[key]=Outputs
         return Outputs['h'],Outputs['cp'],Outputs
     
+    def SaturationStates(self):
+        """
+        Saturated liquid and vapor enthalpies of both streams [J/kg].  They do
+        not depend on the heat transfer rate, so they are found once in 
+        Calculate rather than for each iteration on Q.  A brine never changes
+        phase, so its saturation enthalpies are set out of reach
+        """
+        if str.lower(self.Ref_h)=='brine':
+            self.hsatL_h=1e9
+            self.hsatV_h=1e9
+        else:
+            self.hsatL_h=Props('H','T',self.Tbubble_h,'D',self.rhosatL_h,self.Ref_h)*1000
+            self.hsatV_h=Props('H','T',self.Tdew_h,'D',self.rhosatV_h,self.Ref_h)*1000
+        
+        if str.lower(self.Ref_c)=='brine':
+            self.hsatL_c=1e9
+            self.hsatV_c=1e9
+        else:
+            self.hsatL_c=Props('H','T',self.Tbubble_c,'D',self.rhosatL_c,self.Ref_c)*1000
+            self.hsatV_c=Props('H','T',self.Tdew_c,'D',self.rhosatV_c,self.Ref_c)*1000
+        
+    def StreamTemperatures(self,Stream,hList):
+        """
+        Temperatures [K] of the hot (Stream='h') or cold (Stream='c') stream 
+        at its inlet pressure for an array of enthalpies [J/kg], as given by
+        TrhoPhase_ph.  In the two-phase region the temperature is linear in
+        enthalpy, so it is evaluated for the whole array at once; the 
+        single-phase temperatures are kept until the next call to Calculate
+        since the inlet and saturation states come up at every iteration
+        """
+        if Stream=='h':
+            Ref,p,Tbubble,Tdew,hsatL,hsatV=self.Ref_h,self.pin_h,self.Tbubble_h,self.Tdew_h,self.hsatL_h,self.hsatV_h
+        else:
+            Ref,p,Tbubble,Tdew,hsatL,hsatV=self.Ref_c,self.pin_c,self.Tbubble_c,self.Tdew_c,self.hsatL_c,self.hsatV_c
+        h=np.array(hList,dtype=float)
+        TwoPhase=(h>=hsatL)&(h<=hsatV)
+        T=np.zeros_like(h)
+        if np.any(TwoPhase):
+            x=(h[TwoPhase]-hsatL)/(hsatV-hsatL)
+            T[TwoPhase]=x*Tdew+(1-x)*Tbubble
+        Cache=self._TCache[Stream]
+        for i in np.flatnonzero(~TwoPhase):
+            if h[i] not in Cache:
+                Cache[h[i]]=Props('T','H',h[i]/1000,'P',p,Ref)
+            T[i]=Cache[h[i]]
+        return T
+    
+    def StreamPhases(self,Stream,h):
+        """
+        Phases ('Subcooled','TwoPhase' or 'Superheated') of the hot or cold 
+        stream for an array of enthalpies [J/kg], as given by Phase_ph
+        """
+        if Stream=='h':
+            hsatL,hsatV=self.hsatL_h,self.hsatV_h
+        else:
+            hsatL,hsatV=self.hsatL_c,self.hsatV_c
+        h=np.asarray(h)
+        return np.where(h>hsatV,'Superheated',np.where(h<hsatL,'Subcooled','TwoPhase'))
+    
     def BuildEnthalpyLists(self,Q):
         #Start the enthalpy lists with inlet and outlet enthalpies
         #Ordered from lowest to highest enthalpies for both streams
@@ -183,20 +249,10 @@ class PHEHXClass():
         self.hout_h=EnthalpyList_h[0]
         self.hout_c=EnthalpyList_c[1]
         
-        #Find the phase boundaries that exist, and add them to lists
-        if str.lower(self.Ref_h)=='brine':
-            hsatL_h=1e9
-            hsatV_h=1e9
-        else:
-            hsatL_h=Props('H','T',self.Tbubble_h,'D',self.rhosatL_h,self.Ref_h)*1000
-            hsatV_h=Props('H','T',self.Tdew_h,'D',self.rhosatV_h,self.Ref_h)*1000
-        
-        if str.lower(self.Ref_c)=='brine':
-            hsatL_c=1e9
-            hsatV_c=1e9
-        else:
-            hsatL_c=Props('H','T',self.Tbubble_c,'D',self.rhosatL_c,self.Ref_c)*1000
-            hsatV_c=Props('H','T',self.Tdew_c,'D',self.rhosatV_c,self.Ref_c)*1000
+        #Find the phase boundaries that exist (see SaturationStates), and 
+        #add them to lists
+        hsatL_h,hsatV_h=self.hsatL_h,self.hsatV_h
+        hsatL_c,hsatV_c=self.hsatL_c,self.hsatV_c
         
         # Check whether the enthalpy boundaries are within the bounds set by 
         # the imposed amount of heat transfer
@@ -226,12 +282,7 @@ class PHEHXClass():
                 EnthalpyList_h.insert(I_h+1, EnthalpyList_h[I_h]+Qbound_c/self.mdot_h)
             I_h+=1
             I_c+=1
-                    
-        self.hsatL_c=hsatL_c
-        self.hsatL_h=hsatL_h
-        self.hsatV_c=hsatV_c
-        self.hsatV_h=hsatV_h
-
+            
         return EnthalpyList_c,EnthalpyList_h
     
     def PostProcess(self,cellList):
@@ -366,8 +417,8 @@ class PHEHXClass():
         else:
             self.sout_c=Props('S','T',self.Tout_c,'D',self.rhoout_c,self.Ref_c)*1000
             #Effective subcooling for both streams
-            hsatL=Props('H','T',self.Tbubble_c,'Q',0,self.Ref_c)*1000
-            cpsatL=Props('C','T',self.Tbubble_c,'Q',0,self.Ref_c)*1000
+            hsatL=self._Sat_c.L.h
+            cpsatL=self._Sat_c.L.cp
             if self.hout_c>hsatL:
                 #Outlet is at some quality on cold side
                 self.DT_sc_c=-(self.hout_c-hsatL)/cpsatL
@@ -379,8 +430,8 @@ class PHEHXClass():
             self.DT_sc_h=1e9
         else:
             self.sout_h=Props('S','T',self.Tout_h,'D',self.rhoout_h,self.Ref_h)*1000
-            hsatL=Props('H','T',self.Tbubble_h,'Q',0,self.Ref_h)*1000
-            cpsatL=Props('C','T',self.Tbubble_h,'Q',0,self.Ref_h)*1000
+            hsatL=self._Sat_h.L.h
+            cpsatL=self._Sat_h.L.cp
             if self.hout_h>hsatL:
                 #Outlet is at some quality on cold side
                 self.DT_sc_h=-(self.hout_h-hsatL)/cpsatL
@@ -598,11 +649,12 @@ class PHEHXClass():
             self.Tdew_c = None
             self.Tsat_c = None
         else:
-            self.Tbubble_c=Props('T','P',self.pin_c,'Q',0,self.Ref_c)
-            self.Tdew_c=Props('T','P',self.pin_c,'Q',1,self.Ref_c)
+            self._Sat_c=SatState(self.Ref_c,p=self.pin_c)
+            self.Tbubble_c=self._Sat_c.Tbubble
+            self.Tdew_c=self._Sat_c.Tdew
             self.Tsat_c=(self.Tbubble_c+self.Tdew_c)/2.0
-            self.rhosatL_c=Props('D','T',self.Tbubble_c,'Q',0,self.Ref_c)
-            self.rhosatV_c=Props('D','T',self.Tdew_c,'Q',1,self.Ref_c)
+            self.rhosatL_c=self._Sat_c.L.rho
+            self.rhosatV_c=self._Sat_c.V.rho
         
         
         if str.lower(self.Ref_h)=='brine':
@@ -613,11 +665,17 @@ class PHEHXClass():
             self.rhosatV_h=None
         else:
             #Saturation temperatures for hot fluid
-            self.Tbubble_h=Props('T','P',self.pin_h,'Q',0,self.Ref_h)
-            self.Tdew_h=Props('T','P',self.pin_h,'Q',1,self.Ref_h)
+            self._Sat_h=SatState(self.Ref_h,p=self.pin_h)
+            self.Tbubble_h=self._Sat_h.Tbubble
+            self.Tdew_h=self._Sat_h.Tdew
             self.Tsat_h=(self.Tbubble_h+self.Tdew_h)/2.0
-            self.rhosatL_h=Props('D','T',self.Tbubble_h,'Q',0,self.Ref_h)
-            self.rhosatV_h=Props('D','T',self.Tdew_h,'Q',1,self.Ref_h)
+            self.rhosatL_h=self._Sat_h.L.rho
+            self.rhosatV_h=self._Sat_h.V.rho
+        
+        #Results that only hold for these inputs
+        self._PlateCache={}
+        self._TCache={'h':{},'c':{}}
+        self.SaturationStates()
         
         #The rest of the inlet states
         self.Tin_h,self.rhoin_h=TrhoPhase_ph(self.Ref_h,self.pin_h,self.hin_h,self.Tbubble_h,self.Tdew_h,self.rhosatL_h,self.rhosatV_h)[0:2]
@@ -697,46 +755,41 @@ class PHEHXClass():
 #            pylab.plot(np.array(EnthalpyList_h)/1000,self.pin_h*np.ones_like(EnthalpyList_h))
 #            pylab.show()
             
-            I_h=0
-            I_c=0
+            #The cells are bounded by consecutive entries of the enthalpy
+            #lists, which are already matched between the streams
+            EnthalpyList_h=np.array(EnthalpyList_h)
+            EnthalpyList_c=np.array(EnthalpyList_c)
+            Qbound_h=self.mdot_h*np.diff(EnthalpyList_h)
+            Qbound_c=self.mdot_c*np.diff(EnthalpyList_c)
+            QboundList=np.where(Qbound_h>Qbound_c+1e-9,Qbound_c,Qbound_h)
+            
+            #Inlet and outlet enthalpy of each cell
+            houtList_h=EnthalpyList_h[0:-1]
+            hinList_h=houtList_h+QboundList/self.mdot_h
+            hinList_c=EnthalpyList_c[0:-1]
+            houtList_c=hinList_c+QboundList/self.mdot_c
+            
+            # Figure out what combination of phases you have:
+            # -------------------------------------------------
+            # Hot stream is either single phase or condensing
+            # Cold stream is either single phase or evaporating
+            
+            #Use midpoint enthalpies to figure out the phase in the cell
+            PhaseList_h=self.StreamPhases('h',(hinList_h+houtList_h)/2)
+            PhaseList_c=self.StreamPhases('c',(hinList_c+houtList_c)/2)
+            #Inlet and outlet temperatures of the cells
+            TinList_h=self.StreamTemperatures('h',hinList_h)
+            TinList_c=self.StreamTemperatures('c',hinList_c)
+            ToutList_h=self.StreamTemperatures('h',houtList_h)
+            ToutList_c=self.StreamTemperatures('c',houtList_c)
+            
             wList=[]
             cellList=[]
-            while I_h<len(EnthalpyList_h)-1:
-                #Try to figure out whether the next phase transition is on the hot or cold side     
-                Qbound_h=self.mdot_h*(EnthalpyList_h[I_h+1]-EnthalpyList_h[I_h])
-                Qbound_c=self.mdot_c*(EnthalpyList_c[I_c+1]-EnthalpyList_c[I_c])
-                if Qbound_h<Qbound_c-1e-9:
-                    # Minimum amount of heat transfer is on the hot side,
-                    # add another entry to EnthalpyList_c 
-                    Qbound=Qbound_h
-                    EnthalpyList_c.insert(I_c+1, EnthalpyList_c[I_c]+Qbound/self.mdot_c)
-                elif Qbound_h>Qbound_c+1e-9:
-                    # Minimum amount of heat transfer is on the cold side,
-                    # add another entry to EnthalpyList_h at the interface
-                    Qbound=Qbound_c
-                    EnthalpyList_h.insert(I_h+1, EnthalpyList_h[I_h]+Qbound/self.mdot_h)
-                else:
-                    Qbound=Qbound_h
-                
-                #Figure out the inlet and outlet enthalpy for this cell
-                hout_h=EnthalpyList_h[I_h]
-                hin_h=hout_h+Qbound/self.mdot_h
-                hin_c=EnthalpyList_c[I_c]
-                hout_c=hin_c+Qbound/self.mdot_c
-                
-                # Figure out what combination of phases you have:
-                # -------------------------------------------------
-                # Hot stream is either single phase or condensing
-                # Cold stream is either single phase or evaporating
-                
-                #Use midpoint enthalpies to figure out the phase in the cell
-                Phase_h=Phase_ph(self.Ref_h,self.pin_h,(hin_h+hout_h)/2,self.Tbubble_h,self.Tdew_h,self.rhosatL_h,self.rhosatV_h)
-                Phase_c=Phase_ph(self.Ref_c,self.pin_c,(hin_c+hout_c)/2,self.Tbubble_c,self.Tdew_c,self.rhosatL_c,self.rhosatV_c)
-                #Determine inlet and outlet temperatures to the cell ([0] gives the first element of the tuple which is temeperature)
-                Tin_h=TrhoPhase_ph(self.Ref_h,self.pin_h,hin_h,self.Tbubble_h,self.Tdew_h,self.rhosatL_h,self.rhosatV_h)[0]
-                Tin_c=TrhoPhase_ph(self.Ref_c,self.pin_c,hin_c,self.Tbubble_c,self.Tdew_c,self.rhosatL_c,self.rhosatV_c)[0]
-                Tout_h=TrhoPhase_ph(self.Ref_h,self.pin_h,hout_h,self.Tbubble_h,self.Tdew_h,self.rhosatL_h,self.rhosatV_h)[0]
-                Tout_c=TrhoPhase_ph(self.Ref_c,self.pin_c,hout_c,self.Tbubble_c,self.Tdew_c,self.rhosatL_c,self.rhosatV_c)[0]
+            for I in range(len(QboundList)):
+                Qbound=QboundList[I]
+                hin_h,hout_h,hin_c,hout_c=hinList_h[I],houtList_h[I],hinList_c[I],houtList_c[I]
+                Tin_h,Tout_h,Tin_c,Tout_c=TinList_h[I],ToutList_h[I],TinList_c[I],ToutList_c[I]
+                Phase_h,Phase_c=str(PhaseList_h[I]),str(PhaseList_c[I])
                 
                 if Phase_h in ['Subcooled','Superheated'] and Phase_c in ['Subcooled','Superheated']:
                     # Both are single-phase
@@ -808,9 +861,6 @@ class PHEHXClass():
                     wList.append(Outputs['w'])
                     cellList.append(Outputs)
                     
-                I_h+=1
-                I_c+=1
-                
             self.cellList=cellList
             if self.Verbosity>6:
                 print 'wsum:', np.sum(wList)
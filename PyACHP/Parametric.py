@@ -0,0 +1,366 @@
+'''
+Headless parametric study runner
+
+The points of the parametric study are all the combinations of the values of
+each variable (like the parametric study in the GUI).  They are split into
+chunks of neighbouring points and the chunks are solved in a pool of worker
+processes.  Each worker builds its own base cycle once by calling a factory
+function, so the cycle never needs to be pickled.  Results are written to the
+CSV file (or .npz file, see ResultsStore) as each chunk is finished, and a 
+point that fails to solve is recorded in the failures file without stopping 
+the rest of the study.
+
+Within a chunk, each point is warm-started from the solution of the previous
+points (see Preconditioners.ContinuationGuess), which falls back to the full
+preconditioner if the solver does not converge from the warm start.
+
+Variables are given by their dotted paths, the same syntax as the third field
+of GUI/parametric/params.txt, for instance ``Cycle.Condenser.Fins.Air.Tdb``
+
+From python::
+
+    from Parametric import RunParametric
+    RunParametric('SampleCycles:SampleDXACSystem',
+                  [('Cycle.Condenser.Fins.Air.Tdb',np.linspace(300,320,5)),
+                   ('Cycle.Evaporator.DT_sh',[3,5,7])],
+                  path='Sweep.csv',
+                  FactoryKwargs={'Calculate':False})
+
+From the command line::
+
+    python Parametric.py --factory SampleCycles:SampleDXACSystem
+        --factory-kwarg Calculate=False
+        --var Cycle.Condenser.Fins.Air.Tdb=300:320:5
+        --var Cycle.Evaporator.DT_sh=3,5,7 --out Sweep.csv --npz Sweep.npz
+
+Values are given either as Min:Max:N (N evenly spaced values) or as a comma
+separated list of values
+'''
+from __future__ import division
+import os
+import sys
+import csv
+import copy
+import time
+import itertools
+import traceback
+from multiprocessing import Pool,cpu_count
+import numpy as np
+from Preconditioners import ContinuationGuess
+from Solve import CycleOutputs
+from ResultsStore import ResultsWriter
+
+def ReadParamsFile(path):
+    """
+    Read a parameter file in the format of GUI/parametric/params.txt and return
+    a list of (description, units, variable path) tuples
+    """
+    params=[]
+    for line in open(path,'r'):
+        line=line.strip()
+        if len(line)==0 or line.startswith('#'):
+            continue
+        fields=[field.strip() for field in line.split('::')]
+        if len(fields)!=3:
+            raise ValueError('Line "'+line+'" is not of the form desc :: units :: variable')
+        params.append(tuple(fields))
+    return params
+
+def SetField(Cycle,VariableString,value):
+    """
+    Set the value of a dotted path like Cycle.Condenser.Fins.Air.Tdb, checking
+    that each level of the path exists
+    """
+    fields=VariableString.strip().split('.')
+    if len(fields)==0:
+        raise ValueError('Empty variable name')
+    if fields[0]=='Cycle':
+        fields.pop(0)
+    item=Cycle
+    while len(fields)>1:
+        item=getattr(item,fields[0])
+        fields.pop(0)
+    if not hasattr(item,fields[0]):
+        raise AttributeError(VariableString+' is not a valid variable')
+    setattr(item,fields[0],value)
+
+def GetField(Cycle,VariableString):
+    """
+    Get the value of a dotted path like Cycle.Condenser.Fins.Air.Tdb
+    """
+    fields=VariableString.strip().split('.')
+    if fields[0]=='Cycle':
+        fields.pop(0)
+    item=Cycle
+    for field in fields:
+        item=getattr(item,field)
+    return item
+
+def LoadFactory(Factory):
+    """
+    Factory is either a callable or a string of the form 'module:function'
+    """
+    if callable(Factory):
+        return Factory
+    module,function=Factory.split(':')
+    return getattr(__import__(module,fromlist=[function]),function)
+
+# The base cycle of this worker process, built once by _InitWorker, the
+# cache of solved cycles if there is one, and the traceback of the error if
+# the initialization of a pool worker failed
+_BaseCycle=None
+_Cache=None
+_InitError=None
+
+def _InitWorker(Factory,FactoryKwargs,Instrument=False,CachePath=None):
+    global _BaseCycle,_Cache
+    _BaseCycle=LoadFactory(Factory)(**FactoryKwargs)
+    if Instrument:
+        _BaseCycle.Instrument=True
+    if CachePath is not None:
+        from SolveCache import SolveCache
+        _Cache=SolveCache(CachePath)
+
+def _InitPoolWorker(*args):
+    """
+    _InitWorker for the workers of a pool.  An exception raised by the 
+    initializer of a pool makes it start new workers forever while the parent
+    process waits, so the error is kept and raised by the first chunk
+    instead, which passes it to the parent process
+    """
+    global _InitError
+    try:
+        _InitWorker(*args)
+    except Exception:
+        _InitError=traceback.format_exc()
+
+def _SolveChunk(Chunk):
+    """
+    Solve a chunk of points with the base cycle of this process.  Chunk is a
+    tuple of (Variables, list of (index, values), WarmStart, Extrapolate)
+
+    Returns a list of (index, values, outputs, error message) where outputs is
+    None if the point failed and error message is None if it succeeded
+    """
+    if _InitError is not None:
+        raise RuntimeError('The worker process could not build the base cycle:\n'+_InitError)
+    Variables,Points,WarmStart,Extrapolate=Chunk
+    results=[]
+    History=[]
+    for index,values in Points:
+        Cycle=copy.deepcopy(_BaseCycle)
+        try:
+            for Variable,value in zip(Variables,values):
+                SetField(Cycle,Variable,value)
+            PrecondValues=ContinuationGuess(History,values,Extrapolate) if WarmStart else None
+            if _Cache is not None:
+                Entry=_Cache.Solve(Cycle,PrecondValues=PrecondValues)
+                Outputs,Solution=Entry['Outputs'],Entry['PrecondValues']
+            else:
+                Cycle.PreconditionedSolve(PrecondValues=PrecondValues)
+                Outputs,Solution=CycleOutputs(Cycle),Cycle.GetPrecondValues()
+            if WarmStart:
+                History=History[-1::]+[(values,Solution)]
+            results.append((index,values,Outputs,None))
+        except Exception:
+            message=traceback.format_exc().strip().split('\n')[-1]
+            results.append((index,values,None,message))
+    return results
+
+def _Chunks(Variables,Points,chunksize,WarmStart,Extrapolate):
+    for i in range(0,len(Points),chunksize):
+        yield (Variables,Points[i:i+chunksize],WarmStart,Extrapolate)
+
+def _ScatterColumns(writer,VariableNames,N):
+    """
+    Numeric columns of the rows kept by the writer, in the order of the index
+    of the points (NaN for the failed points and the columns of strings),
+    keyed by 'Index', the variable paths and 'component:description'
+    """
+    if writer.Nrows==0:
+        return {}
+    Rows=writer.Columns()
+    index=Rows['Parametric Study','Index'].astype(int)
+    Columns={}
+    for component,head,units in writer.Schema:
+        key=head if component=='Parametric Study' else component+':'+head
+        Columns[key]=np.nan*np.ones(N)
+        if Rows[component,head].dtype.kind=='f':
+            Columns[key][index]=Rows[component,head]
+    return Columns
+
+def RunParametric(Factory,Variables,path='Parametric.csv',npzpath=None,
+                  FactoryKwargs=None,processes=None,chunksize=None,
+                  Units=None,WarmStart=True,Extrapolate=True,Instrument=False,
+                  CachePath=None,Samples=None,Verbosity=1):
+    """
+    Run a parametric study
+
+    =============   ===========================================================
+    Variable        Description
+    =============   ===========================================================
+    Factory         callable or 'module:function' string that returns a
+                    configured but unsolved cycle
+    Variables       list of (dotted variable path, list of values)
+    path            CSV file for the results of the successful points, or
+                    an .npz file for the columnar format of ResultsStore
+    npzpath         optional numpy .npz file with one column per output
+    FactoryKwargs   dict of keyword arguments passed to the factory
+    processes       number of worker processes (default: number of cores),
+                    with 1 everything is run in this process
+    chunksize       number of neighbouring points solved by a worker in turn
+                    (default: about four chunks per worker, of 3 to 20 points)
+    Units           optional dict of units for the variable paths
+    WarmStart       if True, start each point from the solution of the
+                    previous points in the chunk
+    Extrapolate     if True, linearly extrapolate the warm start guess along
+                    the direction of the sweep
+    Instrument      if True, count the property calls, correlation calls and
+                    solver iterations of each point and add the totals to the
+                    outputs (see Instrumentation)
+    CachePath       optional directory of a cache of solved cycles shared by
+                    the workers; points solved before are not solved again
+                    (see SolveCache)
+    Samples         optional list of points to run in place of all the 
+                    combinations of the values of the variables, each a list
+                    of the values of the variables in the order of Variables
+                    (the lists of values in Variables are then not used)
+    Verbosity       0 for no output, 1 for progress
+    =============   ===========================================================
+
+    Failed points are written to path with '.failures.csv' in place of '.csv'
+
+    Returns a dictionary with the keys 'Index', each variable path, each output
+    (as 'component:description') as numpy arrays (NaN for failed points) and
+    'Failures', a list of (index, values, error message)
+    """
+    if FactoryKwargs is None:
+        FactoryKwargs={}
+    if Units is None:
+        Units={}
+    VariableNames=[Variable for Variable,values in Variables]
+    if Samples is None:
+        Samples=itertools.product(*[values for Variable,values in Variables])
+    Points=[(index,tuple(values)) for index,values in enumerate(Samples)]
+    if len(Points)==0:
+        raise ValueError('No parametric points to run')
+    if processes is None:
+        processes=cpu_count()
+    if chunksize is None:
+        #About four chunks per worker to balance the load, but never fewer than
+        #3 neighbouring points so that the warm start has something to work with
+        chunksize=min(len(Points),max(3,min(20,-(-len(Points)//(4*processes)))))
+
+    failurespath=os.path.splitext(path)[0]+'.failures.csv'
+    writer=ResultsWriter(path,Keep=True)
+    fF=open(failurespath,'w')
+    failwriter=csv.writer(fF,lineterminator='\n')
+    failwriter.writerow(['Index']+VariableNames+['Error'])
+
+    Failures=[]
+    Ndone=0
+    t1=time.time()
+
+    if processes==1:
+        _InitWorker(Factory,FactoryKwargs,Instrument,CachePath)
+        ResultIterator=itertools.imap(_SolveChunk,_Chunks(VariableNames,Points,chunksize,WarmStart,Extrapolate))
+    else:
+        pool=Pool(processes,initializer=_InitPoolWorker,initargs=(Factory,FactoryKwargs,Instrument,CachePath))
+        ResultIterator=pool.imap_unordered(_SolveChunk,_Chunks(VariableNames,Points,chunksize,WarmStart,Extrapolate))
+
+    try:
+        for results in ResultIterator:
+            for index,values,Outputs,message in results:
+                Ndone+=1
+                if Outputs is None:
+                    Failures.append((index,values,message))
+                    failwriter.writerow([index]+list(values)+[message])
+                    fF.flush()
+                    continue
+                #The first successful point defines the columns of the file
+                writer.Append([('Parametric Study','Index','-',index)]
+                              +[('Parametric Study',Variable,Units.get(Variable,'-'),value) for Variable,value in zip(VariableNames,values)]
+                              +Outputs)
+            writer.Flush()
+            if Verbosity>0:
+                print 'Parametric study: %d/%d points done, %d failed, %0.1f s elapsed' %(Ndone,len(Points),len(Failures),time.time()-t1)
+    finally:
+        if processes!=1:
+            pool.terminate()
+        writer.Close()
+        fF.close()
+
+    Columns=_ScatterColumns(writer,VariableNames,len(Points))
+    if npzpath is not None and len(Columns)>0:
+        np.savez(npzpath,**dict((key.replace('/','_'),value) for key,value in Columns.items()))
+
+    Columns['Failures']=Failures
+    return Columns
+
+def ParseValues(string):
+    """
+    Convert either 'Min:Max:N' or a comma-separated list into a list of floats
+    """
+    if ':' in string:
+        Min,Max,N=string.split(':')
+        return list(np.linspace(float(Min),float(Max),int(N)))
+    else:
+        return [float(value) for value in string.split(',')]
+
+def ParseKwarg(string):
+    """
+    Convert 'key=value' into (key, value) where value is converted to a bool,
+    int or float if possible
+    """
+    key,value=string.split('=',1)
+    if value in ('True','False'):
+        return key,value=='True'
+    for converter in (int,float):
+        try:
+            return key,converter(value)
+        except ValueError:
+            pass
+    return key,value
+
+if __name__=='__main__':
+    from optparse import OptionParser
+    parser=OptionParser(usage='python Parametric.py --factory module:function --var Cycle.path=Min:Max:N [options]')
+    parser.add_option('--factory',dest='factory',help='module:function that returns the base cycle')
+    parser.add_option('--factory-kwarg',dest='factorykwargs',action='append',default=[],help='key=value passed to the factory, can be repeated')
+    parser.add_option('--var',dest='vars',action='append',default=[],help='Cycle.path=Min:Max:N or Cycle.path=v1,v2,v3, can be repeated')
+    parser.add_option('--params',dest='params',default=None,help='parameter file like GUI/parametric/params.txt to get the units')
+    parser.add_option('--out',dest='out',default='Parametric.csv',help='CSV (or .npz) output file')
+    parser.add_option('--npz',dest='npz',default=None,help='numpy .npz columnar output file')
+    parser.add_option('-j','--processes',dest='processes',type='int',default=None,help='number of worker processes')
+    parser.add_option('--chunksize',dest='chunksize',type='int',default=None,help='points per chunk of work')
+    parser.add_option('--cold',dest='warmstart',action='store_false',default=True,help='run the preconditioner for every point (no warm start)')
+    parser.add_option('--no-extrapolate',dest='extrapolate',action='store_false',default=True,help='warm start from the previous point without extrapolation')
+    parser.add_option('--cache',dest='cache',default=None,help='directory of the cache of solved cycles')
+    parser.add_option('--instrument',dest='instrument',action='store_true',default=False,help='add property call, correlation call and solver iteration counts to the outputs')
+    (options,args)=parser.parse_args()
+
+    if options.factory is None or len(options.vars)==0:
+        parser.error('--factory and at least one --var are required')
+
+    Variables=[]
+    for var in options.vars:
+        Variable,values=var.split('=',1)
+        Variables.append((Variable.strip(),ParseValues(values)))
+    Units={}
+    if options.params is not None:
+        for desc,units,Variable in ReadParamsFile(options.params):
+            Units[Variable]=units
+
+    Results=RunParametric(options.factory,Variables,
+                          path=options.out,
+                          npzpath=options.npz,
+                          FactoryKwargs=dict(ParseKwarg(kwarg) for kwarg in options.factorykwargs),
+                          processes=options.processes,
+                          chunksize=options.chunksize,
+                          Units=Units,
+                          WarmStart=options.warmstart,
+                          Extrapolate=options.extrapolate,
+                          Instrument=options.instrument,
+                          CachePath=options.cache)
+    if len(Results['Failures'])>0:
+        sys.exit(1)
@@ -1,6 +1,6 @@
-from CoolProp.CoolProp import Props
-from CoolProp.HumidAirProp import HAProps
+from Properties import Props,HAProps
 from scipy.optimize import fsolve
+import numpy as np
 
 import Correlations
 from Solvers import MultiDimNewtRaph
@@ -197,4 +197,47 @@ def SecondaryLoopPreconditioner(Cycle,epsilon=0.9):
         raise ValueError()
         
     return DT_evap,DT_cond,Tin_CC
-    
\ No newline at end of file
+    
+def ContinuationGuess(History,values,Extrapolate=True):
+    """
+    Initial guess (PrecondValues) for a point of a sweep from the points that
+    have already been solved, for warm-starting PreconditionedSolve
+    
+    History is a list of (values, PrecondValues) of the solved points, most 
+    recent last, where values is the list of the swept variables.  The last 
+    solved point is used as the guess, and if Extrapolate is True and the 
+    last two solved points lie in the same direction as the new point (as 
+    happens when stepping along one variable), the guess is linearly 
+    extrapolated along that direction.
+    
+    Returns None if there are no solved points
+    """
+    if len(History)==0:
+        return None
+    values1,Guess1=History[-1]
+    if not Extrapolate or len(History)<2:
+        return dict(Guess1)
+    values0,Guess0=History[-2]
+    
+    #Step between the last two points and from the last point to the new one
+    step_old=np.array(values1,dtype=float)-np.array(values0,dtype=float)
+    step_new=np.array(values,dtype=float)-np.array(values1,dtype=float)
+    norm_old=np.sqrt(np.dot(step_old,step_old))
+    norm_new=np.sqrt(np.dot(step_new,step_new))
+    if norm_old==0 or norm_new==0:
+        return dict(Guess1)
+    #Only extrapolate if the steps are in the same direction
+    if np.dot(step_old,step_new)/(norm_old*norm_new)<1-1e-10:
+        return dict(Guess1)
+    t=norm_new/norm_old
+    Guess={}
+    for key in Guess1:
+        if key in Guess0:
+            Guess[key]=Guess1[key]+t*(Guess1[key]-Guess0[key])
+        else:
+            Guess[key]=Guess1[key]
+    #Pressure drops cannot be negative
+    for key in ('DP_low','DP_high'):
+        if key in Guess:
+            Guess[key]=max(Guess[key],0)
+    return Guess
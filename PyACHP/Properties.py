@@ -0,0 +1,586 @@
+'''
+Shared refrigerant property service for all of PyACHP
+
+Every component should import Props from here rather than directly from
+CoolProp so that repeated calls at the same state (saturation states in
+particular are recomputed many times per cycle evaluation) are only calculated
+once by CoolProp.
+
+The cache is a bounded least-recently-used cache keyed on (output, input
+pair, rounded input values, fluid). Inputs are rounded to 12 significant
+figures, well below the precision of the equations of state, so the cached
+values are indistinguishable from direct calls.
+
+Usage::
+
+    from Properties import Props
+    Props('T','P',1000,'Q',0,'R410A')
+
+    import Properties
+    Properties.CacheInfo()       # hits, misses, size
+    Properties.CallCounts()      # number of calls to Props and to CoolProp
+    Properties.DisableCache()    # call CoolProp directly again
+
+Humid air properties (HAProps, cair_sat and HAcp) should also be imported from
+here; they are cached in the same way, and can be instrumented (see
+Instrumentation).
+
+Several properties at the same state should be read from a State (or a
+SatState for the saturated liquid and vapor), which calls Props once for each
+of them and keeps the values::
+
+    from Properties import State,SatState
+    S=State('T',300,'P',1000,'R410A')
+    S.rho, S.cp, S.Pr
+    Sat=SatState('R410A',p=1000)
+    Sat.Tdew, Sat.L.mu, Sat.h_fg
+
+Saturation properties and humid air properties can also be obtained from
+precomputed tables rather than from CoolProp (see SaturationTable and
+Psychrometrics.PsychrometricTable)::
+
+    Properties.SetBackend('Tables')
+    Properties.SetBackend('CoolProp')   # the default
+'''
+from __future__ import division
+import os
+from timeit import default_timer
+from math import log,exp
+from collections import OrderedDict
+import numpy as np
+from CoolProp.CoolProp import Props as _Props
+from CoolProp.CoolProp import IsFluidType,Tcrit
+from CoolProp.CoolProp import cair_sat as _cair_sat
+from CoolProp.HumidAirProp import HAProps as _HAProps
+from Instrumentation import ActiveRecorders,RecordCall
+
+class LRUCache(object):
+    """
+    A simple bounded least-recently-used cache with hit and miss counters
+    """
+    def __init__(self,maxsize=20000):
+        self.maxsize=maxsize
+        self.data=OrderedDict()
+        self.hits=0
+        self.misses=0
+
+    def get(self,key):
+        """
+        Returns the cached value, or None if it is not in the cache
+        """
+        try:
+            value=self.data.pop(key)
+        except KeyError:
+            self.misses+=1
+            return None
+        #Re-insert to mark as most recently used
+        self.data[key]=value
+        self.hits+=1
+        return value
+
+    def set(self,key,value):
+        if key in self.data:
+            self.data.pop(key)
+        elif len(self.data)>=self.maxsize:
+            #Remove the least recently used entry
+            self.data.popitem(last=False)
+        self.data[key]=value
+
+    def clear(self):
+        self.data.clear()
+        self.hits=0
+        self.misses=0
+
+    def __len__(self):
+        return len(self.data)
+
+_cache=LRUCache()
+_CacheEnabled=True
+#Number of six-argument calls to Props, and how many of them were evaluated by
+#CoolProp (neither cached nor tabulated)
+_Counts={'Props':0,'CoolProp':0}
+
+def _round(value):
+    """
+    Round an input value to 12 significant figures for use in the cache key
+    """
+    return float('%.12g'%value)
+
+def Props(*args):
+    """
+    Drop-in replacement for CoolProp.CoolProp.Props
+
+    Only the six-argument form Props(Output,Input1,Value1,Input2,Value2,Fluid)
+    is cached; all the other forms (critical point, molar mass, etc.) are
+    passed straight through to CoolProp
+    """
+    if ActiveRecorders:
+        t1=default_timer()
+        try:
+            return _Props_(*args)
+        finally:
+            if len(args)==6:
+                key=args[5]+' '+args[1]+','+args[3]
+            else:
+                key=args[0]+' '+str(args[1])
+            RecordCall('Props',key,default_timer()-t1)
+    return _Props_(*args)
+
+def _Props_(*args):
+    if len(args)!=6:
+        return _Props(*args)
+    Output,Input1,Value1,Input2,Value2,Fluid=args
+    _Counts['Props']+=1
+    if _Backend=='Tables' and Input2=='Q' and Input1 in ('T','P'):
+        value=GetSaturationTable(Fluid).Props(Output,Input1,Value1,Value2)
+        if value is not None:
+            return value
+    if not _CacheEnabled:
+        _Counts['CoolProp']+=1
+        return _Props(*args)
+    key=(Output,Input1,_round(Value1),Input2,_round(Value2),Fluid)
+    value=_cache.get(key)
+    if value is None:
+        _Counts['CoolProp']+=1
+        value=_Props(*args)
+        _cache.set(key,value)
+    return value
+
+def HAProps(Output,Input1,Value1,Input2,Value2,Input3,Value3):
+    """
+    Drop-in replacement for CoolProp.HumidAirProp.HAProps
+
+    Calls are cached like those of Props, and with the 'Tables' backend the
+    properties are interpolated from a PsychrometricTable at the pressure
+    given as one of the inputs where possible
+    """
+    if ActiveRecorders:
+        t1=default_timer()
+        try:
+            return _HAProps_(Output,Input1,Value1,Input2,Value2,Input3,Value3)
+        finally:
+            RecordCall('HAProps',Output+' '+','.join([Input1,Input2,Input3]),default_timer()-t1)
+    return _HAProps_(Output,Input1,Value1,Input2,Value2,Input3,Value3)
+
+def _HAProps_(Output,Input1,Value1,Input2,Value2,Input3,Value3):
+    if _Backend=='Tables':
+        Inputs=[(Input1,Value1),(Input2,Value2),(Input3,Value3)]
+        p=[Value for Input,Value in Inputs if Input=='P']
+        if len(p)==1:
+            (I1,V1),(I2,V2)=[(Input,Value) for Input,Value in Inputs if Input!='P']
+            value=GetPsychrometricTable(p[0]).HAProps(Output,I1,V1,I2,V2)
+            if value is not None:
+                return value
+    if not _CacheEnabled:
+        return _HAProps(Output,Input1,Value1,Input2,Value2,Input3,Value3)
+    key=('HA',Output,Input1,_round(Value1),Input2,_round(Value2),Input3,_round(Value3))
+    value=_cache.get(key)
+    if value is None:
+        value=_HAProps(Output,Input1,Value1,Input2,Value2,Input3,Value3)
+        _cache.set(key,value)
+    return value
+
+def cair_sat(T):
+    """
+    Derivative of the saturated humid air enthalpy with respect to temperature
+    at atmospheric pressure [kJ/kg_da/K], see CoolProp.CoolProp.cair_sat
+    """
+    if ActiveRecorders:
+        t1=default_timer()
+        try:
+            return _cair_sat_(T)
+        finally:
+            RecordCall('HAProps','cair_sat',default_timer()-t1)
+    return _cair_sat_(T)
+
+def _cair_sat_(T):
+    if _Backend=='Tables':
+        value=GetPsychrometricTable(101.325).cair_sat(T)
+        if value is not None:
+            return value
+    if not _CacheEnabled:
+        return _cair_sat(T)
+    key=('cair_sat',_round(T))
+    value=_cache.get(key)
+    if value is None:
+        value=_cair_sat(T)
+        _cache.set(key,value)
+    return value
+
+def HAcp(T,p,W):
+    """
+    Specific heat of humid air at constant humidity ratio [kJ/kg_da/K] at dry
+    bulb temperature T [K], pressure p [kPa] and humidity ratio W [-]
+
+    With the 'Tables' backend it is obtained analytically from the
+    derivatives of the psychrometric table, otherwise by forward difference of
+    the enthalpy
+    """
+    if _Backend=='Tables':
+        Table=GetPsychrometricTable(p)
+        State=Table.State('T',T,'W',W)
+        if State is not None:
+            return Table.cp_da(*State)
+    dT=0.0001 #[K]
+    return (HAProps('H','T',T+dT,'P',p,'W',W)-HAProps('H','T',T,'P',p,'W',W))/dT
+
+def EnableCache(maxsize=None):
+    """
+    Turn on the property cache, optionally changing its maximum size
+    """
+    global _CacheEnabled
+    if maxsize is not None:
+        _cache.maxsize=maxsize
+    _CacheEnabled=True
+
+def DisableCache():
+    """
+    Turn off the property cache; all calls go directly to CoolProp
+    """
+    global _CacheEnabled
+    _CacheEnabled=False
+    _cache.clear()
+
+def ClearCache():
+    """
+    Empty the cache and reset the hit and miss counters
+    """
+    _cache.clear()
+
+def CacheInfo():
+    """
+    Returns a dictionary with the hits, misses, current and maximum size of the
+    property cache
+    """
+    return dict(hits=_cache.hits,
+                misses=_cache.misses,
+                size=len(_cache),
+                maxsize=_cache.maxsize,
+                enabled=_CacheEnabled)
+
+def CallCounts():
+    """
+    Returns a dictionary with the number of calls to Props ('Props') and the
+    number of those that had to be evaluated by CoolProp ('CoolProp') since the
+    last call to ResetCallCounts
+    """
+    return dict(_Counts)
+
+def ResetCallCounts():
+    for key in _Counts:
+        _Counts[key]=0
+
+def _StateProperty(Output,factor,doc):
+    def get(self):
+        return self.Props(Output)*factor
+    return property(get,doc=doc)
+
+class State(object):
+    """
+    A thermodynamic state of a fluid, fixed by two inputs in the same form as
+    Props, for instance State('T',T,'P',p,Ref) or State('P',p,'H',h,Ref) with
+    the inputs in the units of Props (K, kPa, kJ/kg, kJ/kg-K)
+
+    Each property is evaluated by Props the first time it is asked for and
+    kept by the state, so a correlation or component that needs several
+    properties at one state creates the State once and reads them from it
+    rather than calling Props again for each one.  The properties are in the
+    units used by the components:
+
+    ======  ==========================================
+    T       Temperature [K]
+    p       Pressure [kPa]
+    h       Enthalpy [J/kg]
+    s       Entropy [J/kg-K]
+    rho     Density [kg/m^3]
+    v       Specific volume [m^3/kg]
+    cp      Specific heat [J/kg-K]
+    mu      Viscosity [Pa-s]
+    k       Thermal conductivity [W/m-K]
+    Pr      Prandtl number [-]
+    ======  ==========================================
+
+    Any other output of Props is available (in the units of Props) from the
+    Props method.
+    """
+    def __init__(self,Input1,Value1,Input2,Value2,Ref):
+        self.Ref=Ref
+        self.Input1=Input1
+        self.Value1=Value1
+        self.Input2=Input2
+        self.Value2=Value2
+        #The inputs are known without calling Props
+        self._values={Input1:Value1,Input2:Value2}
+
+    def Props(self,Output):
+        """
+        The output of Props at this state, in the units of Props
+        """
+        try:
+            return self._values[Output]
+        except KeyError:
+            value=Props(Output,self.Input1,self.Value1,self.Input2,self.Value2,self.Ref)
+            self._values[Output]=value
+            return value
+
+    T=_StateProperty('T',1,'Temperature [K]')
+    p=_StateProperty('P',1,'Pressure [kPa]')
+    h=_StateProperty('H',1000.,'Enthalpy [J/kg]')
+    s=_StateProperty('S',1000.,'Entropy [J/kg-K]')
+    rho=_StateProperty('D',1,'Density [kg/m^3]')
+    cp=_StateProperty('C',1000.,'Specific heat [J/kg-K]')
+    mu=_StateProperty('V',1,'Viscosity [Pa-s]')
+    k=_StateProperty('L',1000.,'Thermal conductivity [W/m-K]')
+
+    @property
+    def v(self):
+        """Specific volume [m^3/kg]"""
+        return 1/self.rho
+
+    @property
+    def Pr(self):
+        """Prandtl number [-]"""
+        return self.cp*self.mu/self.k
+
+class SatState(object):
+    """
+    The saturated liquid and vapor states of a fluid, either at the pressure
+    p [kPa], or at the bubble and dew temperatures Tbubble and Tdew [K] (Tdew
+    defaults to Tbubble for a pure fluid)
+
+    ``L`` is the State at (Tbubble,Q=0) and ``V`` the State at (Tdew,Q=1), so
+    SatState(Ref,p=p).L.h is the same as
+    Props('H','T',Props('T','P',p,'Q',0,Ref),'Q',0,Ref)*1000, the form used
+    throughout the components.
+    """
+    def __init__(self,Ref,p=None,Tbubble=None,Tdew=None):
+        self.Ref=Ref
+        if p is not None:
+            Tbubble=Props('T','P',p,'Q',0.0,Ref)
+            Tdew=Props('T','P',p,'Q',1.0,Ref)
+        elif Tbubble is None:
+            raise ValueError('Either p or Tbubble must be given')
+        elif Tdew is None:
+            Tdew=Tbubble
+        self.Tbubble=Tbubble
+        self.Tdew=Tdew
+        self.L=State('T',Tbubble,'Q',0.0,Ref)
+        self.V=State('T',Tdew,'Q',1.0,Ref)
+
+    @property
+    def h_fg(self):
+        """Latent heat, difference of the dew and bubble enthalpies [J/kg]"""
+        return (self.V.Props('H')-self.L.Props('H'))*1000.
+
+class SaturationTable(object):
+    """
+    Cubic-spline interpolation of the saturated liquid (Q=0) and saturated
+    vapor (Q=1) properties of one fluid
+
+    The properties are tabulated against the bubble temperature (Q=0) or the
+    dew temperature (Q=1), so zeotropic blends with glide are handled.
+    Pressure is tabulated as log(p), and the saturation temperature for a
+    given pressure is obtained from a second spline of T against log(p).
+
+    The table covers [Tmin, Tcrit-DTcrit] where the properties are smooth;
+    anything outside this range (or any output that is not tabulated) returns
+    None and the caller falls back to CoolProp.
+
+    Accuracy: when the table is built, every output is compared with CoolProp
+    at the midpoints between the nodes, which is where the spline error is
+    largest, and the saturation temperature from the inverse spline is
+    compared with CoolProp at the midpoints in log(p).  The maximum relative
+    error found is stored in ``MaxError`` (keyed by (Output,Q), with ('T',Q)
+    for the inverse spline).  With the default 200 nodes this is of the order of
+    1e-6 for the thermodynamic properties and 1e-5 for the transport
+    properties, far below the uncertainty of the correlations using them.
+    """
+    Outputs=['P','D','H','S','C','V','L']
+
+    def __init__(self,Ref,N=200,Tmin=None,DTcrit=2.0,path=None):
+        self.Ref=Ref
+        self.N=N
+        self.DTcrit=DTcrit
+        if Tmin is None:
+            try:
+                Tmin=_Props(Ref,'Ttriple')+1.0
+            except:
+                Tmin=200.0
+        self.Tmin=max(Tmin,200.0)
+        self.Tmax=Tcrit(Ref)-DTcrit
+        self.MaxError={}
+        if path is not None and os.path.exists(path):
+            self.Load(path)
+        else:
+            self.Build()
+            if path is not None:
+                self.Save(path)
+
+    def _Evaluate(self,T):
+        """
+        Returns a dictionary of arrays of the tabulated properties at the
+        temperatures T for both Q=0 and Q=1; outputs that CoolProp cannot
+        provide for this fluid are left out
+        """
+        data={}
+        for Q in (0,1):
+            for Output in self.Outputs:
+                try:
+                    vals=np.array([_Props(Output,'T',T_,'Q',Q,self.Ref) for T_ in T])
+                except:
+                    continue
+                if not np.all(np.isfinite(vals)):
+                    continue
+                if Output=='P':
+                    vals=np.log(vals)
+                data['%s%d'%(Output,Q)]=vals
+        return data
+
+    def Build(self):
+        self.T=np.linspace(self.Tmin,self.Tmax,self.N)
+        self.data=self._Evaluate(self.T)
+        self._MakeSplines()
+        #Check the accuracy at the midpoints between the nodes
+        Tmid=(self.T[0:-1]+self.T[1::])/2.0
+        check=self._Evaluate(Tmid)
+        for key in check:
+            if key not in self.splines:
+                continue
+            exact=check[key]
+            interp=self._splev(Tmid,self.splines[key])
+            if key.startswith('P'):
+                exact=np.exp(exact)
+                interp=np.exp(interp)
+            self.MaxError[(key[0:-1],int(key[-1]))]=float(np.max(np.abs(interp/exact-1)))
+        #Check the inverse splines of T against log(p)
+        for Q in self.Tsplines:
+            logp=self.data['P%d'%Q]
+            logpmid=(logp[0:-1]+logp[1::])/2.0
+            try:
+                exact=np.array([_Props('T','P',exp(logp_),'Q',Q,self.Ref) for logp_ in logpmid])
+            except:
+                continue
+            interp=self._splev(logpmid,self.Tsplines[Q])
+            self.MaxError[('T',Q)]=float(np.max(np.abs(interp/exact-1)))
+
+    def _MakeSplines(self):
+        #scipy.interpolate is only imported once a table is used
+        from scipy.interpolate import splrep,splev
+        self._splev=splev
+        self.splines={}
+        for key in self.data:
+            self.splines[key]=splrep(self.T,self.data[key])
+        #Inverse spline of T against log(p) for each of bubble and dew curve
+        self.Tsplines={}
+        self.logpmin={}
+        self.logpmax={}
+        for Q in (0,1):
+            key='P%d'%Q
+            if key in self.data:
+                self.Tsplines[Q]=splrep(self.data[key],self.T)
+                self.logpmin[Q]=self.data[key][0]
+                self.logpmax[Q]=self.data[key][-1]
+
+    def Save(self,path):
+        """
+        Save the node values (and error bounds) to a numpy .npz file
+        """
+        keys=['%s%d'%k for k in self.MaxError]
+        errors=[self.MaxError[k] for k in self.MaxError]
+        np.savez(path,T=self.T,errorkeys=np.array(keys),errors=np.array(errors),**self.data)
+
+    def Load(self,path):
+        f=np.load(path)
+        self.T=f['T']
+        self.Tmin=self.T[0]
+        self.Tmax=self.T[-1]
+        self.N=len(self.T)
+        self.data=dict((key,f[key]) for key in f.files if key not in ('T','errorkeys','errors'))
+        self.MaxError=dict(((str(k)[0:-1],int(str(k)[-1])),float(e)) for k,e in zip(f['errorkeys'],f['errors']))
+        self._MakeSplines()
+
+    def Tsat(self,p,Q):
+        """
+        Bubble (Q=0) or dew (Q=1) temperature at pressure p [kPa], None if out
+        of range
+        """
+        if Q not in self.Tsplines:
+            return None
+        logp=log(p)
+        if logp<self.logpmin[Q] or logp>self.logpmax[Q]:
+            return None
+        return float(self._splev(logp,self.Tsplines[Q]))
+
+    def Props(self,Output,Input1,Value1,Q):
+        """
+        Saturation property Output at given T or P and Q=0 or Q=1, None if
+        the table cannot provide it
+        """
+        if Q!=0 and Q!=1:
+            return None
+        Q=int(Q)
+        if Input1=='P':
+            T=self.Tsat(Value1,Q)
+            if T is None or Output=='T':
+                return T
+        else:
+            T=Value1
+            if T<self.Tmin or T>self.Tmax:
+                return None
+            if Output=='T':
+                return T
+        key='%s%d'%(Output,Q)
+        if key not in self.splines:
+            return None
+        value=float(self._splev(T,self.splines[key]))
+        if Output=='P':
+            if Input1=='P':
+                return Value1
+            return exp(value)
+        return value
+
+_Backend='CoolProp'
+_Tables={}
+_PsychTables={}
+#If not None, saturation tables are saved to and loaded from this folder
+TableDirectory=None
+
+def GetSaturationTable(Ref):
+    """
+    Returns the saturation table for the fluid Ref, building it (or loading
+    it from TableDirectory) the first time it is needed
+    """
+    if Ref not in _Tables:
+        if TableDirectory is not None:
+            path=os.path.join(TableDirectory,'SatTable_'+Ref.replace('%','pct')+'.npz')
+        else:
+            path=None
+        _Tables[Ref]=SaturationTable(Ref,path=path)
+    return _Tables[Ref]
+
+def GetPsychrometricTable(p):
+    """
+    Returns the psychrometric table for the pressure p [kPa], building it (or
+    loading it from TableDirectory) the first time it is needed
+    """
+    key='%.6g'%p
+    if key not in _PsychTables:
+        if TableDirectory is not None:
+            path=os.path.join(TableDirectory,'PsychTable_'+key+'kPa.npz')
+        else:
+            path=None
+        #Imported here since the tables need scipy.interpolate
+        from Psychrometrics import PsychrometricTable
+        _PsychTables[key]=PsychrometricTable(p,path=path)
+    return _PsychTables[key]
+
+def SetBackend(Backend):
+    """
+    Select where saturation and humid air properties come from, either
+    'CoolProp' (direct calls, default) or 'Tables' (interpolated from
+    SaturationTable and PsychrometricTable)
+    """
+    global _Backend
+    if Backend not in ('CoolProp','Tables'):
+        raise ValueError('Backend must be one of "CoolProp" or "Tables"')
+    _Backend=Backend
@@ -0,0 +1,247 @@
+'''
+Tabulated humid air properties
+
+HAProps iterates internally for almost every input combination, and the fin
+correlations, the dry-wet segment and the preconditioners call it many times
+per heat exchanger evaluation.  A PsychrometricTable holds bicubic splines of
+the humid air properties against dry bulb temperature and relative humidity at
+one pressure, from which all the input combinations used in PyACHP can be
+evaluated without calling HAProps.
+
+The tables are used through Properties.HAProps when the 'Tables' backend is
+selected (see Properties.SetBackend), and are built lazily the first time a
+pressure is needed (see Properties.GetPsychrometricTable).
+'''
+from __future__ import division
+import os
+import numpy as np
+from scipy.interpolate import RectBivariateSpline
+from CoolProp.HumidAirProp import HAProps as _HAProps
+
+#Saturation is over ice below the triple point, and over water above, so the
+#derivatives of the saturation properties jump there; the table is split into
+#two sets of splines at this temperature
+T_TRIPLE=273.16
+
+class PsychrometricTable(object):
+    """
+    Bicubic splines of the humid air properties W, H, V, M, K and D (dewpoint)
+    against the dry bulb temperature T [K] and relative humidity R [-] at the
+    pressure p [kPa]
+
+    The inputs (T,R) are evaluated directly, and (T,W), (T,H) and (H,R) by
+    Newton iteration on the splines (all of them are monotonic in the
+    unknown).  The specific heat at constant humidity ratio is obtained by
+    differentiating the splines, rather than by finite difference.
+
+    The table covers [Tmin,Tmax] x [Rmin,1]; anything outside this range, or
+    any other input combination, returns None and the caller falls back to
+    HAProps.
+
+    The relative humidity nodes are spaced logarithmically, since the
+    dewpoint varies like log(R) at low humidity.
+
+    Accuracy: when the table is built, every output is compared with HAProps
+    at the centres of the cells of the grid.  The maximum error relative to
+    the largest value of the output (the enthalpy goes through zero) is
+    stored in ``MaxError`` (keyed by output).  With the default grid it is of
+    the order of 1e-4 for the dewpoint and 1e-5 or better for the others.
+    """
+    Outputs=['W','H','V','M','K','D']
+
+    def __init__(self,p,Tmin=233.15,Tmax=333.15,dT=1.0,Rmin=0.01,NR=40,path=None):
+        self.p=p
+        self.Tmin=Tmin
+        self.Tmax=Tmax
+        self.dT=dT
+        self.Rmin=Rmin
+        self.NR=NR
+        self.MaxError={}
+        if path is not None and os.path.exists(path):
+            self.Load(path)
+        else:
+            self.Build()
+            if path is not None:
+                self.Save(path)
+
+    def _Evaluate(self,T,R):
+        """
+        Returns a dictionary of 2-D arrays of the outputs at all the
+        combinations of the temperatures T and relative humidities R
+        """
+        data={}
+        for Output in self.Outputs:
+            data[Output]=np.array([[_HAProps(Output,'T',T_,'P',self.p,'R',R_) for R_ in R] for T_ in T])
+        return data
+
+    def _Segments(self):
+        """
+        Temperature nodes of the splines below and above the triple point
+        """
+        Segments=[]
+        for T1,T2 in [(self.Tmin,min(T_TRIPLE,self.Tmax)),(max(T_TRIPLE,self.Tmin),self.Tmax)]:
+            if T2-T1>=4*self.dT:
+                Segments.append(np.linspace(T1,T2,int(round((T2-T1)/self.dT))+1))
+        return Segments
+
+    def Build(self):
+        self.R=np.exp(np.linspace(np.log(self.Rmin),0.0,self.NR))
+        self.T=self._Segments()
+        self.data=[self._Evaluate(T,self.R) for T in self.T]
+        self._MakeSplines()
+        #Check the accuracy at the centres of the cells
+        Rmid=(self.R[0:-1]+self.R[1::])/2.0
+        for T in self.T:
+            Tmid=(T[0:-1]+T[1::])/2.0
+            check=self._Evaluate(Tmid,Rmid)
+            for Output in self.Outputs:
+                exact=check[Output]
+                interp=self._Spline(Tmid[0],Output)(Tmid,Rmid)
+                error=float(np.max(np.abs(interp-exact))/np.max(np.abs(exact)))
+                self.MaxError[Output]=max(error,self.MaxError.get(Output,0.0))
+
+    def _MakeSplines(self):
+        self.splines=[]
+        for T,data in zip(self.T,self.data):
+            self.splines.append(dict((Output,RectBivariateSpline(T,self.R,data[Output])) for Output in data))
+        self.Tmin=self.T[0][0]
+        self.Tmax=self.T[-1][-1]
+
+    def Save(self,path):
+        """
+        Save the node values (and error bounds) to a numpy .npz file
+        """
+        arrays={'p':self.p,'R':self.R,'NSegments':len(self.T),
+                'errorkeys':np.array(list(self.MaxError.keys())),
+                'errors':np.array(list(self.MaxError.values()))}
+        for i,(T,data) in enumerate(zip(self.T,self.data)):
+            arrays['T%d'%i]=T
+            for Output in data:
+                arrays['%s%d'%(Output,i)]=data[Output]
+        np.savez(path,**arrays)
+
+    def Load(self,path):
+        f=np.load(path)
+        self.p=float(f['p'])
+        self.R=f['R']
+        self.Rmin=self.R[0]
+        N=int(f['NSegments'])
+        self.T=[f['T%d'%i] for i in range(N)]
+        self.data=[dict((Output,f['%s%d'%(Output,i)]) for Output in self.Outputs) for i in range(N)]
+        self.MaxError=dict((str(k),float(e)) for k,e in zip(f['errorkeys'],f['errors']))
+        self._MakeSplines()
+
+    def _Spline(self,T,Output):
+        """
+        The spline of Output for the segment containing temperature T
+        """
+        if len(self.splines)>1 and T>=self.T[1][0]:
+            return self.splines[1][Output]
+        return self.splines[0][Output]
+
+    def _InRange(self,T,R):
+        return self.Tmin<=T<=self.Tmax and self.Rmin<=R<=1.0
+
+    def _Value(self,Output,T,R,dx=0,dy=0):
+        return float(self._Spline(T,Output).ev(T,R,dx=dx,dy=dy))
+
+    def _SolveR(self,Output,T,value):
+        """
+        Relative humidity at which Output(T,R) equals value, None if out of
+        range
+        """
+        lo=self._Value(Output,T,self.Rmin)
+        hi=self._Value(Output,T,1.0)
+        if not lo<=value<=hi:
+            return None
+        R=self.Rmin+(1.0-self.Rmin)*(value-lo)/(hi-lo)
+        for i in range(20):
+            delta=(self._Value(Output,T,R)-value)/self._Value(Output,T,R,dy=1)
+            R=min(max(R-delta,self.Rmin),1.0)
+            if abs(delta)<1e-13:
+                break
+        return R
+
+    def _SolveT(self,Output,R,value):
+        """
+        Dry bulb temperature at which Output(T,R) equals value, None if out of
+        range
+        """
+        T=np.concatenate(self.T)
+        values=np.concatenate([S[Output].ev(T_,R*np.ones_like(T_)) for S,T_ in zip(self.splines,self.T)])
+        if not values[0]<=value<=values[-1]:
+            return None
+        T=float(np.interp(value,values,T))
+        for i in range(20):
+            delta=(self._Value(Output,T,R)-value)/self._Value(Output,T,R,dx=1)
+            T=min(max(T-delta,self.Tmin),self.Tmax)
+            if abs(delta)<1e-10:
+                break
+        return T
+
+    def State(self,Input1,Value1,Input2,Value2):
+        """
+        Dry bulb temperature and relative humidity from one of the input
+        pairs (T,R), (T,W), (T,H) or (H,R) in either order; None if the
+        inputs are not supported or out of range
+        """
+        Inputs={Input1:Value1,Input2:Value2}
+        if 'T' in Inputs:
+            T=Inputs['T']
+            if not self.Tmin<=T<=self.Tmax:
+                return None
+            if 'R' in Inputs:
+                R=Inputs['R']
+            elif 'W' in Inputs:
+                R=self._SolveR('W',T,Inputs['W'])
+            elif 'H' in Inputs:
+                R=self._SolveR('H',T,Inputs['H'])
+            else:
+                return None
+        elif 'H' in Inputs and 'R' in Inputs:
+            R=Inputs['R']
+            if not self.Rmin<=R<=1.0:
+                return None
+            T=self._SolveT('H',R,Inputs['H'])
+        else:
+            return None
+        if T is None or R is None or not self._InRange(T,R):
+            return None
+        return T,R
+
+    def HAProps(self,Output,Input1,Value1,Input2,Value2):
+        """
+        Humid air property Output at this pressure from two inputs, None if
+        the table cannot provide it
+        """
+        if Output not in self.Outputs and Output not in ('T','R','C'):
+            return None
+        State=self.State(Input1,Value1,Input2,Value2)
+        if State is None:
+            return None
+        T,R=State
+        if Output=='T':
+            return T
+        elif Output=='R':
+            return R
+        elif Output=='C':
+            return self.cp_da(T,R)
+        return self._Value(Output,T,R)
+
+    def cp_da(self,T,R):
+        """
+        Specific heat at constant humidity ratio [kJ/kg_da/K] from the
+        derivatives of the splines: dh/dT at constant W is
+        dh/dT + dh/dR*dR/dT where dR/dT = -(dW/dT)/(dW/dR)
+        """
+        dRdT=-self._Value('W',T,R,dx=1)/self._Value('W',T,R,dy=1)
+        return self._Value('H',T,R,dx=1)+self._Value('H',T,R,dy=1)*dRdT
+
+    def cair_sat(self,T):
+        """
+        Derivative of the saturated air enthalpy with respect to temperature
+        [kJ/kg_da/K], None if out of range
+        """
+        if not self.Tmin<=T<=self.Tmax:
+            return None
+        return self._Value('H',T,1.0,dx=1)
@@ -1,5 +1,5 @@
 from __future__ import division
-from CoolProp.CoolProp import Props
+from Properties import Props
 
 class PumpClass():
     def __init__(self,**kwargs):
@@ -0,0 +1,265 @@
+'''
+Seasonal ratings (SEER and HSPF) of DX cycles by the bin method
+
+The cycle is solved at the AHRI 210/240 test conditions and at the outdoor
+temperature of each bin of the cooling season (AC mode) or of the heating
+season of climate region IV (HP mode).  The points are split between worker
+processes in ranges of neighbouring outdoor temperatures, and each point is
+warm-started from the solution at the previous temperatures (see
+Parametric.RunParametric).  The capacity and power at each bin are then
+combined with the building load line and the cyclic degradation of a single
+speed unit into the seasonal ratings.
+
+In AC mode, the outdoor coil is the Condenser of the cycle and the indoor coil
+the Evaporator; in HP mode it is the other way round.  The fans run with the
+compressor, and frosting of the outdoor coil and defrost cycles are not
+modelled, so the heating capacity between 17F and 45F is that of a dry coil.
+
+From python::
+
+    from Rating import RateCycle
+    Rating=RateCycle('SampleCycles:SampleDXACSystem',FactoryKwargs={'Calculate':False})
+    print Rating['SEER']
+
+From the command line::
+
+    python Rating.py --factory SampleCycles:SampleDXHPSystem --factory-kwarg Calculate=False
+'''
+from __future__ import division
+import numpy as np
+from Cycle import F2K
+from Properties import HAProps
+from Parametric import RunParametric,LoadFactory,ParseKwarg
+from multiprocessing import cpu_count
+
+#Cooling season bins: outdoor temperature [F] and fraction of the hours
+CoolingBins=[(67,0.214),(72,0.231),(77,0.216),(82,0.161),(87,0.104),(92,0.052),(97,0.018),(102,0.004)]
+
+#Heating season bins of region IV: outdoor temperature [F] and fraction of the hours
+HeatingBins=[(62,0.132),(57,0.111),(52,0.103),(47,0.093),(42,0.100),(37,0.109),(32,0.126),(27,0.087),
+             (22,0.055),(17,0.036),(12,0.026),(7,0.013),(2,0.006),(-3,0.002),(-8,0.001)]
+
+#Indoor dry and wet bulb temperatures [F] of the tests
+CoolingIndoor=(80.0,67.0)
+HeatingIndoor=(70.0,60.0)
+
+#Outdoor dry and wet bulb temperatures [F] of the tests
+CoolingTests={'A':(95.0,75.0),'B':(82.0,65.0)}
+HeatingTests={'H1':(47.0,43.0),'H3':(17.0,15.0)}
+
+#Outdoor design temperature [F] and adjustment factor of the heating load of
+#region IV
+TOD=5.0
+C_heating=0.77
+
+#Ratio of the cooling capacity at 95F to the building load at 95F
+SizingFactor=1.1
+
+#Conversion from W/W to Btu/Wh
+W2Btuh=3.412
+
+def RH_wb(Tdb_F,Twb_F):
+    """
+    Relative humidity [-] of air at 101.325 kPa from the dry and wet bulb
+    temperatures [F]
+    """
+    return HAProps('R','T',F2K(Tdb_F),'P',101.325,'B',F2K(Twb_F))
+
+def RatingPoints(Mode):
+    """
+    Points to solve for a rating in Mode 'AC' or 'HP', as a list of (label,
+    outdoor dry bulb [F], outdoor wet bulb [F]) in decreasing outdoor
+    temperature.  The tests are labelled as in AHRI 210/240 and the bins
+    'bin 82' and so on.  Bins at the temperature of a test are not repeated.
+    Outdoor wet bulb temperatures of the bins are those of the closest test
+    """
+    if Mode=='AC':
+        Tests,Bins=CoolingTests,CoolingBins
+    elif Mode=='HP':
+        Tests,Bins=HeatingTests,HeatingBins
+    else:
+        raise ValueError('Mode must be AC or HP')
+    Points=[(label,Tdb,Twb) for label,(Tdb,Twb) in Tests.items()]
+    for Tj,fraction in Bins:
+        if Tj in [Tdb for label,Tdb,Twb in Points]:
+            continue
+        #Same wet bulb depression as the closest test
+        label,Tdb,Twb=min(Points[0:len(Tests)],key=lambda point: abs(point[1]-Tj))
+        Points.append(('bin %g'%Tj,Tj,Tj-(Tdb-Twb)))
+    Points.sort(key=lambda point: -point[1])
+    return Points
+
+def _CycleVariables(Mode):
+    if Mode=='AC':
+        Outdoor,Indoor='Condenser','Evaporator'
+    else:
+        Outdoor,Indoor='Evaporator','Condenser'
+    return ['Cycle.%s.Fins.Air.Tdb'%Outdoor,'Cycle.%s.Fins.Air.RH'%Outdoor,
+            'Cycle.%s.Fins.Air.Tdb'%Indoor,'Cycle.%s.Fins.Air.RH'%Indoor]
+
+def SEER(Tj,fractions,Q,P,Q95,Cd=0.25):
+    """
+    Seasonal energy efficiency ratio [Btu/Wh] of a single speed unit from the
+    capacity Q [W] and power P [W] at the bin temperatures Tj [F], and the
+    capacity at 95F Q95 [W]
+
+    Returns (SEER, table of the bins) where the table is a list of
+    dictionaries with the keys Tj, BL, Q, P, X, PLF, q, e (q and e per unit
+    of fraction of the hours)
+    """
+    Table=[]
+    for T,fraction,Qj,Pj in zip(Tj,fractions,Q,P):
+        BL=(T-65)/(95-65)*Q95/SizingFactor
+        X=min(BL/Qj,1.0)
+        PLF=1-Cd*(1-X)
+        Table.append({'Tj':T,'BL':BL,'Q':Qj,'P':Pj,'X':X,'PLF':PLF,
+                      'q':X*Qj*fraction,'e':X*Pj/PLF*fraction})
+    return sum(row['q'] for row in Table)/sum(row['e'] for row in Table)*W2Btuh,Table
+
+def HSPF(Tj,fractions,Q,P,Q47,Cd=0.25):
+    """
+    Heating seasonal performance factor [Btu/Wh] of a single speed heat pump
+    in region IV from the heating capacity Q [W] and power P [W] at the bin
+    temperatures Tj [F], and the heating capacity at 47F Q47 [W].  The load
+    that the heat pump cannot meet is met by resistance heat, and the design
+    heating requirement is the smallest one, Q47*(65-TOD)/60
+
+    Returns (HSPF, table of the bins) where the table is a list of
+    dictionaries with the keys Tj, BL, Q, P, X, PLF, q, e, RH (q, e and RH
+    per unit of fraction of the hours)
+    """
+    DHR=Q47*(65-TOD)/60
+    Table=[]
+    for T,fraction,Qj,Pj in zip(Tj,fractions,Q,P):
+        BL=(65-T)/(65-TOD)*C_heating*DHR
+        X=min(BL/Qj,1.0)
+        PLF=1-Cd*(1-X)
+        Table.append({'Tj':T,'BL':BL,'Q':Qj,'P':Pj,'X':X,'PLF':PLF,
+                      'q':BL*fraction,'e':X*Pj/PLF*fraction,'RH':(BL-X*Qj)*fraction})
+    return sum(row['q'] for row in Table)/sum(row['e']+row['RH'] for row in Table)*W2Btuh,Table
+
+def RateCycle(Factory,FactoryKwargs=None,Mode=None,Cd=0.25,path='Rating.csv',processes=None,
+              CachePath=None,Verbosity=1):
+    """
+    Seasonal rating of a single speed DX cycle
+
+    =============   ===========================================================
+    Variable        Description
+    =============   ===========================================================
+    Factory         callable or 'module:function' string that returns a
+                    configured but unsolved DXCycleClass
+    FactoryKwargs   dict of keyword arguments passed to the factory
+    Mode            'AC' for the SEER or 'HP' for the HSPF; must be the Mode
+                    of the cycles made by the factory.  If None, the Mode 
+                    attribute of the factory function is used
+    Cd              cyclic degradation coefficient
+    path            CSV file of the outputs of the cycle at each point
+    processes       number of worker processes (default: number of cores)
+    CachePath       optional directory of a cache of solved cycles (see
+                    SolveCache)
+    Verbosity       0 for no output, 1 for the table of the bins
+    =============   ===========================================================
+
+    Returns a dictionary with
+
+    * 'Mode'
+    * 'SEER' and 'EER_A', 'EER_B' (AC) or 'HSPF' and 'COP_H1', 'COP_H3' (HP)
+    * 'Points', a list of (label, outdoor Tdb [F], capacity [W], power [W])
+    * 'Bins', the table of the bins (see SEER and HSPF)
+    * 'Failures', the labels of the points that could not be solved; the
+      capacity and power of a bin that failed are interpolated linearly from
+      the neighbouring points
+    
+    ValueError is raised if a test point, or a bin at the hottest or coldest
+    temperature (which could only be extrapolated), could not be solved
+    """
+    if FactoryKwargs is None:
+        FactoryKwargs={}
+    if processes is None:
+        processes=cpu_count()
+    if Mode is None:
+        Mode=getattr(LoadFactory(Factory),'Mode',None)
+    if Mode is None:
+        raise ValueError('Mode must be given, or be an attribute of the factory')
+    Points=RatingPoints(Mode)
+    Tdb_in,Twb_in=CoolingIndoor if Mode=='AC' else HeatingIndoor
+    RH_in=RH_wb(Tdb_in,Twb_in)
+    Samples=[(F2K(Tdb),RH_wb(Tdb,Twb),F2K(Tdb_in),RH_in) for label,Tdb,Twb in Points]
+    Columns=RunParametric(Factory,[(Variable,None) for Variable in _CycleVariables(Mode)],
+                          path=path,FactoryKwargs=FactoryKwargs,processes=processes,
+                          #One range of neighbouring temperatures per worker
+                          chunksize=-(-len(Points)//processes),
+                          CachePath=CachePath,Samples=Samples,Verbosity=Verbosity-1)
+    T=np.array([Tdb for label,Tdb,Twb in Points])
+    if 'Index' in Columns:
+        Q=Columns['Cycle:Net Capacity']
+        P=Columns['Cycle:Net Power']
+    else:
+        Q=P=np.nan*np.ones(len(Points))
+    Solved=np.isfinite(Q)&np.isfinite(P)
+    Failures=[label for (label,Tdb,Twb),good in zip(Points,Solved) if not good]
+    Tests=CoolingTests if Mode=='AC' else HeatingTests
+    for label in Failures:
+        if label in Tests:
+            raise ValueError('The %s test point (%g F) could not be solved'%(label,Tests[label][0]))
+    if not (Solved[0] and Solved[-1]):
+        raise ValueError('The bins at the ends of the temperature range (%s) must be solved'%', '.join([label for (label,Tdb,Twb),good in zip(Points,Solved) if not good and Tdb in (T[0],T[-1])]))
+    #np.interp needs increasing temperatures
+    Q=np.interp(T,T[Solved][::-1],Q[Solved][::-1])
+    P=np.interp(T,T[Solved][::-1],P[Solved][::-1])
+    def AtT(Tdb):
+        return Q[list(T).index(Tdb)],P[list(T).index(Tdb)]
+    Bins=CoolingBins if Mode=='AC' else HeatingBins
+    Tj=[T for T,fraction in Bins]
+    fractions=[fraction for T,fraction in Bins]
+    Qj=[AtT(T)[0] for T in Tj]
+    Pj=[AtT(T)[1] for T in Tj]
+    Rating={'Mode':Mode,
+            'Points':[(label,Tdb,Qi,Pi) for (label,Tdb,Twb),Qi,Pi in zip(Points,Q,P)],
+            'Failures':Failures}
+    if Mode=='AC':
+        QA,PA=AtT(CoolingTests['A'][0])
+        QB,PB=AtT(CoolingTests['B'][0])
+        Rating['EER_A']=QA/PA*W2Btuh
+        Rating['EER_B']=QB/PB*W2Btuh
+        Rating['SEER'],Rating['Bins']=SEER(Tj,fractions,Qj,Pj,QA,Cd)
+    else:
+        QH1,PH1=AtT(HeatingTests['H1'][0])
+        QH3,PH3=AtT(HeatingTests['H3'][0])
+        Rating['COP_H1']=QH1/PH1
+        Rating['COP_H3']=QH3/PH3
+        Rating['HSPF'],Rating['Bins']=HSPF(Tj,fractions,Qj,Pj,QH1,Cd)
+    if Verbosity>0:
+        PrintRating(Rating)
+    return Rating
+
+def PrintRating(Rating):
+    """
+    Print the points, the bins and the ratings returned by RateCycle
+    """
+    print '%-8s %8s %12s %12s'%('Point','Tdb [F]','Capacity [W]','Power [W]')
+    for label,Tdb,Q,P in Rating['Points']:
+        print '%-8s %8g %12.1f %12.1f%s'%(label,Tdb,Q,P,' (interpolated)' if label in Rating['Failures'] else '')
+    print '%8s %12s %8s %8s'%('Tj [F]','BL [W]','X','PLF')
+    for row in Rating['Bins']:
+        print '%8g %12.1f %8.4f %8.4f'%(row['Tj'],row['BL'],row['X'],row['PLF'])
+    if Rating['Mode']=='AC':
+        print 'EER A %0.3f, EER B %0.3f, SEER %0.3f Btu/Wh'%(Rating['EER_A'],Rating['EER_B'],Rating['SEER'])
+    else:
+        print 'COP H1 %0.3f, COP H3 %0.3f, HSPF %0.3f Btu/Wh'%(Rating['COP_H1'],Rating['COP_H3'],Rating['HSPF'])
+
+if __name__=='__main__':
+    from optparse import OptionParser
+    parser=OptionParser(usage='python Rating.py --factory module:function [options]')
+    parser.add_option('--factory',dest='factory',help='module:function that returns the unsolved DX cycle')
+    parser.add_option('--factory-kwarg',dest='factorykwargs',action='append',default=[],help='key=value passed to the factory, can be repeated')
+    parser.add_option('--mode',dest='mode',default=None,help='AC for the SEER or HP for the HSPF (default: Mode attribute of the factory)')
+    parser.add_option('--Cd',dest='Cd',type='float',default=0.25,help='cyclic degradation coefficient')
+    parser.add_option('--out',dest='out',default='Rating.csv',help='CSV file of the outputs of the cycle at each point')
+    parser.add_option('-j','--processes',dest='processes',type='int',default=None,help='number of worker processes')
+    parser.add_option('--cache',dest='cache',default=None,help='directory of the cache of solved cycles')
+    (options,args)=parser.parse_args()
+    if options.factory is None:
+        parser.error('--factory is required')
+    RateCycle(options.factory,FactoryKwargs=dict(ParseKwarg(kwarg) for kwarg in options.factorykwargs),
+              Mode=options.mode,Cd=options.Cd,path=options.out,processes=options.processes,CachePath=options.cache)
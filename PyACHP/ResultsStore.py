@@ -0,0 +1,336 @@
+'''
+Columnar store for the outputs of cycles and components
+
+The columns (component, description and units of each output) are worked out
+once, from the first row, and the rows are then buffered in typed numpy
+arrays: one float array for the numeric outputs and one array of strings for
+the others (refrigerant names and so on).  The buffer is written out in bulk
+either to a CSV file, with the same component/description/units header rows
+as ACHPTools.Write2CSV, or to a numpy .npz file with one 2-D array of all the
+numeric outputs.
+
+From python::
+
+    from ResultsStore import ResultsWriter,LoadResults
+    Writer=ResultsWriter('Sweep.npz')
+    for Tdb in Temperatures:
+        Cycle.Condenser.Fins.Air.Tdb=Tdb
+        Cycle.PreconditionedSolve()
+        Writer.AppendOutputs(Cycle)
+    Writer.Close()
+
+    Results=LoadResults('Sweep.npz')
+    COP=Results['values'][:,Results['index']['Cycle','COP']]
+
+An .npz file written with Compress=False can be memory-mapped by passing
+mmap_mode='r' to LoadResults, in which case only the rows that are used are
+read from disk.
+'''
+from __future__ import division
+import os
+import csv
+import struct
+import zipfile
+import operator
+import numpy as np
+
+def OutputComponents(Class):
+    """
+    Names of the attributes of a cycle that have an OutputList (its
+    components), in the order used by ACHPTools.Write2CSV
+    """
+    return [item for item in dir(Class) if item!='__class__' and hasattr(getattr(Class,item),'OutputList')]
+
+def CollectOutputs(Class,Components=None):
+    """
+    Outputs of a cycle and its components, or of a single component, as a list
+    of (component, description, units, value) tuples.  The cycle itself is
+    the component 'Cycle'; for a single component (one without components of
+    its own) the component is ''.
+
+    Components is the list of component names from OutputComponents; pass it
+    to avoid searching the attributes of the cycle again
+    """
+    if Components is None:
+        Components=OutputComponents(Class)
+    if len(Components)==0:
+        return [('',head,units,value) for head,units,value in Class.OutputList()]
+    Outputs=[('Cycle',head,units,value) for head,units,value in Class.OutputList()]
+    for item in Components:
+        Outputs+=[(item,head,units,value) for head,units,value in getattr(Class,item).OutputList()]
+    return Outputs
+
+def _IsNumber(value):
+    return isinstance(value,(int,long,float,np.number)) and not isinstance(value,np.complexfloating)
+
+class ResultsWriter(object):
+    """
+    Buffered writer of rows of outputs to a CSV or .npz file
+
+    =============   ===========================================================
+    Variable        Description
+    =============   ===========================================================
+    path            the file to write, a .csv or .npz file
+    Format          'csv' or 'npz', from the extension of path if None
+    BufferRows      number of rows buffered before they are written out
+    Compress        if True, compress the arrays of an .npz file (which then
+                    cannot be memory-mapped)
+    Keep            if True, keep all the rows in memory after they have been
+                    written so that Columns can be called (always the case for
+                    an .npz file, which is only written by Close)
+    =============   ===========================================================
+
+    The first row defines the columns.  A later row with different columns is
+    matched to them by (component, description); outputs that are not
+    columns are dropped, and missing outputs are NaN (or '' for a column of
+    strings).  A numeric output that is not a number in a later row is NaN.
+    The columns are in Schema, a list of (component, description, units).
+    """
+    def __init__(self,path,Format=None,BufferRows=1000,Compress=True,Keep=False):
+        if Format is None:
+            Format=os.path.splitext(path)[1].lstrip('.').lower()
+        if Format not in ('csv','npz'):
+            raise ValueError('Format must be one of csv or npz, not '+str(Format))
+        self.path=path
+        self.Format=Format
+        self.BufferRows=BufferRows
+        self.Compress=Compress
+        self.Keep=Keep or Format=='npz'
+        self.Nrows=0
+        self.Schema=None
+        self._Components=None
+        self._Blocks=[]
+        self._fP=None
+        self._csv=None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.Close()
+
+    def _SetSchema(self,Outputs):
+        self.Components=[component for component,head,units,value in Outputs]
+        self.Heads=[head for component,head,units,value in Outputs]
+        self.Units=[units for component,head,units,value in Outputs]
+        #Components row only if the outputs are from more than one component
+        self.HasComponents=any(self.Components)
+        self.Numeric=np.array([_IsNumber(value) for component,head,units,value in Outputs],dtype=bool)
+        self._NumIdx=list(np.flatnonzero(self.Numeric))
+        self._TextIdx=list(np.flatnonzero(~self.Numeric))
+        #Numeric columns that start with an integer (the index of a point for
+        #instance) have their integral values written to a CSV file without a
+        #decimal point; the other values of these columns (a float in a later
+        #row) are written as they are
+        self._IntCols=[j for j,i in enumerate(self._NumIdx) if isinstance(Outputs[i][3],(int,long,np.integer)) and not isinstance(Outputs[i][3],(bool,np.bool_))]
+        self._Index=dict(((component,head),i) for i,(component,head) in enumerate(zip(self.Components,self.Heads)))
+        #Positions in a row of numeric values followed by text values
+        order=np.argsort(self._NumIdx+self._TextIdx)
+        self._Order=operator.itemgetter(*order) if len(order)>1 else (lambda row: tuple(row))
+        self._NumGetter=operator.itemgetter(*self._NumIdx) if len(self._NumIdx)>0 else None
+        self._TextGetter=operator.itemgetter(*self._TextIdx) if len(self._TextIdx)>0 else None
+        self._NewBuffer()
+        self.Schema=zip(self.Components,self.Heads,self.Units)
+
+    def _NewBuffer(self):
+        self._Values=np.empty((self.BufferRows,len(self._NumIdx)))
+        self._Text=np.empty((self.BufferRows,len(self._TextIdx)),dtype=object)
+        self._n=0
+
+    def _RowValues(self,Outputs):
+        if len(Outputs)==len(self.Heads) and [head for component,head,units,value in Outputs]==self.Heads:
+            return [value for component,head,units,value in Outputs]
+        values=[np.nan if Numeric else '' for Numeric in self.Numeric]
+        for component,head,units,value in Outputs:
+            i=self._Index.get((component,head))
+            if i is not None:
+                values[i]=value
+        return values
+
+    def Append(self,Outputs):
+        """
+        Add a row, given as a list of (component, description, units, value)
+        tuples such as the one returned by CollectOutputs or Solve.CycleOutputs
+        """
+        if self.Schema is None:
+            self._SetSchema(Outputs)
+        values=self._RowValues(Outputs)
+        n=self._n
+        if self._NumGetter is not None:
+            numbers=self._NumGetter(values)
+            try:
+                self._Values[n]=numbers
+            except (TypeError,ValueError):
+                for j,value in enumerate(numbers if len(self._NumIdx)>1 else [numbers]):
+                    try:
+                        self._Values[n,j]=float(value)
+                    except (TypeError,ValueError):
+                        self._Values[n,j]=np.nan
+        if self._TextGetter is not None:
+            text=self._TextGetter(values)
+            self._Text[n]=[str(value) for value in text] if len(self._TextIdx)>1 else [str(text)]
+        self._n+=1
+        self.Nrows+=1
+        if self._n==self.BufferRows:
+            self.Flush()
+
+    def AppendOutputs(self,Class):
+        """
+        Add the outputs of a cycle (and all its components) or of a single
+        component as a row.  The components of a cycle are only looked for in
+        the first row
+        """
+        if self._Components is None:
+            self._Components=OutputComponents(Class)
+        self.Append(CollectOutputs(Class,self._Components))
+
+    def _WriteHeader(self):
+        self._fP=open(self.path,'w')
+        self._csv=csv.writer(self._fP,lineterminator='\n')
+        if self.HasComponents:
+            self._csv.writerow(self.Components)
+        self._csv.writerow(self.Heads)
+        self._csv.writerow(self.Units)
+
+    def Flush(self):
+        """
+        Write out the buffered rows (an .npz file keeps them until Close)
+        """
+        if self.Schema is None or self._n==0:
+            return
+        n=self._n
+        Values=self._Values[0:n].copy()
+        Text=np.array(self._Text[0:n].tolist(),dtype=str).reshape(n,len(self._TextIdx))
+        if self.Format=='csv':
+            if self._fP is None:
+                self._WriteHeader()
+            if len(self._IntCols)>0:
+                Numbers=Values.astype(object)
+                Ints=Values[:,self._IntCols]
+                Integral=np.isfinite(Ints)
+                Integral[Integral]=(Ints[Integral]==np.floor(Ints[Integral]))
+                IntValues=Ints.astype(object)
+                IntValues[Integral]=Ints[Integral].astype(int).astype(object)
+                Numbers[:,self._IntCols]=IntValues
+                Numbers=Numbers.tolist()
+            else:
+                Numbers=Values.tolist()
+            if len(self._TextIdx)==0:
+                self._csv.writerows(Numbers)
+            else:
+                Order=self._Order
+                self._csv.writerows([Order(numbers+text) for numbers,text in zip(Numbers,Text.tolist())])
+            self._fP.flush()
+        if self.Keep:
+            self._Blocks.append((Values,Text))
+        self._NewBuffer()
+
+    def _Stacked(self):
+        if len(self._Blocks)>1:
+            self._Blocks=[(np.concatenate([Values for Values,Text in self._Blocks]),
+                           np.concatenate([Text for Values,Text in self._Blocks]))]
+        return self._Blocks[0]
+
+    def Columns(self):
+        """
+        Dictionary of the columns keyed by (component, description); numeric
+        columns are float arrays and the others arrays of strings
+        """
+        if not self.Keep:
+            raise ValueError('Columns are only available if the rows are kept (Keep=True)')
+        self.Flush()
+        if self.Schema is None:
+            return {}
+        Values,Text=self._Stacked()
+        Columns={}
+        for j,i in enumerate(self._NumIdx):
+            Columns[self.Components[i],self.Heads[i]]=Values[:,j]
+        for j,i in enumerate(self._TextIdx):
+            Columns[self.Components[i],self.Heads[i]]=Text[:,j]
+        return Columns
+
+    def Close(self):
+        """
+        Write out the remaining rows and close the file
+        """
+        self.Flush()
+        if self.Format=='csv':
+            if self._fP is None and self.Schema is not None:
+                self._WriteHeader()
+            if self._fP is not None:
+                self._fP.close()
+                self._fP=None
+        elif self.Schema is not None:
+            Values,Text=self._Stacked()
+            save=np.savez_compressed if self.Compress else np.savez
+            save(self.path,
+                 components=np.array(self.Components,dtype=str),
+                 heads=np.array(self.Heads,dtype=str),
+                 units=np.array(self.Units,dtype=str),
+                 numeric=self.Numeric,
+                 values=Values,
+                 text=Text)
+
+def _MemmapMember(path,name):
+    """
+    Memory-map an array stored (uncompressed) in an .npz file
+    """
+    zf=zipfile.ZipFile(path,'r')
+    info=zf.getinfo(name+'.npy')
+    zf.close()
+    if info.compress_type!=zipfile.ZIP_STORED:
+        raise ValueError('Only an uncompressed .npz file (Compress=False) can be memory-mapped')
+    fp=open(path,'rb')
+    try:
+        #Skip the local header of the member in the zip file
+        fp.seek(info.header_offset)
+        local=fp.read(30)
+        namelength,extralength=struct.unpack('<HH',local[26:30])
+        fp.seek(info.header_offset+30+namelength+extralength)
+        version=np.lib.format.read_magic(fp)
+        if version==(1,0):
+            shape,fortran_order,dtype=np.lib.format.read_array_header_1_0(fp)
+        else:
+            shape,fortran_order,dtype=np.lib.format.read_array_header_2_0(fp)
+        offset=fp.tell()
+    finally:
+        fp.close()
+    if 0 in shape:
+        return np.empty(shape,dtype=dtype)
+    return np.memmap(path,dtype=dtype,mode='r',offset=offset,shape=shape,order='F' if fortran_order else 'C')
+
+def LoadResults(path,mmap_mode=None):
+    """
+    Load an .npz file written by ResultsWriter.  Returns a dictionary with
+
+    ==========   ==============================================================
+    Key          Description
+    ==========   ==============================================================
+    components   list of the component of each column
+    heads        list of the description of each column
+    units        list of the units of each column
+    numeric      boolean array, True for the numeric columns
+    values       2-D float array of the numeric columns (rows x columns)
+    text         2-D array of strings of the other columns
+    index        dict of (component, description) to the column of values
+                 (numeric columns) or text (the others)
+    ==========   ==============================================================
+
+    If mmap_mode is given (only 'r' makes sense), the values array is
+    memory-mapped rather than read
+    """
+    data=np.load(path)
+    Results=dict((key,data[key]) for key in ('components','heads','units','numeric','text'))
+    if mmap_mode is not None:
+        Results['values']=_MemmapMember(path,'values')
+    else:
+        Results['values']=data['values']
+    data.close()
+    for key in ('components','heads','units'):
+        Results[key]=[str(item) for item in Results[key]]
+    Results['index']={}
+    counts=[0,0]
+    for component,head,numeric in zip(Results['components'],Results['heads'],Results['numeric']):
+        Results['index'][component,head]=counts[not numeric]
+        counts[not numeric]+=1
+    return Results
@@ -1,7 +1,7 @@
 from Cycle import DXCycleClass,SecondaryCycleClass,F2K
 from ACHPTools import Write2CSV
 
-def SampleSecondaryLoopSystem():
+def SampleSecondaryLoopSystem(Calculate=True):
     #########################################################################
     #################     SECONDARY CYCLE INITIALIZATION    #################
     #########################################################################
@@ -178,12 +178,14 @@ def SampleSecondaryLoopSystem():
     Cycle.LineSetReturn.OD=0.01905
     Cycle.LineSetReturn.ID=0.017526
     
-    #Now solve
-    Cycle.PreconditionedSolve()
+    #Now solve if Calculate has not been set to False
+    if Calculate==True:
+        Cycle.PreconditionedSolve()
+        print Cycle.OutputList()
     
-    print Cycle.OutputList()
+    return Cycle
 
-def SampleSecondaryLoopHPSystem():
+def SampleSecondaryLoopHPSystem(Calculate=True):
     #########################################################################
     #################     SECONDARY CYCLE INITIALIZATION    #################
     #########################################################################
@@ -350,10 +352,12 @@ def SampleSecondaryLoopHPSystem():
     Cycle.LineSetReturn.OD=0.01905
     Cycle.LineSetReturn.ID=0.017526
     
-    #Now solve
-    Cycle.PreconditionedSolve()
+    #Now solve if Calculate has not been set to False
+    if Calculate==True:
+        Cycle.PreconditionedSolve()
+        print Cycle.Pump.DP_g,Cycle.Pump.W
     
-    print Cycle.Pump.DP_g,Cycle.Pump.W
+    return Cycle
         
 def SampleDXACSystem(Calculate=True):    
     """
@@ -505,7 +509,7 @@ def SampleDXACSystem(Calculate=True):
     
 
         
-def SampleDXHPSystem():    
+def SampleDXHPSystem(Calculate=True):    
     #########################################################################
     ######################     CYCLE INITIALIZATION    ######################
     #########################################################################
@@ -638,8 +642,15 @@ def SampleDXHPSystem():
     Cycle.LineSetReturn.OD=0.009525
     Cycle.LineSetReturn.ID=0.007986
     
-    #Now solve
-    Cycle.PreconditionedSolve()
+    #Now solve if Calculate has not been set to False
+    if Calculate==True:
+        Cycle.PreconditionedSolve()
+    
+    return Cycle
+
+#Mode of the cycles made by the DX factories (see Rating.RateCycle)
+SampleDXACSystem.Mode='AC'
+SampleDXHPSystem.Mode='HP'
     
 if __name__=='__main__':
     cycle=SampleDXACSystem()
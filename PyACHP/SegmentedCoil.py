@@ -0,0 +1,831 @@
+'''
+Segmented (finite-volume) model of fin-and-tube coils
+
+EvaporatorClass and CondenserClass lump each phase zone of one averaged
+circuit.  The classes in this module follow every circuit tube by tube, with
+each tube split into Nsegments segments along its length, and carry the
+refrigerant state (enthalpy, pressure, temperature) of each segment and the
+air state (dry bulb temperature, humidity ratio) of each slab of air crossing
+a segment.  The air leaving a tube of one bank enters the tube in the same
+row of the next bank, so the interaction between banks is captured.
+
+All the circuits are marched at once: at each step along the circuits the
+segments of all the circuits are evaluated together as numpy arrays, so the
+cost of the model depends on the length of a circuit and on Nsegments, and
+only weakly on the number of circuits.  Nsegments is the accuracy/speed knob;
+Benchmark.SegmentedDeviations solves the sample DX air conditioner with these
+coils at several values of Nsegments and gives the time taken and the
+deviation of Q and DP_r of each coil from the moving-boundary coils.
+
+When the refrigerant enters the bank on the air outlet side (counterflow
+arrangement) the air entering a tube depends on tubes that are marched later;
+the march is repeated, using the air temperatures of the previous sweep,
+until the air outlet temperatures stop changing.
+
+The classes take the same inputs and give the same outputs as EvaporatorClass
+and CondenserClass, so they can be used in place of them in the cycles::
+
+    Cycle.Evaporator=SegmentedEvaporatorClass(Nsegments=2)
+    Cycle.Evaporator.Fins=FinInputs()
+
+Refrigerant and air flow maldistribution are given in the same way as for
+MultiCircuitEvaporatorClass, by the lists mdot_r_coeffs, mdot_v_coeffs and
+Vdot_ha_coeffs (one value per circuit, summing to 1).
+'''
+from __future__ import division #Make integer 3/2 give 1.5 in python 2.x
+from math import pi,floor,ceil
+import numpy as np
+from Properties import Props,HAProps
+from Correlations import (f_h_1phase_Tube,ShahEvaporation_Array,ShahCondensation_Array,
+                          LockhartMartinelli_Array,SatTransport,VoidFraction)
+from FinCorrelations import WavyLouveredFins,FinInputs
+
+#Quality nodes of the tabulated two-phase heat transfer coefficient and
+#frictional pressure gradient of each circuit
+_XNodes=np.linspace(0,1,21)
+
+def _Interp2D(table,n,x):
+    """
+    Linear interpolation at the quality x in row n of a table at the
+    nodes _XNodes, for arrays of rows and qualities
+    """
+    s=np.clip(x,0,1)*(len(_XNodes)-1)
+    i=np.minimum(s.astype(int),len(_XNodes)-2)
+    return table[n,i]+(table[n,i+1]-table[n,i])*(s-i)
+
+def CrossFlowEffectiveness(UA,C_a,C_r):
+    """
+    Effectiveness and minimum capacitance rate of a cross-flow heat exchanger
+    (arrays), with the same relations as the subcooled part of the condenser.
+    C_r may be infinite (two-phase refrigerant)
+    """
+    Cmin=np.minimum(C_a,C_r)
+    Cr=Cmin/np.maximum(C_a,C_r)
+    NTU=UA/Cmin
+    with np.errstate(divide='ignore',invalid='ignore',over='ignore'):
+        #Minimum capacitance rate on the air side
+        eps_a=np.where(Cr<1e-10,1-np.exp(-NTU),1/Cr*(1-np.exp(-Cr*(1-np.exp(-NTU)))))
+        #Minimum capacitance rate on the refrigerant side
+        eps_r=1-np.exp(-1/Cr*(1-np.exp(-Cr*NTU)))
+    return np.where(C_a<=C_r,eps_a,eps_r),Cmin
+
+def _hAir(T,W):
+    """
+    Enthalpy of humid air [J/kg_da] from the ideal-gas psychrometric relations
+    """
+    T_C=T-273.15
+    return 1006*T_C+W*(2501e3+1860*T_C)
+
+def _WAir(h,T):
+    """
+    Humidity ratio of humid air [kg/kg_da] from its enthalpy and temperature
+    """
+    T_C=T-273.15
+    return (h-1006*T_C)/(2501e3+1860*T_C)
+
+class SegmentedCoilClass():
+    """
+    Base class of the segmented evaporator and condenser; see the module
+    docstring.  In addition to the inputs of EvaporatorClass or
+    CondenserClass, the optional inputs are
+
+    ===============   =======================================================
+    Variable          Description
+    ===============   =======================================================
+    Nsegments         number of segments along each tube (default 2)
+    Arrangement       'Counterflow' (default) if the refrigerant enters the
+                      bank on the air outlet side, 'Parallelflow' if it
+                      enters on the air inlet side
+    AirTol            convergence of the air temperatures between sweeps [K]
+    MaxSweeps         maximum number of sweeps
+    mdot_r_coeffs     fraction of the refrigerant flow in each circuit
+    mdot_v_coeffs     fraction of the inlet vapor flow in each circuit
+    Vdot_ha_coeffs    fraction of the air flow over the tubes of each circuit
+                      (default: uniform face velocity)
+    ===============   =======================================================
+
+    Circuit i uses a block of adjacent rows of tubes in every bank (the rows
+    are shared out as in MultiCircuitEvaporatorClass) and goes through them in
+    a serpentine from one bank to the next.
+    """
+    #Whether water is condensed on the air side
+    Dehumidification=False
+
+    def __init__(self,**kwargs):
+        self.Nsegments=2
+        self.Arrangement='Counterflow'
+        self.AirTol=1e-3
+        self.MaxSweeps=50
+        self.Verbosity=0
+        self.__dict__.update(kwargs)
+
+    def Update(self,**kwargs):
+        self.__dict__.update(kwargs)
+
+    def _Layout(self):
+        """
+        The bank and row of each tube of each circuit, in the order of the
+        refrigerant flow
+        """
+        NT=int(self.NTubes_per_bank)
+        Nbank=int(self.Nbank)
+        Nc=int(self.Ncircuits)
+        if NT<Nc:
+            raise ValueError('Ncircuits ['+str(Nc)+'] cannot be more than NTubes_per_bank ['+str(NT)+']')
+        #The circuits are ordered from fewer to more rows if they are not evenly distributed
+        NTubes_min=int(floor(NT/Nc))
+        NTubes_max=int(ceil(NT/Nc))
+        if NTubes_min==NTubes_max:
+            A=Nc
+        else:
+            A=int(round((NT-Nc*NTubes_max)/(NTubes_min-NTubes_max)))
+        self.Rows=np.array([NTubes_min if i+1<=A else NTubes_max for i in range(Nc)])
+
+        if self.Arrangement=='Counterflow':
+            Banks=range(Nbank-1,-1,-1)
+        elif self.Arrangement=='Parallelflow':
+            Banks=range(Nbank)
+        else:
+            raise ValueError("Arrangement must be either 'Counterflow' or 'Parallelflow'")
+
+        self.NTubes_circuit=self.Rows*Nbank
+        Ntubes=int(np.max(self.NTubes_circuit))
+        self.Bank=np.zeros((Nc,Ntubes),dtype=int)
+        self.Row=np.zeros((Nc,Ntubes),dtype=int)
+        Active=np.zeros((Nc,Ntubes),dtype=bool)
+        FirstRow=np.concatenate(([0],np.cumsum(self.Rows)[0:-1]))
+        for i in range(Nc):
+            k=0
+            for j,b in enumerate(Banks):
+                Rows=range(FirstRow[i],FirstRow[i]+self.Rows[i])
+                if j%2==1:
+                    Rows=Rows[::-1]
+                for r in Rows:
+                    self.Bank[i,k]=b
+                    self.Row[i,k]=r
+                    Active[i,k]=True
+                    k+=1
+        #Circuits still flowing at each tube
+        self._Steps=[np.nonzero(Active[:,k])[0] for k in range(Ntubes)]
+        #Circuit of each row
+        self.RowCircuit=np.repeat(np.arange(Nc),self.Rows)
+
+    def _Distribution(self):
+        """
+        Refrigerant mass flow rate and inlet enthalpy of each circuit
+        """
+        Nc=int(self.Ncircuits)
+        mdot_r=float(np.sum(self.mdot_r))
+        if np.size(self.mdot_r)==Nc and Nc>1:
+            self.mdot_r_circuit=np.array(self.mdot_r,dtype=float)
+        elif hasattr(self,'mdot_r_coeffs'):
+            if len(self.mdot_r_coeffs)!=Nc:
+                raise AttributeError("Size of array mdot_r_coeffs: "+str(len(self.mdot_r_coeffs))+" does not equal Ncircuits: "+str(Nc))
+            elif abs(np.sum(self.mdot_r_coeffs)-1)>=100*np.finfo(float).eps:
+                raise AttributeError("mdot_r_coeffs must sum to 1.0.  Sum is: "+str(np.sum(self.mdot_r_coeffs)))
+            self.mdot_r_circuit=mdot_r*np.array(self.mdot_r_coeffs,dtype=float)
+        else:
+            self.mdot_r_circuit=mdot_r/Nc*np.ones(Nc)
+        self.hin_r_circuit=self.hin_r*np.ones(Nc)
+        if hasattr(self,'mdot_v_coeffs'):
+            if len(self.mdot_v_coeffs)!=Nc:
+                raise AttributeError("Size of array mdot_v_coeffs: "+str(len(self.mdot_v_coeffs))+" does not equal Ncircuits: "+str(Nc))
+            elif abs(np.sum(self.mdot_v_coeffs)-1)>=10*np.finfo(float).eps:
+                raise AttributeError("mdot_v_coeffs must sum to 1.0.  Sum is: "+str(np.sum(self.mdot_v_coeffs)))
+            x_inlet=(self.hin_r-self.hsatL)/self.h_fg
+            x_i=np.array(self.mdot_v_coeffs)*x_inlet*mdot_r/self.mdot_r_circuit
+            self.hin_r_circuit=self.hsatL+x_i*self.h_fg
+        self.G_r_circuit=self.mdot_r_circuit/(pi*self.ID**2/4.0)
+
+    def _AirSide(self):
+        """
+        Air-side heat transfer coefficient, surface effectiveness and dry air
+        flow rate over the rows of each circuit, from the fin correlation at
+        the local face velocity
+        """
+        Nc=int(self.Ncircuits)
+        NT=self.NTubes_per_bank
+        Air=self.Fins.Air
+        Vdot_ha=float(np.sum(Air.Vdot_ha))
+        if hasattr(self,'Vdot_ha_coeffs'):
+            if len(self.Vdot_ha_coeffs)!=Nc:
+                raise AttributeError("Size of array Vdot_ha_coeffs: "+str(len(self.Vdot_ha_coeffs))+" does not equal Ncircuits: "+str(Nc))
+            elif abs(np.sum(self.Vdot_ha_coeffs)-1)>=10*np.finfo(float).eps:
+                raise AttributeError("Vdot_ha_coeffs does not sum to 1.0!")
+            coeffs=np.array(self.Vdot_ha_coeffs,dtype=float)
+        else:
+            coeffs=self.Rows/NT
+        #Air flow over the whole coil at the face velocity of each circuit
+        Vdot_face=Vdot_ha*coeffs*NT/self.Rows
+
+        #The wet surface effectiveness uses the saturation specific heat at
+        #the refrigerant temperature
+        WetDry=getattr(self.Fins,'WetDry',None)
+        cs_cp=getattr(Air,'cs_cp',None)
+        self.h_a=np.zeros(Nc)
+        self.eta_a=np.zeros(Nc)
+        self.eta_a_wet=np.zeros(Nc)
+        self.mdot_da_row=np.zeros(Nc)
+        try:
+            for i in range(Nc):
+                Air.Vdot_ha=Vdot_face[i]
+                self.Fins.WetDry='Dry'
+                WavyLouveredFins(self.Fins)
+                self.h_a[i]=self.Fins.h_a
+                self.eta_a[i]=self.Fins.eta_a
+                self.mdot_da_row[i]=self.Fins.mdot_da/NT
+                if self.Dehumidification:
+                    self.Fins.WetDry='Wet'
+                    Air.cs_cp=self.c_s_r/self.Fins.cp_da
+                    WavyLouveredFins(self.Fins)
+                    self.eta_a_wet[i]=self.Fins.eta_a_wet
+        finally:
+            #Leave the fins as they were, evaluated for the whole coil
+            Air.Vdot_ha=Vdot_ha
+            if WetDry is None:
+                del self.Fins.WetDry
+            else:
+                self.Fins.WetDry=WetDry
+            if cs_cp is None:
+                if hasattr(Air,'cs_cp'):
+                    del Air.cs_cp
+            else:
+                Air.cs_cp=cs_cp
+            WavyLouveredFins(self.Fins)
+        self.cp_da=self.Fins.cp_da
+        self.A_a_seg=self.Fins.A_a/(NT*self.Nbank*self.Nsegments)
+
+    def _SaturatedAir(self):
+        """
+        Humidity ratio and enthalpy of saturated air on 1 K nodes spanning the
+        refrigerant and air temperatures
+        """
+        T=np.arange(floor(min(self.Tbubble_r,self.Tin_a))-5,ceil(max(self.Tdew_r,self.Tin_a))+6,1.0)
+        p=self.Fins.Air.p
+        self.T_sat_a=T
+        self.W_sat_a=np.array([HAProps('W','T',T_,'P',p,'R',1.0) for T_ in T])
+        self.h_sat_a=_hAir(T,self.W_sat_a)
+        #Slope of the saturated air enthalpy [J/kg_da-K] at the mid-points
+        self.T_sat_mid=(T[0:-1]+T[1::])/2
+        self.c_s_mid=np.diff(self.h_sat_a)/np.diff(T)
+        self.c_s_r=float(np.interp(self.Tsat_r,self.T_sat_mid,self.c_s_mid))
+
+    def _SinglePhaseTable(self,T):
+        """
+        Enthalpy [J/kg] and density [kg/m^3] of the refrigerant at the
+        temperatures T at the inlet pressure
+        """
+        h=np.array([Props('H','T',T_,'P',self.psat_r,self.Ref)*1000 for T_ in T])
+        rho=np.array([Props('D','T',T_,'P',self.psat_r,self.Ref) for T_ in T])
+        return h,rho
+
+    def Initialize(self):
+        # Retrieve some parameters from nested structures
+        # for code compactness
+        self.ID=self.Fins.Tubes.ID
+        self.OD=self.Fins.Tubes.OD
+        self.Ltube=self.Fins.Tubes.Ltube
+        self.NTubes_per_bank=self.Fins.Tubes.NTubes_per_bank
+        self.Nbank=self.Fins.Tubes.Nbank
+        self.Ncircuits=self.Fins.Tubes.Ncircuits
+        self.Tin_a=self.Fins.Air.Tdb
+
+        self.L_seg=self.Ltube/self.Nsegments
+        self.A_r_seg=pi*self.ID*self.L_seg
+        self.V_seg=pi*self.ID**2/4.0*self.L_seg
+        TotalLength=self.Ltube*self.NTubes_per_bank*self.Nbank
+        self.A_r_wetted=pi*self.ID*TotalLength
+        self.V_r=pi*self.ID**2/4.0*TotalLength
+
+        #Saturation properties at the inlet pressure
+        self.Tbubble_r=Props('T','P',self.psat_r,'Q',0,self.Ref)
+        self.Tdew_r=Props('T','P',self.psat_r,'Q',1,self.Ref)
+        self.Tsat_r=(self.Tbubble_r+self.Tdew_r)/2
+        self.hsatL=Props('H','T',self.Tbubble_r,'Q',0,self.Ref)*1000
+        self.hsatV=Props('H','T',self.Tdew_r,'Q',1,self.Ref)*1000
+        self.h_fg=self.hsatV-self.hsatL
+        self.satTransport=SatTransport(self.Ref,self.Tbubble_r,self.Tdew_r)
+        #The saturation temperatures follow the local pressure through their
+        #derivative at the inlet pressure
+        dp=0.01*self.psat_r
+        self.dTdp=(Props('T','P',self.psat_r+dp,'Q',1,self.Ref)-self.Tdew_r)/dp #[K/kPa]
+
+        self._InletState()
+
+        #Superheated vapor and subcooled liquid, tabulated against enthalpy
+        Tmax=max(self.Tin_a,self.Tin_r)+5
+        Tmin=min(self.Tin_a,self.Tin_r)-5
+        T=np.linspace(self.Tdew_r+0.1,max(Tmax,self.Tdew_r+5),8)
+        h,rho=self._SinglePhaseTable(T)
+        self.T_vap=np.r_[self.Tdew_r,T]
+        self.h_vap=np.r_[self.hsatV,h]
+        self.rho_vap=np.r_[self.satTransport['rho_g'],rho]
+        #Specific heat from the slope of the table
+        self.h_vap_mid=(self.h_vap[0:-1]+self.h_vap[1::])/2
+        self.cp_vap=np.diff(self.h_vap)/np.diff(self.T_vap)
+        T=np.linspace(min(Tmin,self.Tbubble_r-5),self.Tbubble_r-0.1,8)
+        h,rho=self._SinglePhaseTable(T)
+        self.T_liq=np.r_[T,self.Tbubble_r]
+        self.h_liq=np.r_[h,self.hsatL]
+        self.rho_liq=np.r_[rho,self.satTransport['rho_f']]
+        self.h_liq_mid=(self.h_liq[0:-1]+self.h_liq[1::])/2
+        self.cp_liq=np.diff(self.h_liq)/np.diff(self.T_liq)
+
+        #Two-phase density and momentum specific volume (for the
+        #accelerational pressure drop, as in Correlations.AccelPressureDrop)
+        #with the Zivi void fraction
+        rho_f=self.satTransport['rho_f']
+        rho_g=self.satTransport['rho_g']
+        self.x_2phase=np.linspace(0,1,201)
+        xc=np.clip(self.x_2phase,1e-12,1-1e-12)
+        alpha=VoidFraction(xc,rho_f,rho_g)
+        self.rho_2phase=alpha*rho_g+(1-alpha)*rho_f
+        self.v_momentum=xc**2/rho_g/alpha+(1-xc)**2/rho_f/(1-alpha)
+        self.v_momentum[0]=1/rho_f
+        self.v_momentum[-1]=1/rho_g
+
+        self._Layout()
+        self._Distribution()
+        self._SaturatedAir()
+        self._AirSide()
+
+        #Single-phase heat transfer coefficients and friction factors of each
+        #circuit, with properties at the mean temperature of each table
+        Nc=int(self.Ncircuits)
+        T_vap=(self.T_vap[0]+self.T_vap[-1])/2
+        T_liq=self.Tbubble_r-1
+        self.f_vap=np.zeros(Nc)
+        self.h_r_vap=np.zeros(Nc)
+        self.f_liq=np.zeros(Nc)
+        self.h_r_liq=np.zeros(Nc)
+        for i in range(Nc):
+            self.f_vap[i],self.h_r_vap[i],Re=f_h_1phase_Tube(self.mdot_r_circuit[i],self.ID,T_vap,self.psat_r,self.Ref,'Single')
+            self.f_liq[i],self.h_r_liq[i],Re=f_h_1phase_Tube(self.mdot_r_circuit[i],self.ID,T_liq,self.psat_r,self.Ref,'Single')
+        #Two-phase frictional pressure gradient of each circuit
+        self.dpdz_2phase_table=np.array([LockhartMartinelli_Array(self.Ref,G,self.ID,_XNodes,self.Tbubble_r,self.Tdew_r,
+                                                                  satTransport=self.satTransport)[0]
+                                         for G in self.G_r_circuit])
+
+    def _InletState(self):
+        """
+        Set hin_r and Tin_r from the refrigerant inlet state; implemented by
+        the derived classes
+        """
+        raise NotImplementedError
+
+    def _TwoPhaseHTC(self,q_flux):
+        """
+        Two-phase heat transfer coefficient of each circuit at the quality
+        nodes _XNodes, given the heat flux [W/m^2] in each circuit; implemented
+        by the derived classes
+        """
+        raise NotImplementedError
+
+    def _RefrigerantState(self,idx,h,p):
+        """
+        Quality, temperature, heat transfer coefficient, capacitance rate and
+        density of the refrigerant at enthalpy h and pressure p in the
+        circuits idx
+        """
+        x=(h-self.hsatL)/self.h_fg
+        TwoPhase=(x>=0)&(x<1)
+        Vapor=x>=1
+        dT=self.dTdp*(p-self.psat_r)
+        xc=np.clip(x,0,1)
+        T=np.where(TwoPhase,self.Tbubble_r+xc*(self.Tdew_r-self.Tbubble_r),
+                   np.where(Vapor,np.interp(h,self.h_vap,self.T_vap),np.interp(h,self.h_liq,self.T_liq)))+dT
+        h_r=np.where(TwoPhase,_Interp2D(self.h_r_2phase_table,idx,x),
+                     np.where(Vapor,self.h_r_vap[idx],self.h_r_liq[idx]))
+        cp=np.where(Vapor,np.interp(h,self.h_vap_mid,self.cp_vap),np.interp(h,self.h_liq_mid,self.cp_liq))
+        C_r=np.where(TwoPhase,np.inf,self.mdot_r_circuit[idx]*cp)
+        rho=np.where(TwoPhase,np.interp(x,self.x_2phase,self.rho_2phase),
+                     np.where(Vapor,np.interp(h,self.h_vap,self.rho_vap),np.interp(h,self.h_liq,self.rho_liq)))
+        Phase=np.where(TwoPhase,1,np.where(Vapor,0,2))
+        return x,T,h_r,C_r,rho,Phase
+
+    def _Segment(self,idx,h,p,Ta,Wa,mdot_a,f):
+        """
+        Heat transfer in the fraction f of one segment of each of the circuits
+        idx, with refrigerant enthalpy h and pressure p at the inlet, and air
+        at temperature Ta and humidity ratio Wa flowing at mdot_a [kg_da/s]
+        over the whole segment.  Returns the heat transferred to the
+        refrigerant [W], the air outlet state and the refrigerant state
+        """
+        x,T_r,h_r,C_r,rho,Phase=self._RefrigerantState(idx,h,p)
+        UA_o=self.eta_a[idx]*self.h_a[idx]*self.A_a_seg*f
+        UA_i=h_r*self.A_r_seg*f
+        m_a=mdot_a*f
+        C_a=m_a*self.cp_da
+        eps,Cmin=CrossFlowEffectiveness(1/(1/UA_o+1/UA_i),C_a,C_r)
+        Q=eps*Cmin*(Ta-T_r)
+        Ta_out=Ta-Q/C_a
+        Wa_out=Wa
+
+        if self.Dehumidification:
+            #Wet surface if the mean surface temperature is below the dewpoint
+            Tdp=np.interp(Wa,self.W_sat_a,self.T_sat_a)
+            T_s=(UA_o*(Ta+Ta_out)/2+UA_i*T_r)/(UA_o+UA_i)
+            Wet=T_s<Tdp
+            if np.any(Wet):
+                #Fully wet analysis based on enthalpy potential, with the
+                #saturation specific heat at the refrigerant temperature
+                c_s=np.interp(T_r,self.T_sat_mid,self.c_s_mid)
+                UA_o_wet=self.eta_a_wet[idx]*self.h_a[idx]*self.A_a_seg*f
+                UA_wet=1/(c_s/UA_i+self.cp_da/UA_o_wet)
+                eps_wet,Cmin_wet=CrossFlowEffectiveness(UA_wet,m_a,C_r/c_s)
+                hin_a=_hAir(Ta,Wa)
+                h_s_r=np.interp(T_r,self.T_sat_a,self.h_sat_a)
+                Q_wet=eps_wet*Cmin_wet*(hin_a-h_s_r)
+                hout_a=hin_a-Q_wet/m_a
+                #Effective surface temperature and air outlet state
+                Ntu_o=UA_o_wet/C_a
+                h_s_e=hin_a-(hin_a-hout_a)/(1-np.exp(-Ntu_o))
+                T_s_e=np.interp(h_s_e,self.h_sat_a,self.T_sat_a)
+                Ta_wet=T_s_e+(Ta-T_s_e)*np.exp(-Ntu_o)
+                Wa_wet=np.minimum(Wa,_WAir(hout_a,Ta_wet))
+                Q=np.where(Wet,Q_wet,Q)
+                Ta_out=np.where(Wet,Ta_wet,Ta_out)
+                Wa_out=np.where(Wet,Wa_wet,Wa)
+        return Q,Ta_out,Wa_out,x,T_r,h_r,rho,Phase
+
+    def _Friction(self,idx,x,rho,Phase):
+        """
+        Frictional pressure gradient [Pa/m] in the circuits idx
+        """
+        G=self.G_r_circuit[idx]
+        f=np.where(Phase==0,self.f_vap[idx],self.f_liq[idx])
+        return np.where(Phase==1,_Interp2D(self.dpdz_2phase_table,idx,x),f*G**2/(2*self.ID*rho))
+
+    def _Accumulate(self,idx,Phase,f,Q,Q_sensible,h_r,DP,Charge):
+        """
+        Add the contributions of a (fraction of a) segment to the totals of
+        each circuit and phase
+        """
+        for k,Name in enumerate(['superheat','2phase','subcool']):
+            m=Phase==k
+            if np.any(m):
+                #Each circuit appears at most once in idx
+                i=idx[m]
+                self._Q[k,i]+=Q[m]
+                self._Q_sensible[k,i]+=Q_sensible[m]
+                self._A_r[k,i]+=f[m]*self.A_r_seg
+                self._hA_r[k,i]+=h_r[m]*f[m]*self.A_r_seg
+                self._DP[k,i]+=DP[m]
+                self._Charge[k,i]+=Charge[m]
+
+    def _March(self,Ta,Wa):
+        """
+        One sweep along all the circuits.  Ta and Wa hold the air temperature
+        and humidity ratio entering each bank (and leaving the last one) for
+        each row and segment, and are updated in place
+        """
+        Nc=int(self.Ncircuits)
+        Ns=int(self.Nsegments)
+        h=self.hin_r_circuit.copy()
+        p=self.psat_r*np.ones(Nc)
+        self._Q=np.zeros((3,Nc))
+        self._Q_sensible=np.zeros((3,Nc))
+        self._A_r=np.zeros((3,Nc))
+        self._hA_r=np.zeros((3,Nc))
+        self._DP=np.zeros((3,Nc))
+        self._Charge=np.zeros((3,Nc))
+        Nsteps=len(self._Steps)*Ns
+        self.h_r_seg=np.nan*np.ones((Nc,Nsteps+1))
+        self.p_r_seg=np.nan*np.ones((Nc,Nsteps+1))
+        #Temperature at the inlet of each segment
+        self.T_r_seg=np.nan*np.ones((Nc,Nsteps))
+        self.h_r_seg[:,0]=h
+        self.p_r_seg[:,0]=p
+
+        for k,idx in enumerate(self._Steps):
+            b=self.Bank[idx,k]
+            r=self.Row[idx,k]
+            mdot_a=self.mdot_da_row[self.RowCircuit[r]]/Ns
+            mdot_r=self.mdot_r_circuit[idx]
+            for j in range(Ns):
+                #The direction of the refrigerant alternates from tube to tube
+                s=j if k%2==0 else Ns-1-j
+                hin=h[idx]
+                pin=p[idx]
+                Tin_a=Ta[b,r,s]
+                Win_a=Wa[b,r,s]
+                f=np.ones(len(idx))
+                Q,Tout_a,Wout_a,x,T_r,h_r,rho,Phase=self._Segment(idx,hin,pin,Tin_a,Win_a,mdot_a,f)
+                hout=hin+Q/mdot_r
+
+                #If the refrigerant changes phase within the segment, the
+                #first part of the segment is evaluated with the inlet phase
+                #up to the saturation enthalpy, and the rest with the new phase
+                CrossV=(hin<self.hsatV)!=(hout<self.hsatV)
+                CrossL=(hin<self.hsatL)!=(hout<self.hsatL)
+                Cross=CrossV|CrossL
+                #The saturation enthalpy reached first
+                h_b=np.where(CrossV&(~CrossL|(np.abs(self.hsatV-hin)<np.abs(self.hsatL-hin))),self.hsatV,self.hsatL)
+                with np.errstate(divide='ignore',invalid='ignore'):
+                    f=np.where(Cross,np.clip((h_b-hin)/(hout-hin),0,1),1.0)
+                Q*=f
+                Q_sensible=mdot_a*f*self.cp_da*(Tin_a-Tout_a)
+                dpdz=self._Friction(idx,x,rho,Phase)
+                DP=-dpdz*self.L_seg*f
+                Charge=rho*self.V_seg*f
+                self._Accumulate(idx,Phase,f,Q,Q_sensible,h_r,DP,Charge)
+                hout=np.where(Cross,h_b,hout)
+                if np.any(Cross):
+                    c=np.nonzero(Cross)[0]
+                    g=1-f[c]
+                    #Perturb the boundary enthalpy so that the phase is the new one
+                    h_new=h_b[c]+np.sign(Q[c])*1e-6*self.h_fg
+                    Q2,Tout_a2,Wout_a2,x2,T_r2,h_r2,rho2,Phase2=self._Segment(idx[c],h_new,pin[c],Tin_a[c],Win_a[c],mdot_a[c],g)
+                    Q2_sensible=mdot_a[c]*g*self.cp_da*(Tin_a[c]-Tout_a2)
+                    DP2=-self._Friction(idx[c],x2,rho2,Phase2)*self.L_seg*g
+                    self._Accumulate(idx[c],Phase2,g,Q2,Q2_sensible,h_r2,DP2,rho2*self.V_seg*g)
+                    Q_sensible[c]+=Q2_sensible
+                    Q[c]+=Q2
+                    DP[c]+=DP2
+                    hout[c]=h_b[c]+Q2/mdot_r[c]
+                    #The air leaving the two parts of the segment is mixed
+                    Tout_a=Tout_a.copy()
+                    Wout_a=Wout_a.copy()
+                    Tout_a[c]=f[c]*Tout_a[c]+g*Tout_a2
+                    Wout_a[c]=f[c]*Wout_a[c]+g*Wout_a2
+                #Accelerational pressure drop
+                xout=(hout-self.hsatL)/self.h_fg
+                G=self.G_r_circuit[idx]
+                DP_accel=G**2*(np.interp(x,self.x_2phase,self.v_momentum)-np.interp(xout,self.x_2phase,self.v_momentum))
+                for m,k2 in [(xout>=1,0),((xout>=0)&(xout<1),1),(xout<0,2)]:
+                    self._DP[k2,idx[m]]+=DP_accel[m]
+                h[idx]=hout
+                p[idx]=pin+(DP+DP_accel)/1000.0
+                Ta[b+1,r,s]=Tout_a
+                Wa[b+1,r,s]=Wout_a
+                n=k*Ns+j+1
+                self.h_r_seg[idx,n]=hout
+                self.p_r_seg[idx,n]=p[idx]
+                self.T_r_seg[idx,n-1]=T_r
+        self.hout_r_circuit=h
+        self.pout_r_circuit=p
+
+    def Calculate(self):
+        self.Initialize()
+        Nc=int(self.Ncircuits)
+        NT=int(self.NTubes_per_bank)
+        Ns=int(self.Nsegments)
+        Nbank=int(self.Nbank)
+
+        #Air state entering each bank, and leaving the last one
+        Ta=self.Tin_a*np.ones((Nbank+1,NT,Ns))
+        self.Win_a=HAProps('W','T',self.Tin_a,'P',self.Fins.Air.p,'R',self.Fins.Air.RH)
+        Wa=self.Win_a*np.ones((Nbank+1,NT,Ns))
+
+        #Initial heat flux as if the whole circuit were in two-phase
+        A_r_circuit=pi*self.ID*self.Ltube*self.NTubes_circuit
+        q_flux=self.mdot_r_circuit*self.h_fg*np.abs(1-(self.hin_r_circuit-self.hsatL)/self.h_fg)/A_r_circuit
+        self.h_r_2phase_table=self._TwoPhaseHTC(q_flux)
+
+        #The sweeps are a fixed-point iteration on the air state between the
+        #banks, accelerated by Aitken's dynamic relaxation
+        omega=1.0
+        r_old=None
+        self.AirSweeps=0
+        while self.AirSweeps<self.MaxSweeps:
+            self.AirSweeps+=1
+            Ta_old=Ta[1::].copy()
+            Wa_old=Wa[1::].copy()
+            self._March(Ta,Wa)
+            r=Ta[1::]-Ta_old
+            self.AirResidual=np.max(np.abs(r))
+            #Update the two-phase heat flux of each circuit
+            A=self._A_r[1]
+            q_flux=np.where(A>0,np.abs(self._Q[1])/np.where(A>0,A,1),q_flux)
+            if self.AirResidual<self.AirTol:
+                break
+            if r_old is not None and np.sum(r*r)<np.sum(r_old*r_old):
+                dr=r-r_old
+                omega=min(max(-omega*np.sum(r_old*dr)/np.sum(dr*dr),0.5),3.0)
+            else:
+                #Start again from plain sweeps if the residual has grown
+                omega=1.0
+            Ta[1::]=Ta_old+omega*r
+            Wa[1::]=np.clip(Wa_old+omega*(Wa[1::]-Wa_old),0,self.Win_a)
+            r_old=r
+            self.h_r_2phase_table=self._TwoPhaseHTC(q_flux)
+        if self.AirResidual>=self.AirTol and self.Verbosity>0:
+            print 'Warning: air temperatures in',self.__class__.__name__,'not converged after',self.AirSweeps,'sweeps, residual',self.AirResidual,'K'
+
+        #Totals of each circuit and of the coil
+        self.Q_circuit=np.sum(self._Q,axis=0)
+        self.Q=float(np.sum(self.Q_circuit))
+        self.Q_superheat,self.Q_2phase,self.Q_subcool=[float(np.sum(Q)) for Q in self._Q]
+        self.Q_sensible=float(np.sum(self._Q_sensible))
+        self.w_superheat,self.w_2phase,self.w_subcool=[float(np.sum(A))/self.A_r_wetted for A in self._A_r]
+        self.h_r_superheat,self.h_r_2phase,self.h_r_subcool=[float(np.sum(hA)/np.sum(A)) if np.sum(A)>0 else 0.0 for hA,A in zip(self._hA_r,self._A_r)]
+        self.Charge_superheat,self.Charge_2phase,self.Charge_subcool=[float(np.sum(C)) for C in self._Charge]
+        self.Charge=self.Charge_superheat+self.Charge_2phase+self.Charge_subcool
+        #Circuits are in parallel, so the pressure drops are flow-weighted
+        mdot_r=float(np.sum(self.mdot_r_circuit))
+        self.DP_r_superheat,self.DP_r_2phase,self.DP_r_subcool=[float(np.dot(DP,self.mdot_r_circuit))/mdot_r for DP in self._DP]
+        self.DP_r_circuit=(self.pout_r_circuit-self.psat_r)*1000
+        self.DP_r=float(np.dot(self.DP_r_circuit,self.mdot_r_circuit))/mdot_r
+
+        #Outlet state of each circuit and of the mixed flow
+        self.hout_r=float(np.dot(self.hout_r_circuit,self.mdot_r_circuit))/mdot_r
+        self.xout_r=(self.hout_r-self.hsatL)/self.h_fg
+        x,T,h_r,C_r,rho,Phase=self._RefrigerantState(np.arange(Nc),self.hout_r_circuit,self.pout_r_circuit)
+        self.Tout_r_circuit=T
+        x,T,h_r,C_r,rho,Phase=self._RefrigerantState(np.array([0]),np.array([self.hout_r]),np.array([self.psat_r+self.DP_r/1000.0]))
+        self.Tout_r=float(T[0])
+        pout_r=self.psat_r+self.DP_r/1000.0
+        if self.xout_r>=1:
+            self.sout_r=Props('S','T',self.Tout_r,'P',pout_r,self.Ref)*1000
+        elif self.xout_r<=0:
+            self.sout_r=Props('S','T',self.Tout_r,'P',pout_r,self.Ref)*1000
+        else:
+            ssatL=Props('S','T',self.Tbubble_r,'Q',0,self.Ref)*1000
+            ssatV=Props('S','T',self.Tdew_r,'Q',1,self.Ref)*1000
+            self.sout_r=self.xout_r*ssatV+(1-self.xout_r)*ssatL
+
+        #Air leaving the coil, mass-weighted over the rows
+        self.Tair=Ta
+        self.Wair=Wa
+        mdot_a=self.mdot_da_row[self.RowCircuit]
+        self.Tout_a=float(np.dot(mdot_a,np.mean(Ta[-1],axis=1))/np.sum(mdot_a))
+        self.Wout_a=float(np.dot(mdot_a,np.mean(Wa[-1],axis=1))/np.sum(mdot_a))
+        self.mdot_da=float(np.sum(mdot_a))
+
+        self.UA_r=float(np.sum(self._hA_r))
+        self.hmean_r=self.UA_r/self.A_r_wetted
+        self.UA_a=self.Fins.h_a*self.Fins.A_a*self.Fins.eta_a
+
+    def OutputList(self):
+        """
+            Return a list of parameters for this component for further output
+
+            It is a list of tuples, and each tuple is formed of items:
+                [0] Description of value
+                [1] Units of value
+                [2] The value itself
+        """
+        Output_List=[]
+        #append optional parameters, if applicable
+        if hasattr(self,'TestName'):
+            Output_List.append(('Name','N/A',self.TestName))
+        if hasattr(self,'TestDescription'):
+            Output_List.append(('Description','N/A',self.TestDescription))
+        if hasattr(self,'TestDetails'):
+            Output_List.append(('Details','N/A',self.TestDetails))
+        Output_List_default=[
+            ('Volumetric flow rate','m^3/s',self.Fins.Air.Vdot_ha),
+            ('Inlet Dry bulb temp','K',self.Tin_a),
+            ('Inlet Air pressure','kPa',self.Fins.Air.p),
+            ('Inlet Air Relative Humidity','-',self.Fins.Air.RH),
+            ('Tubes per bank','-',self.Fins.Tubes.NTubes_per_bank),
+            ('Number of banks','-',self.Fins.Tubes.Nbank),
+            ('Number circuits','-',self.Fins.Tubes.Ncircuits),
+            ('Length of tube','m',self.Fins.Tubes.Ltube),
+            ('Tube OD','m',self.Fins.Tubes.OD),
+            ('Tube ID','m',self.Fins.Tubes.ID),
+            ('Tube Long. Pitch','m',self.Fins.Tubes.Pl),
+            ('Tube Transverse Pitch','m',self.Fins.Tubes.Pt),
+            ('Fins per inch','1/in',self.Fins.Fins.FPI),
+            ('Fin waviness pd','m',self.Fins.Fins.Pd),
+            ('Fin waviness xf','m',self.Fins.Fins.xf),
+            ('Fin thickness','m',self.Fins.Fins.t),
+            ('Fin Conductivity','W/m-K',self.Fins.Fins.k_fin),
+            ('Segments per tube','-',self.Nsegments),
+            ('Air sweeps','-',self.AirSweeps),
+            ('Q Total','W',self.Q),
+            ('Q Superheat','W',self.Q_superheat),
+            ('Q Two-Phase','W',self.Q_2phase),
+            ('Q Subcool','W',self.Q_subcool),
+            ('Inlet ref. temp','K',self.Tin_r),
+            ('Outlet ref. temp','K',self.Tout_r),
+            ('Outlet air temp','K',self.Tout_a),
+            ('Pressure Drop Total','Pa',self.DP_r),
+            ('Pressure Drop Superheat','Pa',self.DP_r_superheat),
+            ('Pressure Drop Two-Phase','Pa',self.DP_r_2phase),
+            ('Pressure Drop Subcool','Pa',self.DP_r_subcool),
+            ('Charge Total','kg',self.Charge),
+            ('Charge Superheat','kg',self.Charge_superheat),
+            ('Charge Two-Phase','kg',self.Charge_2phase),
+            ('Charge Subcool','kg',self.Charge_subcool),
+            ('Mean HTC Superheat','W/m^2-K',self.h_r_superheat),
+            ('Mean HTC Two-phase','W/m^2-K',self.h_r_2phase),
+            ('Mean HTC Subcool','W/m^2-K',self.h_r_subcool),
+            ('Wetted Area Fraction Superheat','-',self.w_superheat),
+            ('Wetted Area Fraction Two-phase','-',self.w_2phase),
+            ('Wetted Area Fraction Subcool','-',self.w_subcool),
+            ('Mean Air HTC','W/m^2-K',self.Fins.h_a),
+            ('Surface Effectiveness','-',self.Fins.eta_a),
+            ('Air-side area (fin+tubes)','m^2',self.Fins.A_a),
+            ('Mass Flow rate dry Air','kg/s',self.Fins.mdot_da),
+            ('Mass Flow rate humid Air','kg/s',self.Fins.mdot_ha),
+            ('Pressure Drop Air-side','Pa',self.Fins.dP_a),
+        ]
+        for i in range(0,len(Output_List_default)):                             #append default parameters to output list
+            Output_List.append(Output_List_default[i])
+        return Output_List
+
+class SegmentedEvaporatorClass(SegmentedCoilClass):
+    """
+    Segmented evaporator, with the inputs Ref, mdot_r, psat_r, hin_r, Fins
+    and Verbosity of EvaporatorClass; see SegmentedCoilClass for the others.
+    The air side may be partly or fully wet.
+    """
+    Dehumidification=True
+
+    def _InletState(self):
+        self.xin_r=(self.hin_r-self.hsatL)/self.h_fg
+        if 0<=self.xin_r<1:
+            self.Tin_r=self.xin_r*self.Tdew_r+(1-self.xin_r)*self.Tbubble_r
+        else:
+            self.Tin_r=Props('T','H',self.hin_r/1000,'P',self.psat_r,self.Ref)
+
+    def _TwoPhaseHTC(self,q_flux):
+        return np.array([ShahEvaporation_Array(_XNodes,self.Ref,G,self.ID,q,self.Tbubble_r,self.Tdew_r,satTransport=self.satTransport)
+                         for G,q in zip(self.G_r_circuit,q_flux)])
+
+    def Calculate(self):
+        SegmentedCoilClass.Calculate(self)
+        self.Capacity=self.Q-self.Fins.Air.FanPower
+        #Sensible heat ratio [-]
+        self.SHR=self.Q_sensible/self.Q
+        pout_r=self.psat_r+self.DP_r/1000.0
+        if self.xout_r>=1:
+            self.DT_sh_calc=self.Tout_r-(self.Tdew_r+self.dTdp*(pout_r-self.psat_r))
+        else:
+            self.DT_sh_calc=(self.hout_r-self.hsatV)/(Props('C','T',self.Tdew_r,'Q',1,self.Ref)*1000)
+        self.DT_sh_circuit=self.Tout_r_circuit-(self.Tdew_r+self.dTdp*(self.pout_r_circuit-self.psat_r))
+        self.sin_r=Props('S','T',self.Tbubble_r,'Q',0,self.Ref)*1000+max(self.xin_r,0)*(Props('S','T',self.Tdew_r,'Q',1,self.Ref)-Props('S','T',self.Tbubble_r,'Q',0,self.Ref))*1000
+        if self.Verbosity>4:
+            print self.Q,"SegmentedEvaporator.Q"
+
+    def OutputList(self):
+        Output_List=SegmentedCoilClass.OutputList(self)
+        Output_List.append(('Outlet superheat','K',self.DT_sh_calc))
+        Output_List.append(('Sensible Heat Ratio','-',self.SHR))
+        return Output_List
+
+class SegmentedCondenserClass(SegmentedCoilClass):
+    """
+    Segmented condenser, with the inputs Ref, mdot_r, psat_r, Tin_r, Fins
+    and Verbosity of CondenserClass; see SegmentedCoilClass for the others.
+    """
+    def _InletState(self):
+        self.hin_r=Props('H','T',self.Tin_r,'P',self.psat_r,self.Ref)*1000
+        self.xin_r=(self.hin_r-self.hsatL)/self.h_fg
+        self.sin_r=Props('S','T',self.Tin_r,'P',self.psat_r,self.Ref)*1000
+        #Names used by CondenserClass
+        self.Tbubble=self.Tbubble_r
+        self.Tdew=self.Tdew_r
+
+    def _TwoPhaseHTC(self,q_flux):
+        #The Shah correlation goes to zero at a quality of 1, so the last
+        #node is taken just below it
+        return np.array([ShahCondensation_Array(np.minimum(_XNodes,0.999),self.Ref,G,self.ID,self.psat_r,self.Tbubble_r,self.Tdew_r)
+                         for G in self.G_r_circuit])
+
+    def Calculate(self):
+        SegmentedCoilClass.Calculate(self)
+        self.existsSubcooled=self.xout_r<0
+        self.xout_2phase=max(self.xout_r,0.0)
+        if self.existsSubcooled:
+            pout_r=self.psat_r+self.DP_r/1000.0
+            self.DT_sc=self.Tbubble_r+self.dTdp*(pout_r-self.psat_r)-self.Tout_r
+        else:
+            #Use the effective subcooling, from cp*DT_sc=-dx*h_fg
+            cp_satL=Props('C','T',self.Tbubble_r,'Q',0.0,self.Ref)*1000
+            self.DT_sc=-self.xout_r*self.h_fg/cp_satL
+
+    def OutputList(self):
+        Output_List=SegmentedCoilClass.OutputList(self)
+        Output_List.append(('Subcooling','K',self.DT_sc))
+        return Output_List
+
+def SampleSegmentedEvaporator(Nsegments=2):
+    """
+    The sample evaporator of Evaporator.py, modelled tube by tube
+    """
+    from Evaporator import SampleEvaporatorFins
+    Tdew=282.0
+    kwargs={'Ref': 'R410A',
+            'mdot_r':  0.0708,
+            'mdot_r_coeffs':[0.1,0.1,0.3,0.3,0.2],   #Mass flow distribution at distributor
+            'psat_r':  Props('P','T',Tdew,'Q',1.0,'R410A'),
+            'Fins': SampleEvaporatorFins(),
+            'hin_r':Props('H','T',Tdew,'Q',0.15,'R410A')*1000,
+            'Nsegments':Nsegments,
+            'Verbosity':0
+    }
+    Evap=SegmentedEvaporatorClass(**kwargs)
+    Evap.Calculate()
+    return Evap
+
+if __name__=='__main__':
+    #This code runs if this file is run by itself, but otherwise doesn't run
+    from timeit import default_timer
+    for Nsegments in [1,2,4,8]:
+        t1=default_timer()
+        Evap=SampleSegmentedEvaporator(Nsegments)
+        t2=default_timer()
+        print 'Nsegments %d: Q %0.1f W SHR %0.3f DP %0.0f Pa %d sweeps %0.3f s'%(Nsegments,Evap.Q,Evap.SHR,Evap.DP_r,Evap.AirSweeps,t2-t1)
+    print 'Superheat of each circuit:',Evap.DT_sh_circuit
@@ -0,0 +1,73 @@
+'''
+Slim solver-only entry point of PyACHP
+
+Only what is needed to build and solve the cycles is imported: no plotting,
+no parametric study or benchmark tools, and the secondary loop components
+(cooling coil, pump, internal heat exchangers) are only imported when a
+SecondaryCycleClass is built.  Short-lived batch workers and command line
+invocations should import from here rather than from the package or the
+sample scripts.
+
+From python::
+
+    from Solve import DXCycleClass,SolveCycle
+    Cycle=DXCycleClass()
+    # ... set the inputs of the cycle ...
+    Outputs=SolveCycle(Cycle)
+
+From the command line, with a factory function that builds the cycle without
+solving it::
+
+    python Solve.py SampleCycles:SampleDXACSystem Calculate=False
+'''
+from Cycle import DXCycleClass,SecondaryCycleClass,F2K
+from Instrumentation import Totals
+from ResultsStore import OutputComponents,CollectOutputs
+
+#Names of the components of the cycles, by class of cycle and names of the
+#attributes of the cycle (a component can be set on some cycles only)
+_Components={}
+
+def CycleOutputs(Cycle):
+    """
+    Collect the outputs of the cycle and all of its components (see 
+    ResultsStore.CollectOutputs) in the same order as ACHPTools.Write2CSV.  
+    The components are only searched for the first time a cycle of a given
+    class and set of attributes is seen
+
+    Returns a list of (component, description, units, value) tuples
+    """
+    key=(Cycle.__class__,tuple(sorted(Cycle.__dict__.keys())))
+    if key not in _Components:
+        _Components[key]=OutputComponents(Cycle)
+    Outputs=CollectOutputs(Cycle,Components=_Components[key])
+    #Counters of the solve if the cycle was instrumented
+    if hasattr(Cycle,'Instrumentation'):
+        Outputs+=[('Instrumentation',head,units,value) for head,units,value in Totals(Cycle.Instrumentation)]
+    return Outputs
+
+def SolveCycle(Cycle,PrecondValues=None,Cache=None):
+    """
+    Solve the cycle and return its outputs (see CycleOutputs)
+    
+    If Cache (a SolveCache.SolveCache) is given, the outputs are taken from the
+    cache if the cycle was solved before, in which case the cycle itself is
+    not solved
+    """
+    if Cache is not None:
+        return Cache.Solve(Cycle,PrecondValues=PrecondValues)['Outputs']
+    Cycle.PreconditionedSolve(PrecondValues=PrecondValues)
+    return CycleOutputs(Cycle)
+
+if __name__=='__main__':
+    import sys
+    from timeit import default_timer
+    from Parametric import LoadFactory,ParseKwarg
+    if len(sys.argv)<2:
+        print 'usage: python Solve.py module:function [key=value ...]'
+        sys.exit(2)
+    t1=default_timer()
+    Cycle=LoadFactory(sys.argv[1])(**dict(ParseKwarg(arg) for arg in sys.argv[2::]))
+    for component,head,units,value in SolveCycle(Cycle):
+        print '%s,%s,%s,%s'%(component,head,units,value)
+    print 'Solved in %0.3f s'%(default_timer()-t1)
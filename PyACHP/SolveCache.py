@@ -0,0 +1,323 @@
+'''
+On-disk cache of solved cycles
+
+The key of a cycle is a hash of all of its inputs: the attributes of the cycle
+and, recursively, of its components (fin inputs, compressor map coefficients,
+line sets, ...), together with a hash of the PyACHP source files so that a
+change of the code never returns results of the old code.  The cache stores
+the outputs of the solved cycle (see Solve.CycleOutputs) and the converged
+unknowns (see GetPrecondValues of the cycles).
+
+The key must be taken from a cycle that has not been solved yet, since the
+results of a solve are attributes of the cycle and its components as well.
+Cycles built by the same factory function, or read from the same
+configuration file, give the same key.
+
+If a cycle is not in the cache, the closest cycle in the cache that only
+differs by numerical inputs (the same components and fluids, an air
+temperature or a tube length that is different) gives the initial guess of
+the solver, in place of the preconditioner.
+
+The cache is a directory with one file per solved cycle, and is bounded in
+number of entries (and optionally in bytes), the least recently used entries
+being removed first.  Several processes can share the same directory.
+
+From python::
+
+    from SolveCache import SolveCache
+    from Solve import SolveCycle
+    Outputs=SolveCycle(Cycle,Cache=SolveCache('SolveCache'))
+
+or pass the directory of the cache as CachePath to Parametric.RunParametric.
+'''
+from __future__ import division
+import os
+import sys
+import glob
+import types
+import hashlib
+import tempfile
+import cPickle as pickle
+import numpy as np
+from Solve import CycleOutputs
+
+#Increase if the content of the entries changes
+FORMAT_VERSION=1
+
+#Attributes that do not change the solution of a cycle
+IgnoredAttributes=set(['SolverInfo','Instrumentation','Verbosity','ParallelJacobian'])
+
+_CodeVersion=None
+
+def CodeVersion():
+    """
+    Hash of the source files of PyACHP, part of every key
+    """
+    global _CodeVersion
+    if _CodeVersion is None:
+        h=hashlib.sha1()
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)),'*.py'))):
+            h.update(os.path.basename(path))
+            h.update(open(path,'rb').read())
+        _CodeVersion=h.hexdigest()
+    return _CodeVersion
+
+def _Flatten(value,Tokens,Numbers,Seen):
+    """
+    Append the canonical tokens of value to Tokens, with every float replaced
+    by 'f' and appended to Numbers
+    """
+    if isinstance(value,(bool,np.bool_)):
+        Tokens.append('b'+str(bool(value)))
+    elif isinstance(value,(int,long,float,np.integer,np.floating)):
+        #Integer and float inputs of the same value are the same input
+        Tokens.append('f')
+        Numbers.append(float(value))
+    elif isinstance(value,basestring):
+        Tokens.append('s'+value)
+    elif value is None:
+        Tokens.append('N')
+    elif isinstance(value,(list,tuple,np.ndarray)):
+        Tokens.append('[%d'%len(value))
+        for item in value:
+            _Flatten(item,Tokens,Numbers,Seen)
+        Tokens.append(']')
+    elif isinstance(value,dict):
+        Tokens.append('{%d'%len(value))
+        for key in sorted(value.keys(),key=str):
+            Tokens.append('k'+str(key))
+            _Flatten(value[key],Tokens,Numbers,Seen)
+        Tokens.append('}')
+    elif isinstance(value,(types.FunctionType,types.BuiltinFunctionType,types.MethodType,types.ModuleType,type,types.ClassType)):
+        Tokens.append('c'+getattr(value,'__module__','')+'.'+getattr(value,'__name__',''))
+    elif hasattr(value,'__dict__'):
+        if id(value) in Seen:
+            #The same object again (shared between components)
+            Tokens.append('@%d'%Seen[id(value)])
+            return
+        Seen[id(value)]=len(Seen)
+        Tokens.append('<'+value.__class__.__name__)
+        for key in sorted(value.__dict__.keys()):
+            if key.startswith('_') or key in IgnoredAttributes:
+                continue
+            Tokens.append('k'+key)
+            _Flatten(value.__dict__[key],Tokens,Numbers,Seen)
+        Tokens.append('>')
+    else:
+        #Objects without a canonical form only match themselves at best
+        Tokens.append('r'+repr(value))
+
+def CycleKey(Cycle):
+    """
+    Returns (key, structure key, numbers) of an unsolved cycle.  The key is the
+    hash of all the inputs, the structure key the hash of all the inputs but
+    the numbers, and numbers the array of the numerical inputs in a fixed order
+    """
+    Tokens=['v%d'%FORMAT_VERSION,CodeVersion()]
+    Numbers=[]
+    _Flatten(Cycle,Tokens,Numbers,{})
+    Structure=hashlib.sha1('\x00'.join(Tokens)).hexdigest()
+    Values=hashlib.sha1(','.join([repr(x) for x in Numbers])).hexdigest()
+    Key=hashlib.sha1(Structure+Values).hexdigest()
+    return Key,Structure,np.array(Numbers,dtype=float)
+
+class SolveCache(object):
+    """
+    Directory of solved cycles, bounded to MaxEntries entries and, if given,
+    MaxBytes bytes.  An entry is a dictionary with the keys 'Outputs' (see
+    Solve.CycleOutputs), 'PrecondValues' (see GetPrecondValues of the cycles),
+    'Structure' and 'Numbers' (the structure key and numerical inputs of the
+    cycle, see CycleKey)
+    """
+    def __init__(self,path,MaxEntries=10000,MaxBytes=None):
+        self.path=path
+        self.MaxEntries=MaxEntries
+        self.MaxBytes=MaxBytes
+        self.hits=0
+        self.misses=0
+        self.warmstarts=0
+        #Numerical inputs and PrecondValues of the entries already read, by
+        #structure key and file (see Nearest)
+        self._Index={}
+        if not os.path.isdir(path):
+            try:
+                os.makedirs(path)
+            except OSError:
+                #Made by another process in the meantime
+                if not os.path.isdir(path):
+                    raise
+        self._Nentries=len(self._Files())
+
+    def _Files(self):
+        return glob.glob(os.path.join(self.path,'*','*.pkl'))
+
+    def _File(self,Key,Structure):
+        return os.path.join(self.path,Structure[0:16],Key+'.pkl')
+
+    def _Load(self,path):
+        try:
+            fp=open(path,'rb')
+            try:
+                return pickle.load(fp)
+            finally:
+                fp.close()
+        except (IOError,OSError,EOFError,pickle.UnpicklingError):
+            #Removed by another process, or only partly written
+            return None
+
+    def Get(self,Key,Structure):
+        """
+        Returns the entry of a cycle, or None if it is not in the cache
+        """
+        path=self._File(Key,Structure)
+        Entry=self._Load(path) if os.path.exists(path) else None
+        if Entry is None:
+            self.misses+=1
+            return None
+        try:
+            #Mark as most recently used
+            os.utime(path,None)
+        except OSError:
+            pass
+        self.hits+=1
+        return Entry
+
+    def Set(self,Key,Structure,Entry):
+        """
+        Store the entry of a cycle, removing the least recently used entries if
+        the cache is full
+        """
+        path=self._File(Key,Structure)
+        directory=os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+        #Write to a temporary file and rename, so that other processes never
+        #see a partly written entry
+        Exists=os.path.exists(path)
+        fd,temppath=tempfile.mkstemp(suffix='.tmp',dir=directory)
+        fp=os.fdopen(fd,'wb')
+        try:
+            pickle.dump(Entry,fp,pickle.HIGHEST_PROTOCOL)
+        finally:
+            fp.close()
+        if sys.platform.startswith('win') and os.path.exists(path):
+            os.remove(path)
+        os.rename(temppath,path)
+        if Structure in self._Index:
+            self._Index[Structure][path]=(Entry['Numbers'],Entry['PrecondValues'])
+        if not Exists:
+            self._Nentries+=1
+        if self._Nentries>self.MaxEntries or self.MaxBytes is not None:
+            self.Evict()
+
+    def Evict(self):
+        """
+        Remove the least recently used entries until the cache is within its
+        bounds
+        """
+        Files=[]
+        for path in self._Files():
+            try:
+                stat=os.stat(path)
+            except OSError:
+                continue
+            Files.append((stat.st_mtime,stat.st_size,path))
+        Files.sort()
+        Nbytes=sum(size for mtime,size,path in Files)
+        N=len(Files)
+        for mtime,size,path in Files:
+            if N<=self.MaxEntries and (self.MaxBytes is None or Nbytes<=self.MaxBytes):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            N-=1
+            Nbytes-=size
+        self._Nentries=N
+
+    def _StructureIndex(self,Structure):
+        """
+        Dictionary of file to (numbers, PrecondValues) of the entries with the
+        structure key.  Only the files that are new since the last call (from
+        another process for instance) are read, and removed files are dropped
+        """
+        Index=self._Index.setdefault(Structure,{})
+        Files=set(glob.glob(os.path.join(self.path,Structure[0:16],'*.pkl')))
+        for path in list(Index.keys()):
+            if path not in Files:
+                del Index[path]
+        for path in Files:
+            if path in Index:
+                continue
+            Entry=self._Load(path)
+            if Entry is None or Entry.get('Structure')!=Structure:
+                continue
+            Index[path]=(Entry['Numbers'],Entry['PrecondValues'])
+        return Index
+    
+    def Nearest(self,Structure,Numbers):
+        """
+        PrecondValues of the closest entry with the same structure key, the
+        distance being the largest relative difference of the numerical
+        inputs, or None if there is no such entry
+        """
+        Index=self._StructureIndex(Structure)
+        if len(Index)==0:
+            return None
+        Values=Index.values()
+        if len(Numbers)==0:
+            return dict(Values[0][1])
+        Stored=np.array([numbers for numbers,PrecondValues in Values])
+        distance=np.max(np.abs(Stored-Numbers)/np.maximum(np.abs(Numbers),1e-12),axis=1)
+        return dict(Values[int(np.argmin(distance))][1])
+
+    def Solve(self,Cycle,PrecondValues=None):
+        """
+        Outputs of an unsolved cycle, from the cache if it is there, otherwise
+        by solving it (warm-started from PrecondValues if given, or else from
+        the nearest entry with the same structure) and storing it
+
+        Returns the entry, with 'Cached' set to True if it came from the cache.
+        The cycle is only solved (and its attributes set) if it was not in
+        the cache
+        """
+        Key,Structure,Numbers=CycleKey(Cycle)
+        Entry=self.Get(Key,Structure)
+        if Entry is not None:
+            Entry['Cached']=True
+            return Entry
+        if PrecondValues is None:
+            PrecondValues=self.Nearest(Structure,Numbers)
+            if PrecondValues is not None:
+                self.warmstarts+=1
+        Cycle.PreconditionedSolve(PrecondValues=PrecondValues)
+        Entry={'Structure':Structure,
+               'Numbers':Numbers,
+               'Outputs':CycleOutputs(Cycle),
+               'PrecondValues':Cycle.GetPrecondValues()}
+        self.Set(Key,Structure,Entry)
+        Entry['Cached']=False
+        return Entry
+
+    def clear(self):
+        """
+        Remove all the entries
+        """
+        for path in self._Files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._Nentries=0
+        self._Index={}
+        self.hits=0
+        self.misses=0
+        self.warmstarts=0
+
+    def __len__(self):
+        return len(self._Files())
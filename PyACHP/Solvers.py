@@ -1,7 +1,45 @@
 from __future__ import division
 import numpy as np
-from scipy.linalg import inv
+from scipy.linalg import solve,LinAlgError
 from numpy import array,dot
+from Instrumentation import RecordSolver
+
+class CountedFunction(object):
+    """
+    Wrapper around the function f(x,*args) that counts the number of times it
+    has been evaluated and converts the output to a numpy array.  x_last is the
+    point of the last evaluation
+    """
+    def __init__(self,f,args=()):
+        self.f=f
+        self.args=args
+        self.N=0
+        self.x_last=None
+    def __call__(self,x):
+        self.N+=1
+        self.x_last=np.array(x,dtype=np.float)
+        return np.array(self.f(x,*self.args),dtype=np.float)
+
+def _dxArray(dx,x):
+    """
+    If a float is passed in for dx, convert to a numpy-like list the same shape
+    as x
+    """
+    if isinstance(dx,(int,float)):
+        return dx*np.ones_like(x)
+    return np.array(dx,dtype=np.float)
+
+def FDJacobian(f,x,r0,dx):
+    """
+    Forward-difference Jacobian matrix of f, built by columns, given the 
+    residual vector r0 at x
+    """
+    J=np.zeros((len(r0),len(x)))
+    for i in range(len(x)):
+        epsilon=np.zeros_like(x)
+        epsilon[i]=dx[i]
+        J[:,i]=(array(f(x+epsilon))-r0)/epsilon[i]
+    return J
 
 def MultiDimNewtRaph(f,x0,dx=1e-6,args=(),ytol=1e-5,w=1.0,JustOneStep=False):
     """
@@ -21,20 +59,23 @@ def MultiDimNewtRaph(f,x0,dx=1e-6,args=(),ytol=1e-5,w=1.0,JustOneStep=False):
         dx=dx*np.ones_like(x)
     
     r0=array(f(x,*args))
+    iter=0
     while abs(error)>ytol:
+        iter+=1
         #Build the Jacobian matrix by columns
         for i in range(len(x)):
             epsilon=np.zeros_like(x)
             epsilon[i]=dx[i]
             J[:,i]=(array(f(x+epsilon,*args))-r0)/epsilon[i]
-        v=np.dot(-inv(J),r0)
+        v=-solve(J,r0)
         x=x+w*v
         #Calculate the residual vector at the new step
         r0=f(x,*args)
         error = np.max(np.abs(r0))
         #Just do one step and stop
         if JustOneStep==True:
-            return x
+            break
+    RecordSolver('MultiDimNewtRaph',iter,1+iter*(len(x)+1))
     return x
         
 def Broyden(f,x0,dx=1e-5,args=(),ytol=1e-5,w=1.0,itermax=10,JustOneStep=False):
@@ -64,7 +105,7 @@ def Broyden(f,x0,dx=1e-5,args=(),ytol=1e-5,w=1.0,itermax=10,JustOneStep=False):
                 epsilon[i]=dx[i]
                 A0[:,i]=(array(f(x0+epsilon,*args))-F0)/epsilon[i]
             #Get the difference vector
-            x1=x0-np.dot(inv(A0),F0)
+            x1=x0-solve(A0,F0)
             #Just do one step and stop
             if JustOneStep==True:
                 return x1
@@ -76,7 +117,7 @@ def Broyden(f,x0,dx=1e-5,args=(),ytol=1e-5,w=1.0,itermax=10,JustOneStep=False):
             F1=array(f(x1,*args))
             Y=F1-F0
             A1=A0+1.0/d*dot((Y-dot(A0,S)),S.T)
-            x2=x1-np.dot(inv(A1),F1)
+            x2=x1-solve(A1,F1)
             #Update values
             x0=x1
             x1=x2
@@ -88,6 +129,212 @@ def Broyden(f,x0,dx=1e-5,args=(),ytol=1e-5,w=1.0,itermax=10,JustOneStep=False):
             return np.nan*np.ones_like(x0)
     return x1
                 
+# The copy of the cycle held by each worker process of ParallelJacobian
+_JacobianCycle=None
+
+def _InitJacobianWorker(Cycle):
+    global _JacobianCycle
+    _JacobianCycle=Cycle
+
+def _JacobianColumn(task):
+    """
+    Evaluate the residuals of the worker's cycle at x after setting the state
+    fields (the pressure drops for instance) to those of the main process
+    """
+    x,State,Method=task
+    for key in State:
+        setattr(_JacobianCycle,key,State[key])
+    return np.array(getattr(_JacobianCycle,Method)(*[float(_x) for _x in x]),dtype=np.float)
+
+class ParallelJacobian(object):
+    """
+    Evaluate the columns of the finite-difference Jacobian of a cycle 
+    concurrently in a pool of worker processes.  Use an instance as the 
+    Jacobian argument of NewtonHybrid.
+    
+    Each worker gets a copy of the cycle once, when the pool is created, and
+    keeps it for the whole solve; for each Jacobian only the perturbed 
+    inputs and the values of StateFields (attributes of the cycle that 
+    change during the solve and are used by Calculate, like DP_low and 
+    DP_high) are sent to the workers.  The method of the cycle named by 
+    Method (Calculate by default) must take the solver variables as its 
+    positional arguments and return the residual vector.
+    
+    If the pool cannot be created (for instance inside a worker process of a
+    parametric study) the Jacobian is evaluated serially.
+    
+    Call close() when the solve is finished
+    """
+    def __init__(self,Cycle,StateFields=(),Method='Calculate',processes=None):
+        self.Cycle=Cycle
+        self.StateFields=StateFields
+        self.Method=Method
+        try:
+            from multiprocessing import Pool
+            self.pool=Pool(processes,initializer=_InitJacobianWorker,initargs=(Cycle,))
+        except (AssertionError,OSError,ImportError):
+            self.pool=None
+    
+    def __call__(self,f,x,r0,dx):
+        if self.pool is None:
+            return FDJacobian(f,x,r0,dx)
+        State=dict((key,getattr(self.Cycle,key)) for key in self.StateFields)
+        tasks=[]
+        for i in range(len(x)):
+            epsilon=np.zeros_like(x)
+            epsilon[i]=dx[i]
+            tasks.append((x+epsilon,State,self.Method))
+        columns=self.pool.map(_JacobianColumn,tasks)
+        #Count the evaluations done in the workers
+        if hasattr(f,'N'):
+            f.N+=len(x)
+        J=np.zeros((len(r0),len(x)))
+        for i in range(len(x)):
+            J[:,i]=(columns[i]-r0)/dx[i]
+        return J
+    
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool=None
+
+def NewtonHybrid(f,x0,dx=1e-6,args=(),ytol=1e-5,itermax=50,maxstep=None,
+                 J0=None,Jacobian=None,StallRatio=0.7,full_output=False):
+    """
+    Newton-Raphson solver with a backtracking line search and re-use of the 
+    Jacobian matrix.
+    
+    The finite-difference Jacobian is only built at the first step and when
+    the solver stops making progress; in between it is updated with Broyden's
+    rank-one update, so that most steps only cost one evaluation of f.  The 
+    linear system is solved with scipy.linalg.solve rather than by inverting
+    the Jacobian.
+    
+    ===========   ============================================================
+    Variable      Description
+    ===========   ============================================================
+    f             function f(x,*args) returning the residual vector
+    x0            initial guess
+    dx            finite difference step (float or one per variable)
+    ytol          convergence when the largest absolute residual < ytol
+    itermax       maximum number of steps
+    maxstep       if not None, the largest change in any variable in one step
+                  (trust region)
+    J0            optional initial Jacobian, for instance from a previous solve
+    Jacobian      optional function Jacobian(f,x,r0,dx) that returns the 
+                  Jacobian matrix, defaults to FDJacobian
+    StallRatio    if a step with an updated Jacobian reduces the norm of the 
+                  residual by less than this ratio, the Jacobian is rebuilt
+    full_output   if True, return (x,info) rather than x
+    ===========   ============================================================
+    
+    info is a dictionary with the keys 'nfev' (number of evaluations of f), 
+    'njev' (number of Jacobians built), 'iter', 'converged', 'error' (largest 
+    absolute residual) and 'J' (the last Jacobian)
+    
+    The last evaluation of f is always at the returned x (f is evaluated once
+    more if needed), so any state stored by f corresponds to the returned x,
+    whether the solver converged or not
+    """
+    F=CountedFunction(f,args)
+    if Jacobian is None:
+        Jacobian=FDJacobian
+    x=np.array(x0,dtype=np.float)
+    dx=_dxArray(dx,x)
+    r=F(x)
+    error=np.max(np.abs(r))
+    if J0 is not None:
+        J=np.array(J0,dtype=np.float)
+    else:
+        J=None
+    Fresh=False
+    njev=0
+    iter=0
+    while error>ytol and iter<itermax:
+        iter+=1
+        if J is None:
+            J=Jacobian(F,x,r,dx)
+            njev+=1
+            Fresh=True
+        try:
+            p=-solve(J,r)
+        except LinAlgError:
+            if Fresh:
+                break
+            #Singular updated Jacobian, rebuild it
+            J=None
+            continue
+        
+        #Limit the size of the step
+        if maxstep is not None and np.max(np.abs(p))>maxstep:
+            p*=maxstep/np.max(np.abs(p))
+        
+        #Backtracking line search on the norm of the residual vector
+        norm_r=np.sqrt(np.dot(r,r))
+        lam=1.0
+        accepted=False
+        best=None
+        for k in range(5):
+            x_new=x+lam*p
+            try:
+                r_new=F(x_new)
+                finite=np.all(np.isfinite(r_new))
+            except ValueError:
+                finite=False
+            if finite:
+                norm_new=np.sqrt(np.dot(r_new,r_new))
+                if norm_new<=(1-1e-4*lam)*norm_r:
+                    accepted=True
+                    break
+                if best is None or norm_new<best[2]:
+                    best=(x_new,r_new,norm_new,k)
+            lam/=2
+        
+        if not accepted:
+            if not Fresh:
+                #The updated Jacobian has gone stale, rebuild it and try again
+                J=None
+                continue
+            if best is None:
+                #No trial step could be evaluated
+                break
+            #Even the fresh Jacobian cannot reduce the residual (the solution
+            #surface is not smooth); take the best step as the plain Newton 
+            #method would
+            x_new,r_new,norm_new,k=best
+        
+        #Broyden's rank-one update of the Jacobian
+        S=x_new-x
+        J=J+np.outer((r_new-r)-np.dot(J,S),S)/np.dot(S,S)
+        
+        #Rebuild the Jacobian at the next step if progress is slow
+        if not Fresh and norm_new>StallRatio*norm_r:
+            J=None
+        else:
+            Fresh=False
+        
+        x=x_new
+        r=r_new
+        error=np.max(np.abs(r))
+    
+    if F.x_last is None or not np.array_equal(F.x_last,x):
+        #The last evaluation was at a trial point or a point of the Jacobian,
+        #evaluate again so that the state of f is at the returned x
+        r=F(x)
+        error=np.max(np.abs(r))
+    
+    RecordSolver('NewtonHybrid',iter,F.N)
+    if full_output:
+        info={'nfev':F.N,
+              'njev':njev,
+              'iter':iter,
+              'converged':error<=ytol,
+              'error':error,
+              'J':J}
+        return x,info
+    else:
+        return x
+
 if __name__=='__main__':
     
 ##     def OBJECTIVE(x):
@@ -105,4 +352,6 @@ if __name__=='__main__':
     print f(_x)
     from scipy.optimize import fsolve
     _x=fsolve(f,[0.1,1.0]); print _x
-    print f(_x)
\ No newline at end of file
+    print f(_x)
+    _x,info=NewtonHybrid(f,[0.1,0.7],ytol=1e-8,full_output=True); print _x
+    print f(_x),info['nfev'],'evaluations'
\ No newline at end of file
@@ -0,0 +1,281 @@
+'''
+Surrogate (response surface) models of a cycle from a designed sample
+
+The cycle is solved at a Latin hypercube sample of its inputs (outdoor and
+indoor air temperatures, indoor humidity, air flow rates and the compressor
+speed ratio Vdot_ratio by default) by the workers of Parametric.RunParametric.
+For each output (capacity, power and SHR by default), polynomials of
+increasing degree and a cubic radial basis function model are fitted and
+compared by k-fold cross-validation, and the model with the smallest error is
+fitted again on all the points and kept.
+
+The models are written to a JSON file that is read by SurrogateModel, which
+only needs numpy, so other tools (building energy simulations for instance)
+can evaluate the cycle in microseconds without CoolProp.
+
+From python::
+
+    from Surrogate import BuildSurrogate,DXVariables
+    Report=BuildSurrogate('SampleCycles:SampleDXACSystem',
+                          [('Tdb_outdoor',DXVariables['Tdb_outdoor'],295,320),
+                           ('Vdot_ratio',DXVariables['Vdot_ratio'],0.5,1.0)],
+                          N=100,path='Surrogate.json',
+                          FactoryKwargs={'Calculate':False})
+
+From the command line::
+
+    python Surrogate.py --factory SampleCycles:SampleDXACSystem
+        --factory-kwarg Calculate=False --var Tdb_outdoor=295:320
+        --var Vdot_ratio=0.5:1.0 -N 100 --out Surrogate.json
+
+Variables are given either by one of the names in DXVariables or by their
+dotted path, like in Parametric.
+'''
+from __future__ import division
+import os
+import json
+import itertools
+from collections import OrderedDict
+import numpy as np
+from Parametric import RunParametric,ParseKwarg
+from SurrogateModel import FORMAT_VERSION,ScaleInputs,PolynomialBasis,CubicRBFBasis,EvaluateModel
+
+#Inputs of the DX cycles that are usually varied, by name
+DXVariables=OrderedDict([
+    ('Tdb_outdoor','Cycle.Condenser.Fins.Air.Tdb'),
+    ('Tdb_indoor','Cycle.Evaporator.Fins.Air.Tdb'),
+    ('RH_indoor','Cycle.Evaporator.Fins.Air.RH'),
+    ('Vdot_outdoor','Cycle.Condenser.Fins.Air.Vdot_ha'),
+    ('Vdot_indoor','Cycle.Evaporator.Fins.Air.Vdot_ha'),
+    ('Vdot_ratio','Cycle.Compressor.Vdot_ratio'),
+])
+
+#Outputs of the DX cycles: name, 'component:description' and units
+DXOutputs=[('Capacity','Cycle:Net Capacity','W'),
+           ('Power','Cycle:Net Power','W'),
+           ('SHR','Cycle:SHR','-')]
+
+def LatinHypercube(N,Min,Max,seed=0):
+    """
+    N points of a Latin hypercube sample between Min and Max (arrays with one
+    value per variable); each variable takes one value in each of N equal
+    intervals of its range
+    """
+    Min=np.asarray(Min,dtype=float)
+    Max=np.asarray(Max,dtype=float)
+    rng=np.random.RandomState(seed)
+    U=np.empty((N,len(Min)))
+    for j in range(len(Min)):
+        U[:,j]=(rng.permutation(N)+rng.uniform(size=N))/N
+    return Min+U*(Max-Min)
+
+def PolynomialExponents(Nvariables,Degree):
+    """
+    Exponents of all the monomials of Nvariables variables up to Degree
+    """
+    Exponents=[]
+    for degree in range(Degree+1):
+        for combination in itertools.combinations_with_replacement(range(Nvariables),degree):
+            exponents=[0]*Nvariables
+            for i in combination:
+                exponents[i]+=1
+            Exponents.append(tuple(exponents))
+    return Exponents
+
+def FitPolynomial(Xs,y,Degree):
+    """
+    Least-squares polynomial of Degree in the scaled inputs Xs
+    """
+    Exponents=PolynomialExponents(Xs.shape[1],Degree)
+    coefficients=np.linalg.lstsq(PolynomialBasis(Xs,Exponents),y,rcond=-1)[0]
+    return {'type':'polynomial','degree':Degree,'exponents':Exponents,'coefficients':coefficients}
+
+def FitRBF(Xs,y):
+    """
+    Cubic radial basis function interpolant with a linear polynomial tail,
+    centered on the points Xs
+    """
+    N,d=Xs.shape
+    A=CubicRBFBasis(Xs,Xs)
+    P=A[:,N::]
+    M=np.zeros((N+d+1,N+d+1))
+    M[0:N,:]=A
+    M[N::,0:N]=P.T
+    coefficients=np.linalg.lstsq(M,np.r_[y,np.zeros(d+1)],rcond=-1)[0]
+    return {'type':'rbf','kernel':'cubic','centers':Xs.copy(),'coefficients':coefficients}
+
+def _Candidates(N,Nvariables,Degrees,RBF):
+    """
+    The models that can be fitted to N points, as (label, fitting function)
+    """
+    Candidates=[]
+    for Degree in Degrees:
+        #Keep at least twice as many points as coefficients
+        if 2*len(PolynomialExponents(Nvariables,Degree))<=N:
+            Candidates.append(('polynomial %d'%Degree,lambda Xs,y,Degree=Degree: FitPolynomial(Xs,y,Degree)))
+    if RBF and N>Nvariables+1:
+        Candidates.append(('rbf cubic',FitRBF))
+    return Candidates
+
+def CrossValidate(Xs,y,Fit,Folds=5,seed=0):
+    """
+    Errors of a fitting function by k-fold cross-validation: returns a
+    dictionary with the root mean square, largest absolute and mean absolute
+    errors of the predictions at the left out points, and R^2
+    """
+    N=len(y)
+    Folds=min(Folds,N)
+    order=np.random.RandomState(seed).permutation(N)
+    prediction=np.empty(N)
+    for k in range(Folds):
+        test=order[k::Folds]
+        train=np.setdiff1d(order,test)
+        prediction[test]=EvaluateModel(Fit(Xs[train],y[train]),Xs[test])
+    error=prediction-y
+    variance=np.var(y)
+    return {'rmse':float(np.sqrt(np.mean(error**2))),
+            'max':float(np.max(np.abs(error))),
+            'mae':float(np.mean(np.abs(error))),
+            'r2':float(1-np.mean(error**2)/variance) if variance>0 else 1.0}
+
+def FitSurrogate(X,y,Min,Max,Degrees=(1,2,3,4),RBF=True,Folds=5,seed=0):
+    """
+    Fit the candidate models to the points X (one column per input) and the
+    values y, and keep the one with the smallest cross-validated RMS error.
+
+    Returns (model, report) where report is a dictionary of the errors (see
+    CrossValidate) of each candidate, keyed by its label
+    """
+    Xs=ScaleInputs(X,Min,Max)
+    Candidates=_Candidates(len(y),X.shape[1],Degrees,RBF)
+    if len(Candidates)==0:
+        raise ValueError('Not enough points (%d) to fit a surrogate model'%len(y))
+    Report=OrderedDict()
+    for label,Fit in Candidates:
+        try:
+            Report[label]=CrossValidate(Xs,y,Fit,Folds,seed)
+        except np.linalg.LinAlgError:
+            continue
+    if len(Report)==0:
+        raise ValueError('None of the surrogate models could be fitted')
+    Best=min(Report.keys(),key=lambda label: Report[label]['rmse'])
+    Model=dict(Candidates)[Best](Xs,y)
+    Model['label']=Best
+    return Model,Report
+
+def SaveSurrogate(path,Variables,Outputs,Models,Reports):
+    """
+    Write the models to a JSON file that can be read by SurrogateModel
+    """
+    def Plain(Model):
+        Model=dict(Model)
+        for key in ('coefficients','centers'):
+            if key in Model:
+                Model[key]=Model[key].tolist()
+        if 'exponents' in Model:
+            Model['exponents']=[list(exponents) for exponents in Model['exponents']]
+        return Model
+    data={'format':FORMAT_VERSION,
+          'inputs':[{'name':name,'path':Path,'min':Min,'max':Max} for name,Path,Min,Max in Variables],
+          'outputs':[{'name':name,'key':key,'units':units,
+                      'model':Plain(Models[name]),
+                      'cv':Reports[name][Models[name]['label']],
+                      'candidates':Reports[name]} for name,key,units in Outputs]}
+    fp=open(path,'w')
+    json.dump(data,fp,indent=1)
+    fp.close()
+
+def BuildSurrogate(Factory,Variables,N=200,Outputs=None,path='Surrogate.json',
+                   samplepath=None,FactoryKwargs=None,processes=None,
+                   Degrees=(1,2,3,4),RBF=True,Folds=5,seed=0,CachePath=None,
+                   Verbosity=1):
+    """
+    Solve the cycle at a designed sample, fit the surrogate models and write
+    them to a file
+
+    =============   ===========================================================
+    Variable        Description
+    =============   ===========================================================
+    Factory         callable or 'module:function' string that returns a
+                    configured but unsolved cycle
+    Variables       list of (name, dotted variable path, min, max)
+    N               number of points of the Latin hypercube sample
+    Outputs         list of (name, 'component:description', units), DXOutputs
+                    by default
+    path            JSON file of the models (see SurrogateModel)
+    samplepath      CSV file for the solved points (path with '.sample.csv'
+                    in place of '.json' by default)
+    FactoryKwargs   dict of keyword arguments passed to the factory
+    processes       number of worker processes (see RunParametric)
+    Degrees         degrees of the candidate polynomials
+    RBF             if True, a cubic radial basis function is a candidate too
+    Folds           number of folds of the cross-validation
+    seed            seed of the random numbers of the sample and the folds
+    CachePath       optional directory of a cache of solved cycles (see
+                    SolveCache), so that a sample can be extended or fitted
+                    again without solving the same points again
+    Verbosity       0 for no output, 1 for the cross-validation report
+    =============   ===========================================================
+
+    Points that fail to solve are left out of the fits.  Returns a dictionary
+    of the cross-validation report of each output (see FitSurrogate)
+    """
+    if Outputs is None:
+        Outputs=DXOutputs
+    if samplepath is None:
+        samplepath=os.path.splitext(path)[0]+'.sample.csv'
+    Min=np.array([Min for name,Path,Min,Max in Variables],dtype=float)
+    Max=np.array([Max for name,Path,Min,Max in Variables],dtype=float)
+    X=LatinHypercube(N,Min,Max,seed)
+    Columns=RunParametric(Factory,[(Path,None) for name,Path,Min,Max in Variables],
+                          path=samplepath,FactoryKwargs=FactoryKwargs,
+                          processes=processes,Extrapolate=False,
+                          CachePath=CachePath,Samples=X.tolist(),
+                          Verbosity=Verbosity)
+    if 'Index' not in Columns:
+        raise ValueError('None of the points of the sample could be solved')
+    Solved=np.isfinite(Columns['Index'])
+    Models={}
+    Reports=OrderedDict()
+    for name,key,units in Outputs:
+        if key not in Columns:
+            raise KeyError('Output '+key+' is not an output of the cycle')
+        y=Columns[key]
+        good=Solved&np.isfinite(y)
+        Models[name],Reports[name]=FitSurrogate(X[good],y[good],Min,Max,Degrees,RBF,Folds,seed)
+        if Verbosity>0:
+            print '%s (%d points, %d failed):'%(name,good.sum(),N-good.sum())
+            for label,errors in Reports[name].items():
+                print '    %-14s rmse %-12.5g max %-12.5g R2 %.6f%s'%(label,errors['rmse'],errors['max'],errors['r2'],
+                                                                  ' *' if label==Models[name]['label'] else '')
+    SaveSurrogate(path,Variables,Outputs,Models,Reports)
+    return Reports
+
+if __name__=='__main__':
+    from optparse import OptionParser
+    parser=OptionParser(usage='python Surrogate.py --factory module:function --var name=Min:Max [options]')
+    parser.add_option('--factory',dest='factory',help='module:function that returns the base cycle')
+    parser.add_option('--factory-kwarg',dest='factorykwargs',action='append',default=[],help='key=value passed to the factory, can be repeated')
+    parser.add_option('--var',dest='vars',action='append',default=[],help='name=Min:Max, where name is one of '+', '.join(DXVariables.keys())+' or a dotted path, can be repeated')
+    parser.add_option('-N',dest='N',type='int',default=200,help='number of points of the sample')
+    parser.add_option('--out',dest='out',default='Surrogate.json',help='JSON file of the surrogate models')
+    parser.add_option('-j','--processes',dest='processes',type='int',default=None,help='number of worker processes')
+    parser.add_option('--degree',dest='degree',type='int',default=4,help='highest degree of the candidate polynomials')
+    parser.add_option('--no-rbf',dest='rbf',action='store_false',default=True,help='do not try a radial basis function model')
+    parser.add_option('--folds',dest='folds',type='int',default=5,help='number of folds of the cross-validation')
+    parser.add_option('--seed',dest='seed',type='int',default=0,help='seed of the sample')
+    parser.add_option('--cache',dest='cache',default=None,help='directory of the cache of solved cycles')
+    (options,args)=parser.parse_args()
+
+    if options.factory is None or len(options.vars)==0:
+        parser.error('--factory and at least one --var are required')
+    Variables=[]
+    for var in options.vars:
+        name,values=var.split('=',1)
+        Min,Max=values.split(':')
+        Variables.append((name,DXVariables.get(name,name),float(Min),float(Max)))
+    BuildSurrogate(options.factory,Variables,N=options.N,path=options.out,
+                   FactoryKwargs=dict(ParseKwarg(kwarg) for kwarg in options.factorykwargs),
+                   processes=options.processes,Degrees=range(1,options.degree+1),
+                   RBF=options.rbf,Folds=options.folds,seed=options.seed,
+                   CachePath=options.cache)
@@ -0,0 +1,109 @@
+'''
+Evaluator of the surrogate models written by Surrogate.py
+
+This module only needs numpy and json (not CoolProp, scipy or the rest of
+PyACHP), so it can be copied on its own into other tools.  Each output of the
+cycle is a polynomial or a radial basis function model of the inputs, which
+are scaled to [-1,1] over the range of the sample the model was fitted on.
+
+Usage::
+
+    from SurrogateModel import SurrogateModel
+    Model=SurrogateModel('Surrogate.json')
+    Model(Tdb_outdoor=308.15,Tdb_indoor=299.8,RH_indoor=0.51,
+          Vdot_outdoor=1.7,Vdot_indoor=0.56,Vdot_ratio=1.0)['Capacity']
+
+    #Many points at a time, one column per input in the order of Model.Inputs
+    Model.Evaluate(X)['Power']
+
+Inputs outside the range of the sample are extrapolated, which should be
+avoided (see Model.Ranges).
+'''
+from __future__ import division
+import json
+import numpy as np
+
+FORMAT_VERSION=1
+
+def ScaleInputs(X,Min,Max):
+    """
+    Scale the columns of X from [Min,Max] to [-1,1]
+    """
+    return 2*(X-Min)/(Max-Min)-1
+
+def PolynomialBasis(Xs,Exponents):
+    """
+    Matrix of the monomials (one column per row of Exponents) at the points Xs
+    """
+    Xs=np.atleast_2d(Xs)
+    Exponents=np.asarray(Exponents,dtype=int)
+    #Powers[n,:,i] is Xs[:,i]**n
+    Powers=Xs[np.newaxis,:,:]**np.arange(Exponents.max()+1)[:,np.newaxis,np.newaxis]
+    return Powers[Exponents,:,np.arange(Exponents.shape[1])].prod(axis=1).T
+
+def CubicRBFBasis(Xs,Centers):
+    """
+    Matrix of the cubic radial basis functions r^3 (one column per center) at
+    the points Xs, followed by the linear polynomial terms 1, x1, x2, ...
+    """
+    Xs=np.atleast_2d(Xs)
+    r=np.sqrt(((Xs[:,np.newaxis,:]-Centers[np.newaxis,:,:])**2).sum(axis=2))
+    return np.hstack([r**3,np.ones((Xs.shape[0],1)),Xs])
+
+def EvaluateModel(Model,Xs):
+    """
+    Values of one model (a dictionary as stored in the file) at the scaled
+    points Xs
+    """
+    if Model['type']=='polynomial':
+        return np.dot(PolynomialBasis(Xs,Model['exponents']),Model['coefficients'])
+    elif Model['type']=='rbf':
+        return np.dot(CubicRBFBasis(Xs,Model['centers']),Model['coefficients'])
+    raise ValueError('Unknown type of model: '+str(Model['type']))
+
+class SurrogateModel(object):
+    """
+    Surrogate models of the outputs of a cycle, loaded from a file written by
+    Surrogate.SaveSurrogate.  Inputs and Outputs are the lists of the names of
+    the inputs and outputs, Ranges the (min,max) of each input and Units the
+    units of each output
+    """
+    def __init__(self,path):
+        fp=open(path,'r')
+        data=json.load(fp)
+        fp.close()
+        if data['format']>FORMAT_VERSION:
+            raise ValueError('Surrogate file format %d is newer than this evaluator (%d)'%(data['format'],FORMAT_VERSION))
+        self.Inputs=[str(item['name']) for item in data['inputs']]
+        self.Ranges=dict((str(item['name']),(item['min'],item['max'])) for item in data['inputs'])
+        self._Min=np.array([item['min'] for item in data['inputs']],dtype=float)
+        self._Max=np.array([item['max'] for item in data['inputs']],dtype=float)
+        self.Outputs=[str(item['name']) for item in data['outputs']]
+        self.Units=dict((str(item['name']),str(item['units'])) for item in data['outputs'])
+        self.Errors=dict((str(item['name']),item.get('cv',{})) for item in data['outputs'])
+        self._Models=[]
+        for item in data['outputs']:
+            Model=dict(item['model'])
+            for key in ('coefficients','centers'):
+                if key in Model:
+                    Model[key]=np.array(Model[key],dtype=float)
+            if 'exponents' in Model:
+                Model['exponents']=np.array(Model['exponents'],dtype=int)
+            self._Models.append(Model)
+
+    def Evaluate(self,X):
+        """
+        Outputs at the points X, an array with one column per input (in the
+        order of Inputs) or a single point.  Returns a dictionary of arrays of
+        the outputs
+        """
+        Xs=ScaleInputs(np.atleast_2d(np.asarray(X,dtype=float)),self._Min,self._Max)
+        return dict((name,EvaluateModel(Model,Xs)) for name,Model in zip(self.Outputs,self._Models))
+
+    def __call__(self,**kwargs):
+        """
+        Outputs at one point given by keyword arguments for all the inputs.
+        Returns a dictionary of floats
+        """
+        X=[kwargs[name] for name in self.Inputs]
+        return dict((name,float(value[0])) for name,value in self.Evaluate(X).items())